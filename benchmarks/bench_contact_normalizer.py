@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark da normalização de contatos: validação/formatação valor a valor
+(ExportEngine) vs. normalizador em lote com operações de string do pandas.
+
+Uso:
+  python benchmarks/bench_contact_normalizer.py
+  python benchmarks/bench_contact_normalizer.py --values 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from core.contact_normalizer import normalize_contacts
+from core.exports import ExportEngine
+
+
+def synthetic_values(n: int, seed: int = 42) -> list:
+    """Mistura de telefones em formatos variados, emails e lixo digitado à mão."""
+    rnd = random.Random(seed)
+    values = []
+    for _ in range(n):
+        kind = rnd.random()
+        ddd = rnd.randint(11, 99)
+        number = rnd.randint(900_000_000, 999_999_999)
+        if kind < 0.35:
+            values.append(f"+55 {ddd} {str(number)[:5]}-{str(number)[5:]}")
+        elif kind < 0.6:
+            values.append(f"({ddd}) {number}")
+        elif kind < 0.75:
+            values.append(f"55{ddd}{number}")
+        elif kind < 0.9:
+            values.append(f"paciente{rnd.randint(1, 99999)}@exemplo.com.br")
+        else:
+            values.append(rnd.choice(["", "Instagram", "123", "sem telefone", "11 9876"]))
+    return values
+
+
+def scalar_normalize(values: list) -> list:
+    out = []
+    for value in values:
+        value = value.strip()
+        if ExportEngine._is_valid_email(value):
+            out.append(value)
+        elif ExportEngine._is_valid_phone(value):
+            out.append(ExportEngine._format_phone(value))
+        else:
+            out.append("")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de normalização de contatos")
+    parser.add_argument("--values", type=int, default=100_000, help="Quantidade de valores")
+    args = parser.parse_args()
+
+    values = synthetic_values(args.values)
+    # Aquece imports preguiçosos (pandas/pyarrow) fora da medição
+    normalize_contacts(values[:100])
+
+    start = time.perf_counter()
+    scalar = scalar_normalize(values)
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = normalize_contacts(values)["contact"].tolist()
+    batch_s = time.perf_counter() - start
+
+    assert scalar == batch, "Normalizador em lote divergiu do escalar"
+    print(f"📇 {args.values} valores")
+    print(f"  escalar  {scalar_s * 1000:8.1f} ms")
+    print(f"  lote     {batch_s * 1000:8.1f} ms  ({scalar_s / batch_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos caminhos quentes de relatórios e exportações.
+
+Com leads sintéticos (benchmarks/synthetic.py, já no esquema enxuto que o
+KommoClient devolve), mede tempo e pico de memória (tracemalloc, numa rodada
+separada) de:
+  - AnalyticsEngine.group_by_origin / calculate_metrics / calculate_efficiency_by_origin
+  - report_formatter.build_monthly_message / build_annual_message
+  - ExportEngine._leads_to_dataframe (contatos de um cliente falso em memória)
+  - ExportEngine._save_both_formats (Excel + CSV em pasta temporária)
+
+O resultado vai para um JSON (padrão benchmarks/results/hot_paths_<data>.json)
+com commit, Python e máquina; `--compare` mostra a variação contra um
+resultado anterior para achar regressões entre versões.
+
+Uso:
+  python benchmarks/bench_hot_paths.py
+  python benchmarks/bench_hot_paths.py --sizes 1000 10000 --repeat 5
+  python benchmarks/bench_hot_paths.py --compare benchmarks/results/hot_paths_20260101_120000.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from benchmarks.synthetic import synthetic_account
+from core.analytics import AnalyticsEngine
+from core.exports import ExportEngine
+from core.report_formatter import build_annual_message, build_monthly_message
+from integrations.kommo_schema import lead_field_ids_from_config, slim_contact, slim_lead
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+class MemoryContacts:
+    """Responde get_contacts_batch com os contatos sintéticos (sem HTTP)"""
+
+    def __init__(self, contacts: list):
+        self.by_id = {c["id"]: slim_contact(c) for c in contacts}
+
+    def get_contacts_batch(self, contact_ids: list):
+        return [self.by_id[cid] for cid in contact_ids if cid in self.by_id]
+
+
+def build_inputs(n_leads: int, seed: int) -> dict:
+    account = synthetic_account(n_leads, seed=seed)
+    config = account["config"]
+    kommo = config["kommo"]
+    field_ids = lead_field_ids_from_config(config)
+    leads = [slim_lead(lead, field_ids) for lead in account["leads"]]
+    won = [lead for lead in leads if lead["status_id"] == kommo["won_status_id"]]
+    stats = AnalyticsEngine.calculate_metrics(leads, won, kommo["won_status_id"])
+    origins = AnalyticsEngine.group_by_origin(leads, kommo["origin_field_id"], kommo["origin_bot_field_id"])
+    start_ts = min(lead["created_at"] for lead in leads)
+    return {
+        "config": config,
+        "leads": leads,
+        "won": won,
+        "stats": stats,
+        "origins": origins,
+        "start_ts": start_ts,
+        "contacts": MemoryContacts(account["contacts"]),
+    }
+
+
+def cases(inputs: dict, tmp_dir: str) -> dict:
+    """{nome: função sem argumentos} para cada caminho medido"""
+    config, leads, won = inputs["config"], inputs["leads"], inputs["won"]
+    kommo = config["kommo"]
+    stats, origins = inputs["stats"], inputs["origins"]
+    conversion = round(100.0 * stats["total_closed_won"] / stats["total_created"], 1) if stats["total_created"] else 0
+    rows = ExportEngine._leads_to_dataframe(leads, inputs["contacts"])
+    return {
+        "group_by_origin": lambda: AnalyticsEngine.group_by_origin(
+            leads, kommo["origin_field_id"], kommo["origin_bot_field_id"]),
+        "calculate_metrics": lambda: AnalyticsEngine.calculate_metrics(leads, won, kommo["won_status_id"]),
+        "calculate_efficiency_by_origin": lambda: AnalyticsEngine.calculate_efficiency_by_origin(
+            leads, won, kommo["origin_field_id"]),
+        "build_monthly_message": lambda: build_monthly_message(
+            config["client_name"], stats, origins, conversion, len(leads) - len(won), won,
+            kommo["origin_field_id"], "Benchmark", inputs["start_ts"], kommo["origin_bot_field_id"]),
+        "build_annual_message": lambda: build_annual_message(
+            config["client_name"], stats, origins, won, inputs["start_ts"]),
+        "_leads_to_dataframe": lambda: ExportEngine._leads_to_dataframe(leads, inputs["contacts"]),
+        "_save_both_formats": lambda: ExportEngine._save_both_formats(rows, tmp_dir, "benchmark"),
+    }
+
+
+def measure(fn, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+
+    # Pico de memória numa rodada à parte: o tracemalloc deixa o código mais lento
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_s": round(statistics.median(times), 6),
+        "min_s": round(min(times), 6),
+        "peak_mib": round(peak / 1024 / 1024, 3),
+        "repeat": repeat,
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat: int, seed: int, only: list = None) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in sizes:
+            inputs = build_inputs(n, seed)
+            for name, fn in cases(inputs, tmp_dir).items():
+                if only and name not in only:
+                    continue
+                result = {"case": name, "leads": n, **measure(fn, repeat)}
+                results.append(result)
+                print(f"  {name:<32} {n:>7} leads  {result['median_s'] * 1000:>10.2f} ms  "
+                      f"{result['peak_mib']:>8.2f} MiB")
+    return {
+        "benchmark": "hot_paths",
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def compare(current: dict, previous: dict):
+    """Imprime a variação de tempo e memória contra um resultado anterior"""
+    before = {(r["case"], r["leads"]): r for r in previous["results"]}
+    print(f"\nComparação com {previous.get('commit') or '?'} ({previous.get('generated_at')}):")
+    for r in current["results"]:
+        old = before.get((r["case"], r["leads"]))
+        if not old:
+            continue
+        dt = (r["median_s"] / old["median_s"] - 1) * 100 if old["median_s"] else 0
+        dm = (r["peak_mib"] / old["peak_mib"] - 1) * 100 if old["peak_mib"] else 0
+        flag = "  ⚠️" if dt > 10 or dm > 10 else ""
+        print(f"  {r['case']:<32} {r['leads']:>7} leads  tempo {dt:+6.1f}%  memória {dm:+6.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos quentes de relatórios e exportações")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(DEFAULT_SIZES), help="Quantidades de leads")
+    parser.add_argument("--repeat", type=int, default=3, help="Rodadas cronometradas por caso")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", default=None, help="Só estes casos")
+    parser.add_argument("--out", default=None, help="Arquivo JSON de saída")
+    parser.add_argument("--compare", default=None, help="JSON de uma execução anterior")
+    args = parser.parse_args()
+
+    print(f"⏱️ Caminhos quentes: {', '.join(str(n) for n in args.sizes)} leads, {args.repeat} rodadas")
+    current = run(args.sizes, args.repeat, args.seed, args.only)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"hot_paths_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"📝 Resultado: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(current, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
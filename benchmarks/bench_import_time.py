@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark de início do servidor de webhooks (`python -X importtime`).
+
+Em processos novos, mede:
+  - o tempo de import do `telegram_webhook` (acumulado, pelo -X importtime),
+    separando o que é do FastAPI/Starlette/Pydantic do que é do projeto
+  - se módulos pesados (requests, pandas, openpyxl, pyarrow, main,
+    core.exports) foram carregados no import
+  - o tempo até o primeiro `/health` responder (interpretador + imports +
+    chamada do endpoint)
+
+`--eager` importa também `main` e `core.exports` logo na subida, reproduzindo
+o comportamento anterior aos imports sob demanda, para comparação.
+
+Uso:
+  python benchmarks/bench_import_time.py
+  python benchmarks/bench_import_time.py --runs 10 --eager
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+HEAVY = ("requests", "pandas", "openpyxl", "pyarrow", "main", "core.exports")
+FRAMEWORK = ("fastapi", "starlette", "pydantic", "pydantic_core", "anyio")
+
+PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import telegram_webhook
+{eager}
+asyncio.run(telegram_webhook.health_check())
+ready_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({{"ready_ms": ready_ms, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list:
+    """[(módulo, nível, cumulativo_us)] na ordem do -X importtime (filhos antes do pai)"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, raw_name = line.split("|")
+        name = raw_name.rstrip()[1:]
+        level = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), level, int(cumulative_us)))
+    return entries
+
+
+def _top_level_us(entries: list, prefixes: tuple) -> int:
+    """Soma o acumulado dos módulos de `prefixes` que não estão dentro de outro deles"""
+    total = 0
+    for i, (name, level, cumulative_us) in enumerate(entries):
+        if name.split(".")[0] not in prefixes:
+            continue
+        # O pai de uma linha é a próxima linha com nível menor
+        nested, wanted = False, level
+        for parent, parent_level, _ in entries[i + 1:]:
+            if parent_level < wanted:
+                if parent.split(".")[0] in prefixes:
+                    nested = True
+                    break
+                wanted = parent_level
+        if not nested:
+            total += cumulative_us
+    return total
+
+
+def run_once(eager: bool) -> dict:
+    code = PROBE.format(eager="import requests, main, core.exports" if eager else "", heavy=HEAVY)
+    env = {**os.environ, "PYTHONPATH": SRC}
+    with tempfile.TemporaryDirectory() as cwd:  # o logger cria logs/ no diretório atual
+        started_wall = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=env, capture_output=True, text=True,
+            check=True,
+        )
+        wall_ms = (time.perf_counter() - started_wall) * 1000
+    entries = parse_importtime(proc.stderr)
+    probe = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # Nível 0 depois do `site` = imports do script (webhook e, no --eager, os extras)
+    after_site = entries[next(i for i, e in enumerate(entries) if e[0] == "site") + 1:]
+    total_us = sum(cumulative_us for name, level, cumulative_us in after_site
+                   if level == 0 and name not in ("asyncio", "json", "sys", "time"))
+    framework_us = _top_level_us(entries, FRAMEWORK)
+    return {
+        "import_ms": total_us / 1000,
+        "framework_ms": framework_us / 1000,
+        "app_ms": (total_us - framework_us) / 1000,
+        "ready_ms": probe["ready_ms"],
+        "process_ms": wall_ms,
+        "loaded": probe["loaded"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de início do telegram_webhook")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--eager", action="store_true", help="Importa main e core.exports na subida (comportamento antigo)")
+    args = parser.parse_args()
+
+    runs = [run_once(args.eager) for _ in range(args.runs)]
+    print(f"{'modo':<10} {'import':>9} {'framework':>10} {'projeto':>9} {'/health':>9} {'processo':>9}")
+    median = {key: statistics.median(r[key] for r in runs) for key in ("import_ms", "framework_ms", "app_ms",
+                                                                       "ready_ms", "process_ms")}
+    mode = "eager" if args.eager else "lazy"
+    print(
+        f"{mode:<10} {median['import_ms']:>7.1f}ms {median['framework_ms']:>8.1f}ms {median['app_ms']:>7.1f}ms "
+        f"{median['ready_ms']:>7.1f}ms {median['process_ms']:>7.1f}ms"
+    )
+    print(f"módulos pesados carregados: {', '.join(runs[-1]['loaded']) or 'nenhum'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de decodificação JSON das páginas do Kommo.
+
+Compara o `json` da biblioteca padrão com os backends rápidos instalados
+(orjson/msgspec) em páginas de leads gravadas ou sintéticas.
+
+Uso:
+  python benchmarks/bench_json_decode.py
+  python benchmarks/bench_json_decode.py --pages pagina1.json pagina2.json
+  python benchmarks/bench_json_decode.py --leads 250 --fields 30 --repeat 200
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from integrations import json_codec
+
+
+def synthetic_page(n_leads: int, n_fields: int, seed: int = 42) -> bytes:
+    """Gera uma página de /leads no formato da API v4 com `with=contacts`."""
+    rnd = random.Random(seed)
+    origins = ["Instagram", "Google Ads", "Indicação", "Facebook", "Site", "WhatsApp"]
+    leads = []
+    for i in range(n_leads):
+        lead_id = 10_000_000 + i
+        created = 1_767_225_600 + rnd.randint(0, 90 * 86400)
+        fields = []
+        for f in range(n_fields):
+            fields.append({
+                "field_id": 2_000_000 + f,
+                "field_name": f"Campo {f}",
+                "field_code": None,
+                "field_type": "select" if f % 3 == 0 else "text",
+                "values": [{"value": rnd.choice(origins), "enum_id": 5_000_000 + f}],
+            })
+        leads.append({
+            "id": lead_id,
+            "name": f"Lead {lead_id}",
+            "price": rnd.randint(0, 5000),
+            "responsible_user_id": 9_000_001,
+            "group_id": 0,
+            "status_id": rnd.choice([142, 143, 70_000_001, 70_000_002]),
+            "pipeline_id": 12_155_656,
+            "loss_reason_id": None,
+            "created_by": 0,
+            "updated_by": 0,
+            "created_at": created,
+            "updated_at": created + rnd.randint(0, 30 * 86400),
+            "closed_at": None,
+            "closest_task_at": None,
+            "is_deleted": False,
+            "custom_fields_values": fields,
+            "score": None,
+            "account_id": 31_000_000,
+            "labor_cost": None,
+            "_links": {"self": {"href": f"https://conta.kommo.com/api/v4/leads/{lead_id}?page=1&limit=250"}},
+            "_embedded": {
+                "tags": [{"id": 1, "name": "tag", "color": None}],
+                "companies": [],
+                "contacts": [{
+                    "id": 20_000_000 + i,
+                    "is_main": True,
+                    "_links": {"self": {"href": f"https://conta.kommo.com/api/v4/contacts/{20_000_000 + i}"}},
+                }],
+            },
+        })
+    page = {
+        "_page": 1,
+        "_links": {
+            "self": {"href": "https://conta.kommo.com/api/v4/leads?page=1&limit=250"},
+            "next": {"href": "https://conta.kommo.com/api/v4/leads?page=2&limit=250"},
+        },
+        "_embedded": {"leads": leads},
+    }
+    return json.dumps(page, ensure_ascii=False).encode("utf-8")
+
+
+def bench(payloads: list, repeat: int) -> float:
+    """Retorna o tempo médio (ms) para decodificar todas as páginas uma vez."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for payload in payloads:
+            json_codec.loads(payload)
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de decodificação JSON (páginas Kommo)")
+    parser.add_argument("--pages", nargs="*", default=None, help="Arquivos .json de páginas gravadas")
+    parser.add_argument("--leads", type=int, default=250, help="Leads por página sintética")
+    parser.add_argument("--fields", type=int, default=25, help="Campos customizados por lead")
+    parser.add_argument("--repeat", type=int, default=100, help="Repetições por backend")
+    args = parser.parse_args()
+
+    if args.pages:
+        payloads = []
+        for path in args.pages:
+            with open(path, "rb") as f:
+                payloads.append(f.read())
+    else:
+        payloads = [synthetic_page(args.leads, args.fields)]
+
+    total_kb = sum(len(p) for p in payloads) / 1024
+    print(f"📦 {len(payloads)} página(s), {total_kb:.0f} KB no total")
+
+    active = json_codec.BACKEND
+    results = {}
+    for backend in ("json", "orjson", "msgspec"):
+        try:
+            json_codec.set_backend(backend)
+        except ValueError:
+            print(f"  {backend:<8} indisponível")
+            continue
+        results[backend] = bench(payloads, args.repeat)
+    json_codec.set_backend(active)
+
+    baseline = results.get("json")
+    for backend, ms in results.items():
+        speedup = f"{baseline / ms:.1f}x" if baseline else "-"
+        print(f"  {backend:<8} {ms:8.2f} ms/iteração  ({speedup})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita a API v4 do Kommo, para testes de carga sem contas reais.
+
+Serve contas sintéticas (benchmarks/synthetic.py) em
+`http://<host>:<porta>/<subdomínio>/api/v4/...`, com:
+  - /account, /leads, /leads/{id}, /leads/pipelines, /leads/custom_fields,
+    /leads/unsorted, /contacts, /contacts/{id}
+  - paginação (`page`, `limit` padrão 50 e máximo 250, `_links.next`) e 204
+    para listagens vazias, como a API real
+  - filtros usados pelo projeto: filter[id], filter[pipeline_id],
+    filter[status], filter[created_at|updated_at|closed_at][from|to],
+    order[updated_at|created_at|id] e with=contacts
+  - ETag em /account, /leads/pipelines e /leads/custom_fields, com 304 para
+    If-None-Match igual (revalidação do core.metadata_cache)
+  - latência injetada (--latency-ms, --jitter-ms), limite por conta com 429
+    (--max-rps, o Kommo aceita 7/s) e falhas 500 aleatórias (--error-rate)
+
+O cliente aponta para o servidor com KOMMO_BASE_URL:
+
+  python benchmarks/fake_kommo.py --leads 20000 --latency-ms 80 --max-rps 7
+  KOMMO_BASE_URL="http://127.0.0.1:8765/{subdomain}/api/v4" python src/main.py monthly
+
+Sem --clients, cada config de config/ vira uma conta sintética com os mesmos
+IDs de pipelines, status e campos, então relatórios e exportações rodam como
+em produção. Em testes, use `FakeKommoServer` direto (porta livre, em thread).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from benchmarks.synthetic import synthetic_account
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 250
+QUERY_CACHE_SIZE = 256
+METADATA_ROUTES = ("/account", "/leads/pipelines", "/leads/custom_fields")
+
+
+def _parse_filters(params: list) -> dict:
+    """filter[campo][0]=v / filter[campo][from]=v → {"campo": {"in": {...}, "from": v, "to": v}}"""
+    filters = {}
+    for key, value in params:
+        if not key.startswith("filter["):
+            continue
+        parts = key[len("filter["):].rstrip("]").split("][")
+        spec = filters.setdefault(parts[0], {})
+        if len(parts) > 1 and parts[1] in ("from", "to"):
+            spec[parts[1]] = int(value)
+        else:
+            spec.setdefault("in", set()).add(int(value))
+    return filters
+
+
+_FILTER_KEYS = {"id": "id", "pipeline_id": "pipeline_id", "status": "status_id",
+                "created_at": "created_at", "updated_at": "updated_at", "closed_at": "closed_at"}
+
+
+def _matches(item: dict, filters: dict) -> bool:
+    for name, spec in filters.items():
+        value = item.get(_FILTER_KEYS.get(name, name))
+        if "in" in spec and value not in spec["in"]:
+            return False
+        if "from" in spec and (value is None or value < spec["from"]):
+            return False
+        if "to" in spec and (value is None or value > spec["to"]):
+            return False
+    return True
+
+
+class FakeAccount:
+    """Dados de uma conta sintética, com cache das listagens filtradas"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.subdomain = data["config"]["kommo"]["subdomain"]
+        self.leads_by_id = {lead["id"]: lead for lead in data["leads"]}
+        self.contacts_by_id = {contact["id"]: contact for contact in data["contacts"]}
+        self._queries = {}
+        self._lock = threading.Lock()
+        self._recent = deque()
+
+    def query(self, kind: str, params: list) -> list:
+        """Itens de `kind` (leads/contacts) que passam nos filtros, na ordem pedida"""
+        key = (kind, tuple(sorted((k, v) for k, v in params if k.startswith(("filter[", "order[")))))
+        with self._lock:
+            cached = self._queries.get(key)
+        if cached is not None:
+            return cached
+
+        filters = _parse_filters(params)
+        items = self.data[kind]
+        if "id" in filters and set(filters["id"]) == {"in"}:
+            by_id = self.leads_by_id if kind == "leads" else self.contacts_by_id
+            items = [by_id[i] for i in sorted(filters["id"]["in"]) if i in by_id]
+        result = [item for item in items if _matches(item, filters)]
+        for key_name, direction in params:
+            if key_name.startswith("order["):
+                field = key_name[len("order["):-1]
+                result.sort(key=lambda item: item.get(field) or 0, reverse=direction == "desc")
+
+        with self._lock:
+            if len(self._queries) >= QUERY_CACHE_SIZE:
+                self._queries.pop(next(iter(self._queries)))
+            self._queries[key] = result
+        return result
+
+    def allow(self, max_rps: float) -> bool:
+        """Janela deslizante de 1s por conta (429 acima de max_rps)"""
+        if not max_rps:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= max_rps:
+                return False
+            self._recent.append(now)
+            return True
+
+
+def _strip_contacts(lead: dict) -> dict:
+    embedded = {k: v for k, v in lead["_embedded"].items() if k != "contacts"}
+    return {**lead, "_embedded": embedded}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - assinatura do BaseHTTPRequestHandler
+        pass
+
+    def do_GET(self):
+        fake = self.server.fake
+        url = urlsplit(self.path)
+        params = parse_qsl(url.query, keep_blank_values=True)
+        parts = [p for p in url.path.split("/") if p]
+        if len(parts) < 3 or parts[1:3] != ["api", "v4"]:
+            return self._send(404, {"title": "Not Found"})
+        account = fake.accounts.get(parts[0])
+        route = "/" + "/".join(parts[3:])
+        fake.record(parts[0], route)
+
+        if account is None:
+            return self._send(404, {"title": "Account not found"})
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._send(401, {"title": "Unauthorized"})
+        if not account.allow(fake.max_rps):
+            fake.record_status(429)
+            return self._send(429, None)
+        fake.sleep()
+        if fake.fail():
+            fake.record_status(500)
+            return self._send(500, {"title": "Internal Server Error"})
+
+        status, body = fake.route(account, parts[3:], params, url)
+        if status == 200 and route in METADATA_ROUTES:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            etag = '"%s"' % hashlib.sha1(payload).hexdigest()[:16]
+            if self.headers.get("If-None-Match") == etag:
+                fake.record_status(304)
+                return self._send(304, None, etag)
+            fake.record_status(status)
+            return self._send(status, body, etag)
+        fake.record_status(status)
+        self._send(status, body)
+
+    def _send(self, status: int, body, etag: str = None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        if payload:
+            self.send_header("Content-Type", "application/hal+json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if payload:
+            self.wfile.write(payload)
+
+
+class FakeKommoServer:
+    """
+    Servidor falso em thread. `base_url` é o modelo para KOMMO_BASE_URL /
+    KommoClient(base_url=...). `calls` conta requisições por (subdomínio, rota).
+    """
+
+    def __init__(self, accounts: list, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0,
+                 jitter_ms: float = 0, max_rps: float = 0, error_rate: float = 0, seed: int = 0):
+        self.accounts = {a.subdomain: a for a in (FakeAccount(data) for data in accounts)}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.max_rps = max_rps
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.statuses = Counter()
+        self._random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{{subdomain}}/api/v4"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-kommo", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ─── Estatísticas e falhas injetadas ─────────────────────────────────────
+
+    def record(self, subdomain: str, route: str):
+        label = "/".join("{id}" if p.isdigit() else p for p in route.split("/"))
+        with self._stats_lock:
+            self.calls[(subdomain, label)] += 1
+
+    def record_status(self, status: int):
+        with self._stats_lock:
+            self.statuses[status] += 1
+
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def sleep(self):
+        if self.latency_ms or self.jitter_ms:
+            with self._stats_lock:
+                jitter = self._random.uniform(0, self.jitter_ms)
+            time.sleep((self.latency_ms + jitter) / 1000)
+
+    def fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._stats_lock:
+            return self._random.random() < self.error_rate
+
+    # ─── Rotas da API v4 ─────────────────────────────────────────────────────
+
+    def route(self, account: FakeAccount, parts: list, params: list, url) -> tuple:
+        data = account.data
+        if parts == ["account"]:
+            return 200, data["account"]
+        if parts == ["leads", "pipelines"]:
+            return 200, {"_embedded": {"pipelines": data["pipelines"]}}
+        if parts == ["leads", "custom_fields"]:
+            return 200, {"_page": 1, "_embedded": {"custom_fields": data["custom_fields"]}}
+        if parts == ["leads", "unsorted"]:
+            return 204, None
+        if len(parts) == 2 and parts[1].isdigit() and parts[0] in ("leads", "contacts"):
+            by_id = account.leads_by_id if parts[0] == "leads" else account.contacts_by_id
+            item = by_id.get(int(parts[1]))
+            return (200, item) if item else (404, {"title": "Not Found"})
+        if parts in (["leads"], ["contacts"]):
+            return self._list(account, parts[0], params, url)
+        return 404, {"title": "Not Found"}
+
+    def _list(self, account: FakeAccount, kind: str, params: list, url) -> tuple:
+        items = account.query(kind, params)
+        options = dict(params)
+        limit = min(MAX_LIMIT, int(options.get("limit", DEFAULT_LIMIT)))
+        page = max(1, int(options.get("page", 1)))
+        chunk = items[(page - 1) * limit:page * limit]
+        if not chunk:
+            return 204, None
+        if kind == "leads" and "contacts" not in options.get("with", ""):
+            chunk = [_strip_contacts(lead) for lead in chunk]
+
+        base = f"http://{self._httpd.server_address[0]}:{self._httpd.server_address[1]}{url.path}"
+        links = {"self": {"href": f"{base}?page={page}&limit={limit}"}}
+        if page * limit < len(items):
+            links["next"] = {"href": f"{base}?page={page + 1}&limit={limit}"}
+        return 200, {"_page": page, "_links": links, "_embedded": {kind: chunk}}
+
+
+def accounts_from_configs(client_ids: list, n_leads: int, seed: int = 42) -> list:
+    """Uma conta sintética por cliente de config/, com os IDs da config"""
+    from core.config_loader import ConfigLoader
+    return [
+        synthetic_account(n_leads, config=ConfigLoader.load_client_config(client_id), seed=seed + i)
+        for i, client_id in enumerate(client_ids)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API v4 do Kommo")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", nargs="*", default=None,
+                        help="Clientes de config/ servidos (padrão: todos); --synthetic N ignora config/")
+    parser.add_argument("--synthetic", type=int, default=0, help="Número de contas sintéticas sem config")
+    parser.add_argument("--leads", type=int, default=5000, help="Leads por conta")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--max-rps", type=float, default=0, help="Requisições/s por conta antes do 429 (0 = sem limite)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fração de respostas 500")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        accounts = [synthetic_account(args.leads, subdomain=f"sintetica{i}", seed=args.seed + i)
+                    for i in range(args.synthetic)]
+    else:
+        from core.config_loader import ConfigLoader
+        accounts = accounts_from_configs(args.clients or ConfigLoader.list_clients(), args.leads, args.seed)
+
+    server = FakeKommoServer(accounts, args.host, args.port, args.latency_ms, args.jitter_ms,
+                             args.max_rps, args.error_rate, args.seed)
+    print(f"🧪 Kommo falso com {len(accounts)} contas × {args.leads} leads")
+    print(f'   KOMMO_BASE_URL="{server.base_url}"')
+    for subdomain in server.accounts:
+        print(f"   - {subdomain}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Bot API do Telegram falsa, para testes de carga do webhook.
+
+Responde `sendMessage`, `sendDocument` e `getMe` com `{"ok": true}` em
+`http://<host>:<porta>/bot<token>/<método>`, com latência opcional, e conta
+as chamadas por método. O messenger aponta para ela com TELEGRAM_API_URL.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - assinatura do BaseHTTPRequestHandler
+        pass
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        # Corpo descartado (JSON ou multipart do sendDocument); só o tamanho é contado
+        length = int(self.headers.get("Content-Length") or 0)
+        remaining = length
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 65536))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        self._reply(length)
+
+    def _reply(self, body_bytes: int = 0):
+        fake = self.server.fake
+        method = self.path.rsplit("/", 1)[-1].split("?")[0]
+        message_id = fake.record(method, body_bytes)
+        if fake.latency_ms:
+            time.sleep(fake.latency_ms / 1000)
+        payload = json.dumps({"ok": True, "result": {"message_id": message_id}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeTelegramServer:
+    """Servidor em thread; `api_url` vai em TELEGRAM_API_URL, `calls` conta por método"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.calls = Counter()
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, method: str, body_bytes: int) -> int:
+        with self._lock:
+            self.calls[method] += 1
+            self.bytes_received += body_bytes
+            return sum(self.calls.values())
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, name="fake-telegram", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
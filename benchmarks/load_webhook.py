@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Teste de carga de ponta a ponta do servidor de webhooks.
+
+Dispara updates do Telegram (comandos de texto do COMMAND_MAP e callbacks
+`cmd:` do menu, ou updates gravados com --updates) contra
+`telegram_webhook.app` em taxa fixa (malha aberta: um ack lento não atrasa
+os próximos envios), com o Kommo falso (benchmarks/fake_kommo.py) e a Bot API
+falsa (benchmarks/fake_telegram.py) no lugar dos serviços reais.
+
+A app roda no mesmo processo, chamada direto pela interface ASGI. Os chats
+dos updates são distribuídos entre os clientes de config/ e cada conta do
+Kommo falso usa os IDs da config do cliente. Arquivos (logs, exports, data)
+ficam numa pasta temporária.
+
+Relata:
+  - latência do ack (p50/p95/p99/máx) vista pelo cliente e status HTTP
+  - tempo de conclusão dos jobs (relatórios/exportações), da fila ao fim
+  - pico de threads e de RSS do processo
+  - chamadas ao Kommo por rota e status (429/500) e ao Telegram por método
+
+Uso:
+  python benchmarks/load_webhook.py --rate 20 --duration 30
+  python benchmarks/load_webhook.py --mix exports --leads 20000 --kommo-latency-ms 80 --max-rps 7
+  python benchmarks/load_webhook.py --updates updates_gravados.jsonl --rate 50 --out carga.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+MIXES = ("all", "reports", "exports")
+
+
+def percentiles(samples: list, scale: float = 1.0) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * scale, 3)
+
+    return {"count": len(ordered), "p50": pct(50), "p95": pct(95), "p99": pct(99),
+            "max": round(ordered[-1] * scale, 3)}
+
+
+def synthetic_updates(count: int, mix: str, seed: int, chat_base: int = 900_000) -> list:
+    """Updates de texto e de callback (`cmd:`) com comandos do COMMAND_MAP"""
+    from handlers.telegram_commands import COMMAND_MAP
+
+    rnd = random.Random(seed)
+    commands = [c for c in COMMAND_MAP if c not in ("/help", "/start")]
+    if mix == "reports":
+        commands = [c for c in commands if not COMMAND_MAP[c].startswith("export_")]
+    elif mix == "exports":
+        commands = [c for c in commands if COMMAND_MAP[c].startswith("export_")]
+
+    updates = []
+    for n in range(count):
+        command = rnd.choice(commands)
+        chat = {"id": chat_base + n, "type": "group"}
+        if rnd.random() < 0.5:
+            updates.append({"update_id": n, "message": {"message_id": n, "chat": chat, "text": command,
+                                                        "date": int(time.time())}})
+        else:
+            updates.append({"update_id": n, "callback_query": {"id": str(n), "data": f"cmd:{command}",
+                                                               "message": {"message_id": n, "chat": chat}}})
+    return updates
+
+
+def _rss_mib() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+class _Sampler(threading.Thread):
+    """Amostra threads ativas e RSS a cada `interval` segundos"""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(name="load-sampler", daemon=True)
+        self.interval = interval
+        self.threads = []
+        self.rss = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.threads.append(threading.active_count())
+            rss = _rss_mib()
+            if rss is not None:
+                self.rss.append(rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+async def _post(app, body: bytes) -> int:
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/telegram/webhook", "raw_path": b"/telegram/webhook", "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json")], "client": ("127.0.0.1", 0),
+        "server": ("loadtest", 80),
+    }
+    await app(scope, receive, send)
+    return next(m["status"] for m in messages if m["type"] == "http.response.start")
+
+
+async def _replay(app, bodies: list, rate: float) -> tuple:
+    """Envia em taxa fixa; retorna (latências de ack em s, status)"""
+    latencies, statuses = [], []
+
+    async def one(body):
+        started = time.perf_counter()
+        status = await _post(app, body)
+        latencies.append(time.perf_counter() - started)
+        statuses.append(status)
+
+    tasks = []
+    t0 = time.perf_counter()
+    for i, body in enumerate(bodies):
+        delay = t0 + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(body)))
+    await asyncio.gather(*tasks)
+    return latencies, statuses
+
+
+def _drain(queues, timeout: float) -> bool:
+    """Espera as filas esvaziarem (updates antes de jobs); False se estourar o tempo"""
+    done = threading.Event()
+
+    def join_all():
+        for q in queues:
+            q.join()
+        done.set()
+
+    threading.Thread(target=join_all, daemon=True).start()
+    return done.wait(timeout)
+
+
+def run_load(rate: float, duration: float, mix: str = "all", clients: list = None, leads: int = 2000,
+             updates: list = None, kommo_latency_ms: float = 0, telegram_latency_ms: float = 0,
+             max_rps: float = 0, error_rate: float = 0, seed: int = 42, drain_timeout: float = 600) -> dict:
+    """Roda a carga no processo atual e retorna o relatório (dict)"""
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "load-test")
+    previous_cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory(prefix="load_webhook_", ignore_cleanup_errors=True)
+    os.chdir(workdir.name)  # logs/, exports/ e data/ do servidor ficam fora do repositório
+    try:
+        from benchmarks.fake_kommo import FakeKommoServer, accounts_from_configs
+        from benchmarks.fake_telegram import FakeTelegramServer
+        from core import work_queue
+        from core.config_loader import ConfigLoader
+        from integrations import kommo_client, messenger
+        import telegram_webhook
+
+        clients = clients or ConfigLoader.list_clients()
+        accounts = accounts_from_configs(clients, leads, seed)
+        if updates is None:
+            updates = synthetic_updates(max(1, int(rate * duration)), mix, seed)
+        bodies = [json.dumps(u).encode() for u in updates]
+
+        job_seconds = []
+        original_submit = work_queue.jobs.submit
+        original_resolver = telegram_webhook.get_client_by_chat_id
+        original_kommo_url, original_telegram_url = kommo_client.KOMMO_BASE_URL, messenger.TELEGRAM_API_URL
+
+        def timed_submit(fn, *args):
+            enqueued = time.perf_counter()
+
+            def job(*job_args):
+                try:
+                    fn(*job_args)
+                finally:
+                    job_seconds.append(time.perf_counter() - enqueued)
+            return original_submit(job, *args)
+
+        def resolve_chat(chat_id):
+            return clients[hash(chat_id) % len(clients)]
+
+        with FakeKommoServer(accounts, latency_ms=kommo_latency_ms, max_rps=max_rps, error_rate=error_rate,
+                             seed=seed) as kommo, FakeTelegramServer(latency_ms=telegram_latency_ms) as telegram:
+            kommo_client.KOMMO_BASE_URL = kommo.base_url
+            messenger.TELEGRAM_API_URL = telegram.api_url
+            work_queue.jobs.submit = timed_submit
+            telegram_webhook.get_client_by_chat_id = resolve_chat
+            sampler = _Sampler()
+            sampler.start()
+            try:
+                started = time.perf_counter()
+                latencies, statuses = asyncio.run(_replay(telegram_webhook.app, bodies, rate))
+                send_elapsed = time.perf_counter() - started
+                drained = _drain([work_queue.updates, work_queue.jobs], drain_timeout)
+                total_elapsed = time.perf_counter() - started
+            finally:
+                sampler.stop()
+                work_queue.jobs.submit = original_submit
+                telegram_webhook.get_client_by_chat_id = original_resolver
+                kommo_client.KOMMO_BASE_URL = original_kommo_url
+                messenger.TELEGRAM_API_URL = original_telegram_url
+
+            kommo_calls = {f"{sub}{route}": n for (sub, route), n in sorted(kommo.calls.items())}
+            by_route = {}
+            for (_, route), n in kommo.calls.items():
+                by_route[route] = by_route.get(route, 0) + n
+            report = {
+                "updates": len(bodies),
+                "rate": rate,
+                "achieved_rate": round(len(bodies) / send_elapsed, 2) if send_elapsed else None,
+                "send_elapsed_s": round(send_elapsed, 3),
+                "total_elapsed_s": round(total_elapsed, 3),
+                "drained": drained,
+                "http_status": {str(s): statuses.count(s) for s in sorted(set(statuses))},
+                "ack_ms": percentiles(latencies, 1000),
+                "server_ack_ms": work_queue.ack_percentiles(),
+                "job_s": percentiles(job_seconds),
+                "threads_max": max(sampler.threads, default=threading.active_count()),
+                "rss_mib": {
+                    "start": round(sampler.rss[0], 1) if sampler.rss else None,
+                    "end": round(sampler.rss[-1], 1) if sampler.rss else None,
+                    "max": round(max(sampler.rss), 1) if sampler.rss else None,
+                    # ru_maxrss em KiB no Linux: pico de toda a vida do processo
+                    "peak_process": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                },
+                "kommo": {
+                    "calls": kommo.total_calls(),
+                    "by_route": dict(sorted(by_route.items())),
+                    "by_account_route": kommo_calls,
+                    "status": {str(k): v for k, v in sorted(kommo.statuses.items())},
+                },
+                "telegram": {"calls": dict(telegram.calls), "bytes_received": telegram.bytes_received},
+                "clients": clients,
+                "leads_per_account": leads,
+            }
+        return report
+    finally:
+        os.chdir(previous_cwd)
+        workdir.cleanup()
+
+
+def print_report(report: dict):
+    ack, job = report["ack_ms"], report["job_s"]
+    print(f"📨 {report['updates']} updates a {report['rate']}/s (real {report['achieved_rate']}/s), "
+          f"status {report['http_status']}")
+    if ack["count"]:
+        print(f"⚡ ack: p50 {ack['p50']} ms  p95 {ack['p95']} ms  p99 {ack['p99']} ms  máx {ack['max']} ms")
+    if job["count"]:
+        print(f"🧱 jobs ({job['count']}): p50 {job['p50']} s  p95 {job['p95']} s  p99 {job['p99']} s  máx {job['max']} s")
+    print(f"🧵 threads (pico): {report['threads_max']}   💾 RSS pico: {report['rss_mib']['max']} MiB")
+    kommo = report["kommo"]
+    print(f"🔌 Kommo: {kommo['calls']} chamadas {kommo['status']}")
+    for route, n in kommo["by_route"].items():
+        print(f"   {route:<24} {n}")
+    print(f"📤 Telegram: {report['telegram']['calls']}")
+    print(f"⏱️ envio {report['send_elapsed_s']} s, total com filas {report['total_elapsed_s']} s"
+          + ("" if report["drained"] else " (filas não esvaziaram no tempo limite)"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do webhook do Telegram")
+    parser.add_argument("--rate", type=float, default=10, help="Updates por segundo")
+    parser.add_argument("--duration", type=float, default=10, help="Segundos de envio")
+    parser.add_argument("--mix", choices=MIXES, default="all", help="Comandos sorteados (sem --updates)")
+    parser.add_argument("--updates", default=None, help="Arquivo JSONL com updates gravados")
+    parser.add_argument("--clients", nargs="*", default=None, help="Clientes de config/ (padrão: todos)")
+    parser.add_argument("--leads", type=int, default=2000, help="Leads por conta no Kommo falso")
+    parser.add_argument("--kommo-latency-ms", type=float, default=0)
+    parser.add_argument("--telegram-latency-ms", type=float, default=0)
+    parser.add_argument("--max-rps", type=float, default=0, help="Limite por conta no Kommo falso (429)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fração de 500 no Kommo falso")
+    parser.add_argument("--drain-timeout", type=float, default=600, help="Espera máxima pelas filas (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL do servidor durante a carga")
+    parser.add_argument("--out", default=None, help="Grava o relatório em JSON")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", args.log_level)
+    updates = None
+    if args.updates:
+        with open(args.updates, encoding="utf-8") as f:
+            updates = [json.loads(line) for line in f if line.strip()]
+
+    report = run_load(args.rate, args.duration, args.mix, args.clients, args.leads, updates,
+                      args.kommo_latency_ms, args.telegram_latency_ms, args.max_rps, args.error_rate,
+                      args.seed, args.drain_timeout)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📝 Relatório: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
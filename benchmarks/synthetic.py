@@ -0,0 +1,204 @@
+"""
+Contas sintéticas do Kommo para benchmarks e testes de carga.
+
+`synthetic_account` gera pipelines, status, campos customizados, leads e
+contatos com a mesma forma da API v4, usando os IDs de uma config de cliente
+(config/*.json) quando informada — assim o código real (relatórios,
+exportações) roda contra o servidor falso (benchmarks/fake_kommo.py) sem
+ajustes. Determinístico para a mesma semente.
+"""
+
+import random
+import time
+
+ORIGINS = ["Instagram", "Google Ads", "Indicação", "Facebook", "Site", "WhatsApp"]
+# Distribuição próxima à das contas reais: poucas origens concentram a maioria
+ORIGIN_WEIGHTS = [38, 22, 15, 10, 9, 6]
+BOT_ORIGINS = ["Bot Instagram", "Bot WhatsApp", "Bot Site"]
+SECRETARY_ORIGINS = ["Telefone", "Presencial", "Retorno"]
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Isabela", "João"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Santos", "Lima", "Costa", "Pereira", "Almeida"]
+
+ACTIVE_STATUS_IDS = [70_000_001, 70_000_002, 70_000_003]
+
+DEFAULT_CONFIG = {
+    "client_name": "Conta Sintética",
+    "kommo": {
+        "subdomain": "sintetica",
+        "origin_field_id": 1_000_001,
+        "origin_bot_field_id": 1_000_002,
+        "secretary_origin_field_id": 1_000_003,
+        "won_status_id": 142,
+        "lost_status_id": 143,
+        "pipeline_id": 10_000_001,
+        "pipeline_followup_id": [10_000_002],
+    },
+    "notifications": {"telegram_chat_id": "", "clickup_list_id": ""},
+    "settings": {"report_day": "Monday", "timezone": "America/Sao_Paulo"},
+}
+
+
+def _copy_config(config: dict | None, subdomain: str | None) -> dict:
+    base = config or DEFAULT_CONFIG
+    copied = {**base, "kommo": dict(base["kommo"])}
+    if subdomain:
+        copied["kommo"]["subdomain"] = subdomain
+    copied["kommo"].setdefault("api_token", "token-sintetico")
+    return copied
+
+
+EXTRA_FIELD_TYPES = ["text", "numeric", "date", "multiselect", "checkbox", "url"]
+
+
+def _extra_field(rnd: random.Random, index: int, created: int) -> dict:
+    """Campo sem uso nos relatórios, nos formatos que a API devolve para cada tipo"""
+    field_type = EXTRA_FIELD_TYPES[index % len(EXTRA_FIELD_TYPES)]
+    if field_type == "numeric":
+        values = [{"value": str(rnd.randint(0, 10_000))}]
+    elif field_type == "date":
+        values = [{"value": created + rnd.randint(0, 60) * 86400}]
+    elif field_type == "multiselect":
+        values = [{"value": f"Opção {k}", "enum_id": 1_300_000 + k} for k in rnd.sample(range(8), rnd.randint(1, 3))]
+    elif field_type == "checkbox":
+        values = [{"value": rnd.random() < 0.5}]
+    elif field_type == "url":
+        values = [{"value": f"https://exemplo.com.br/campanha/{rnd.randint(1, 500)}"}]
+    else:
+        values = [{"value": f"Observação {rnd.randint(0, 999)} " + "x" * rnd.randint(0, 80)}]
+    return {"field_id": 1_100_000 + index, "field_name": f"Campo {index}", "field_code": None,
+            "field_type": field_type, "values": values}
+
+
+def _select_field(field_id: int, name: str, options: list) -> dict:
+    return {
+        "id": field_id,
+        "name": name,
+        "type": "select",
+        "enums": [{"id": field_id * 10 + i, "value": value, "sort": i} for i, value in enumerate(options)],
+    }
+
+
+def _pipelines(config: dict) -> list:
+    kommo = config["kommo"]
+    statuses = [
+        {"id": status_id, "name": f"Etapa {i + 1}", "sort": (i + 1) * 10, "type": 0}
+        for i, status_id in enumerate(ACTIVE_STATUS_IDS)
+    ] + [
+        {"id": kommo["won_status_id"], "name": "Venda ganha", "sort": 10000, "type": 0},
+        {"id": kommo["lost_status_id"], "name": "Venda perdida", "sort": 11000, "type": 0},
+    ]
+    ids = [kommo["pipeline_id"]] + list(kommo.get("pipeline_followup_id") or [])
+    return [
+        {"id": pid, "name": "Funil principal" if i == 0 else f"Follow-up {i}", "is_main": i == 0,
+         "_embedded": {"statuses": statuses}}
+        for i, pid in enumerate(ids)
+    ]
+
+
+def synthetic_account(n_leads: int, config: dict = None, subdomain: str = None, seed: int = 42,
+                      days: int = 365, now: int = None, extra_fields: int = 5) -> dict:
+    """
+    Conta sintética: {"config", "account", "pipelines", "custom_fields", "leads", "contacts"}.
+    Leads criados nos últimos `days` dias; ~25% ganhos, ~35% perdidos, ~10% em follow-up.
+    """
+    rnd = random.Random(seed)
+    config = _copy_config(config, subdomain)
+    kommo = config["kommo"]
+    now = int(now or time.time())
+    start = now - days * 86400
+    followups = list(kommo.get("pipeline_followup_id") or [])
+
+    origin_fields = [
+        (kommo.get("origin_field_id"), "Origem", ORIGINS, ORIGIN_WEIGHTS, 0.9),
+        (kommo.get("origin_bot_field_id"), "Origem Bot", BOT_ORIGINS, None, 0.3),
+        (kommo.get("secretary_origin_field_id"), "Origem Secretária", SECRETARY_ORIGINS, None, 0.4),
+    ]
+    origin_fields = [f for f in origin_fields if f[0]]
+    custom_fields = [_select_field(fid, name, options) for fid, name, options, _, _ in origin_fields]
+    custom_fields += [
+        {"id": 1_100_000 + i, "name": f"Campo {i}", "type": EXTRA_FIELD_TYPES[i % len(EXTRA_FIELD_TYPES)],
+         "enums": None}
+        for i in range(extra_fields)
+    ]
+
+    leads, contacts = [], []
+    for i in range(n_leads):
+        lead_id = 30_000_000 + i
+        contact_id = 40_000_000 + i
+        created = rnd.randint(start, now)
+        roll = rnd.random()
+        if roll < 0.25:
+            status_id = kommo["won_status_id"]
+        elif roll < 0.60:
+            status_id = kommo["lost_status_id"]
+        else:
+            status_id = rnd.choice(ACTIVE_STATUS_IDS)
+        pipeline_id = rnd.choice(followups) if followups and rnd.random() < 0.1 else kommo["pipeline_id"]
+        closed = None
+        if status_id in (kommo["won_status_id"], kommo["lost_status_id"]):
+            closed = min(now, created + rnd.randint(0, 30 * 86400))
+        updated = min(now, (closed or created) + rnd.randint(0, 5 * 86400))
+
+        fields = []
+        for field_id, name, options, weights, share in origin_fields:
+            if rnd.random() < share:
+                value = rnd.choices(options, weights)[0]
+                fields.append({"field_id": field_id, "field_name": name, "field_code": None, "field_type": "select",
+                               "values": [{"value": value, "enum_id": field_id * 10 + options.index(value)}]})
+        for f in range(extra_fields):
+            if rnd.random() < 0.7:
+                fields.append(_extra_field(rnd, f, created))
+
+        name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+        leads.append({
+            "id": lead_id,
+            "name": f"Lead {name}",
+            "price": rnd.randint(0, 5000),
+            "responsible_user_id": 9_000_001,
+            "group_id": 0,
+            "status_id": status_id,
+            "pipeline_id": pipeline_id,
+            "loss_reason_id": None,
+            "created_by": 0,
+            "updated_by": 0,
+            "created_at": created,
+            "updated_at": updated,
+            "closed_at": closed,
+            "closest_task_at": None,
+            "is_deleted": False,
+            "custom_fields_values": fields or None,
+            "score": None,
+            "account_id": 31_000_000,
+            "_embedded": {
+                "tags": [],
+                "companies": [],
+                "contacts": [{"id": contact_id, "is_main": True}],
+            },
+        })
+        contact_fields = []
+        if rnd.random() < 0.85:
+            contact_fields.append({"field_id": 1_200_001, "field_name": "Telefone", "field_code": "PHONE",
+                                   "field_type": "multitext",
+                                   "values": [{"value": f"+55 11 9{rnd.randint(0, 99_999_999):08d}",
+                                               "enum_code": "WORK"}]})
+        contacts.append({
+            "id": contact_id,
+            "name": name,
+            "first_name": name.split()[0],
+            "last_name": name.split()[1],
+            "responsible_user_id": 9_000_001,
+            "created_at": created,
+            "updated_at": created,
+            "custom_fields_values": contact_fields or None,
+            "account_id": 31_000_000,
+        })
+
+    return {
+        "config": config,
+        "account": {"id": 31_000_000, "name": config.get("client_name", kommo["subdomain"]),
+                    "subdomain": kommo["subdomain"], "currency": "BRL", "country": "BR"},
+        "pipelines": _pipelines(config),
+        "custom_fields": custom_fields,
+        "leads": leads,
+        "contacts": contacts,
+    }
@@ -101,8 +101,7 @@ def discover_config(client_id: str):
     # 1. Listar pipelines
     print(f"\n📋 Descobrindo pipelines...")
     try:
-        response = client._request_get(f"{client.base_url}/leads/pipelines", {})
-        pipelines = response.get("_embedded", {}).get("pipelines", [])
+        pipelines = client.get_pipelines()
         if pipelines:
             print(f"   Pipelines encontradas:")
             for p in pipelines:
@@ -22,75 +22,12 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from core.analytics import AnalyticsEngine
 from core.config_loader import ConfigLoader
+from core import profiling, reporting, rollups
 from integrations.kommo_client import KommoClient
+from integrations.kommo_schema import lead_field_ids_from_config
 
-
-MESES_PT = [
-    "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
-    "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro",
-]
-
-
-def month_timestamps_to_epoch(start_dt: datetime, end_dt: datetime):
-    return int(start_dt.timestamp()), int(end_dt.timestamp())
-
-
-def get_month_timestamps(year: int, month: int):
-    first_day = datetime(year, month, 1, 0, 0, 0)
-    if month == 12:
-        last_day = datetime(year + 1, 1, 1, 0, 0, 0) - timedelta(seconds=1)
-    else:
-        last_day = datetime(year, month + 1, 1, 0, 0, 0) - timedelta(seconds=1)
-    return month_timestamps_to_epoch(first_day, last_day)
-
-
-def fetch_all_leads(client: KommoClient, params: dict) -> list:
-    return (
-        client._request_get_all_pages(f"{client.base_url}/leads", params)
-        .get("_embedded", {})
-        .get("leads", [])
-    )
-
-
-def fetch_all_leads_for_pipelines(client: KommoClient, pipeline_ids: list, params_base: dict) -> list:
-    """
-    Busca leads para múltiplas pipelines e retorna lista única (deduplicada por id).
-    """
-    all_leads = []
-    seen = set()
-    for p in pipeline_ids:
-        params = params_base.copy()
-        params["filter[pipeline_id][0]"] = p
-        leads = fetch_all_leads(client, params)
-        for lead in leads:
-            lid = lead.get("id")
-            if lid and lid not in seen:
-                seen.add(lid)
-                all_leads.append(lead)
-    return all_leads
-
-
-def origin_breakdown(leads: list, field_id: int) -> dict:
-    counts: dict = {}
-    for lead in leads:
-        val = AnalyticsEngine.get_origin_value(lead, field_id)
-        counts[val] = counts.get(val, 0) + 1
-    return dict(sorted(counts.items(), key=lambda x: x[1], reverse=True))
-
-
-def markdown_origin_table(created_by_origin: dict, won_by_origin: dict, total_created: int) -> list:
-    lines = [
-        "| Origem | Leads | % Leads | Ganhos | Conv% |",
-        "|---|---:|---:|---:|---:|",
-    ]
-    for origin, created in created_by_origin.items():
-        won = won_by_origin.get(origin, 0)
-        pct_leads = round(created / total_created * 100, 1) if total_created else 0.0
-        conv = round(won / created * 100, 1) if created else 0.0
-        lines.append(f"| {origin} | {created} | {pct_leads:.1f}% | {won} | {conv:.1f}% |")
-    return lines
+DIMENSIONS = ("manual", "bot", "secretary")
 
 
 def discover_fields(client: KommoClient):
@@ -114,99 +51,29 @@ def discover_fields(client: KommoClient):
     )
 
 
-def print_origin_table(title: str, created_by_origin: dict, won_by_origin: dict, total_created: int):
-    print(f"\n  {title}")
-    print(f"  {'Origem':<32} {'Leads':>6}  {'% Leads':>7}  {'Ganhos':>7}  {'Conv%':>6}")
-    print(f"  {'─'*32} {'─'*6}  {'─'*7}  {'─'*7}  {'─'*6}")
-    for origin, created in created_by_origin.items():
-        won = won_by_origin.get(origin, 0)
-        pct_leads = round(created / total_created * 100, 1) if total_created else 0.0
-        conv = round(won / created * 100, 1) if created else 0.0
-        print(f"  {origin:<32} {created:>6}  {pct_leads:>6.1f}%  {won:>7}  {conv:>5.1f}%")
-
-
-def collect_month_report(client: KommoClient, config: dict, year: int, month: int) -> dict:
-    origin_field_id = config["kommo"]["origin_field_id"]
-    origin_bot_field_id = config["kommo"].get("origin_bot_field_id")
-    secretary_field_id = config["kommo"].get("secretary_origin_field_id")
-    pipeline_id = config["kommo"]["pipeline_id"]
-    pipeline_followups = config["kommo"].get("pipeline_followup_id") or []
-    pipeline_ids = [pipeline_id] + pipeline_followups
-    won_status_id = config["kommo"]["won_status_id"]
-    lost_status_id = config["kommo"]["lost_status_id"]
-
-    start_ts, end_ts = get_month_timestamps(year, month)
-    leads_created = fetch_all_leads_for_pipelines(
-        client,
-        pipeline_ids,
-        {
-            "filter[created_at][from]": start_ts,
-            "filter[created_at][to]": end_ts,
-        },
-    )
-    leads_won = fetch_all_leads_for_pipelines(
-        client,
-        pipeline_ids,
-        {
-            "filter[status][0]": won_status_id,
-            "filter[closed_at][from]": start_ts,
-            "filter[closed_at][to]": end_ts,
-        },
-    )
-    leads_lost = fetch_all_leads_for_pipelines(
-        client,
-        pipeline_ids,
-        {
-            "filter[status][0]": lost_status_id,
-            "filter[closed_at][from]": start_ts,
-            "filter[closed_at][to]": end_ts,
-        },
-    )
-
-    manual_created = origin_breakdown(leads_created, origin_field_id)
-    manual_won = {}
-    for lead in leads_won:
-        val = AnalyticsEngine.get_origin_value(lead, origin_field_id)
-        manual_won[val] = manual_won.get(val, 0) + 1
+def _collect(client: KommoClient, client_id: str, config: dict, periods: list, store=None) -> list:
+    if store is not None:
+        return reporting.build_report_from_rollups(store, config, periods, DIMENSIONS)
+    return reporting.build_report_cached(client, client_id, config, periods, DIMENSIONS)
 
-    bot_created = None
-    bot_won = None
-    if origin_bot_field_id:
-        bot_created = origin_breakdown(leads_created, origin_bot_field_id)
-        bot_won = {}
-        for lead in leads_won:
-            val = AnalyticsEngine.get_origin_value(lead, origin_bot_field_id)
-            bot_won[val] = bot_won.get(val, 0) + 1
 
-    sec_created = None
-    sec_won = None
-    if secretary_field_id:
-        sec_created = origin_breakdown(leads_created, secretary_field_id)
-        sec_won = {}
-        for lead in leads_won:
-            val = AnalyticsEngine.get_origin_value(lead, secretary_field_id)
-            sec_won[val] = sec_won.get(val, 0) + 1
+@profiling.profiled("collect_month_report")
+def collect_month_report(client: KommoClient, client_id: str, config: dict, year: int, month: int,
+                         store=None) -> dict:
+    """Resultado do mês; com `store`, somando os agregados diários (core.rollups) em vez de buscar leads"""
+    return _collect(client, client_id, config, [reporting.month_period(year, month)], store)[0]
 
-    n_created = len(leads_created)
-    n_won = len(leads_won)
-    n_lost = len(leads_lost)
-    conv = round(n_won / n_created * 100, 1) if n_created else 0.0
 
-    return {
-        "year": year,
-        "month": month,
-        "month_name": MESES_PT[month - 1],
-        "n_created": n_created,
-        "n_won": n_won,
-        "n_lost": n_lost,
-        "conv": conv,
-        "manual_created": manual_created,
-        "manual_won": manual_won,
-        "bot_created": bot_created,
-        "bot_won": bot_won,
-        "sec_created": sec_created,
-        "sec_won": sec_won,
-    }
+def collect_year_to_date_reports(client: KommoClient, client_id: str, config: dict, year: int, end_month: int,
+                                 store=None) -> list:
+    """
+    Um resultado por mês de janeiro a `end_month` e, por último, o acumulado
+    do ano, com uma busca por conjunto no intervalo todo
+    """
+    periods = [reporting.month_period(year, month) for month in range(1, end_month + 1)]
+    # O acumulado do ano sai na mesma passada, como mais um período
+    periods.append(reporting.span_period(f"Janeiro a {reporting.MESES_PT[end_month - 1]} {year}", periods))
+    return _collect(client, client_id, config, periods, store)
 
 
 def main():
@@ -231,10 +98,19 @@ def main():
         action="store_true",
         help="Gera um relatório acumulado do ano com um bloco por mês",
     )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Responde pelos agregados diários (sincronização incremental, sem varrer leads)",
+    )
     args = parser.parse_args()
 
     config = ConfigLoader.load_client_config(args.client)
-    client = KommoClient(config["kommo"]["subdomain"], config["kommo"]["api_token"])
+    client = KommoClient(
+        config["kommo"]["subdomain"],
+        config["kommo"]["api_token"],
+        lead_field_ids=lead_field_ids_from_config(config),
+    )
 
     is_ok, msg = client.health_check()
     if not is_ok:
@@ -247,11 +123,16 @@ def main():
 
     now = datetime.now()
     first_day_this_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    last_day_previous_month = first_day_this_month - timedelta(seconds=1)
-    first_day_previous_month = last_day_previous_month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    start_ts, end_ts = month_timestamps_to_epoch(first_day_previous_month, last_day_previous_month)
-    mes_nome = MESES_PT[first_day_previous_month.month - 1]
-    ano = first_day_previous_month.year
+    previous_month = first_day_this_month - timedelta(seconds=1)
+    mes_nome = reporting.MESES_PT[previous_month.month - 1]
+    ano = previous_month.year
+
+    store = rollups.synced_store(args.client, config, client) if args.rollups else None
+    if args.year_to_date:
+        end_month = max(now.month - 1, 1)
+        monthly_reports = collect_year_to_date_reports(client, args.client, config, ano, end_month, store)
+    else:
+        monthly_reports = [collect_month_report(client, args.client, config, ano, previous_month.month, store)]
 
     print()
     print("=" * 65)
@@ -260,161 +141,33 @@ def main():
     print("=" * 65)
 
     if args.year_to_date:
-        end_month = max(now.month - 1, 1)
-        monthly_reports = [collect_month_report(client, config, ano, month) for month in range(1, end_month + 1)]
-        total_created = sum(report["n_created"] for report in monthly_reports)
-        total_won = sum(report["n_won"] for report in monthly_reports)
-        total_lost = sum(report["n_lost"] for report in monthly_reports)
-        conv = round(total_won / total_created * 100, 1) if total_created else 0.0
-
-        print(f"\n{'─' * 65}")
-        print(f"  📅 JANEIRO A {MESES_PT[end_month - 1].upper()} {ano}")
-        print(f"{'─' * 65}")
-        print(f"  📥  Leads criados  : {total_created}")
-        print(f"  ✅  Ganhos         : {total_won}")
-        print(f"  ❌  Perdidos       : {total_lost}")
-        print(f"  📈  Conversão      : {conv:.1f}%")
-
-        md_lines = [
-            f"# Relatório YTD {ano} — {config['client_name']}",
-            "",
-            f"Período: **Janeiro a {MESES_PT[end_month - 1]} de {ano}**",
-            "",
-            "## Visão geral",
-            "",
-            "| Métrica | Valor |",
-            "|---|---:|",
-            f"| Leads criados | {total_created} |",
-            f"| Ganhos | {total_won} |",
-            f"| Perdidos | {total_lost} |",
-            f"| Conversão | {conv:.1f}% |",
-            "",
-        ]
-
+        total = monthly_reports.pop()
+        print("\n".join(reporting.console_period(total, with_origins=False)))
         for report in monthly_reports:
-            print(f"\n  {report['month_name'].upper()} {ano}")
-            print(f"  {'─' * 65}")
-            print(f"  📥  Leads criados  : {report['n_created']}")
-            print(f"  ✅  Ganhos         : {report['n_won']}")
-            print(f"  ❌  Perdidos       : {report['n_lost']}")
-            print(f"  📈  Conversão      : {report['conv']:.1f}%")
-            print_origin_table("📝 Origem (manual)", report['manual_created'], report['manual_won'], report['n_created'])
-            if report['bot_created'] is not None and report['bot_won'] is not None:
-                print_origin_table("🤖 Origem (automática)", report['bot_created'], report['bot_won'], report['n_created'])
-            if report['sec_created'] is not None and report['sec_won'] is not None:
-                print_origin_table("📝 Origem (secretária)", report['sec_created'], report['sec_won'], report['n_created'])
-
-            md_lines.extend([
-                f"## {report['month_name']} {ano}",
-                "",
-                "| Métrica | Valor |",
-                "|---|---:|",
-                f"| Leads criados | {report['n_created']} |",
-                f"| Ganhos | {report['n_won']} |",
-                f"| Perdidos | {report['n_lost']} |",
-                f"| Conversão | {report['conv']:.1f}% |",
-                "",
-                "### Origem (manual)",
-                "",
-                *markdown_origin_table(report['manual_created'], report['manual_won'], report['n_created']),
-                "",
-            ])
-
-            if report['bot_created'] is not None and report['bot_won'] is not None:
-                md_lines.extend([
-                    "### Origem (automática)",
-                    "",
-                    *markdown_origin_table(report['bot_created'], report['bot_won'], report['n_created']),
-                    "",
-                ])
-
-            if report['sec_created'] is not None and report['sec_won'] is not None:
-                md_lines.extend([
-                    "### Origem (secretária)",
-                    "",
-                    *markdown_origin_table(report['sec_created'], report['sec_won'], report['n_created']),
-                    "",
-                ])
-
-        timestamp = datetime.now().strftime("%d/%m/%Y %H:%M")
-        md_lines.extend([
-            f"_Relatório gerado em {timestamp}_",
-            "",
-        ])
-
+            print("\n".join(reporting.console_period(report)))
+        # Visão geral com as métricas do acumulado e uma seção por mês, sem consolidado de origens
+        body = reporting.markdown_metrics_table(total)
+        for report in monthly_reports:
+            body.extend(reporting.markdown_period(report))
+        document = reporting.markdown_document(
+            config["client_name"], f"Relatório YTD {ano}",
+            f"Janeiro a {reporting.MESES_PT[end_month - 1]} de {ano}", body, now.strftime("%d/%m/%Y %H:%M"),
+        )
         output_path = args.md_output or f"relatorio_ytd_{args.client}.md"
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(md_lines))
-
-        print(f"📝 Arquivo Markdown gerado: {output_path}")
-        return
-
-    month_report = collect_month_report(client, config, ano, first_day_previous_month.month)
-
-    print(f"\n{'─' * 65}")
-    print(f"  📅 {mes_nome.upper()} {ano}")
-    print(f"{'─' * 65}")
-    print(f"  📥  Leads criados  : {month_report['n_created']}")
-    print(f"  ✅  Ganhos         : {month_report['n_won']}")
-    print(f"  ❌  Perdidos       : {month_report['n_lost']}")
-    print(f"  📈  Conversão      : {month_report['conv']:.1f}%")
-
-    print_origin_table("📝 Origem (manual)", month_report['manual_created'], month_report['manual_won'], month_report['n_created'])
-
-    if month_report['bot_created'] is not None and month_report['bot_won'] is not None:
-        print_origin_table("🤖 Origem (automática)", month_report['bot_created'], month_report['bot_won'], month_report['n_created'])
-
-    if month_report['sec_created'] is not None and month_report['sec_won'] is not None:
-        print_origin_table("📝 Origem (secretária)", month_report['sec_created'], month_report['sec_won'], month_report['n_created'])
-
-    timestamp = datetime.now().strftime("%d/%m/%Y %H:%M")
-    md_lines = [
-        f"# Relatório {mes_nome} {ano} — {config['client_name']}",
-        "",
-        f"Período: **{mes_nome} de {ano}**",
-        "",
-        "## Visão geral",
-        "",
-        "| Métrica | Valor |",
-        "|---|---:|",
-        f"| Leads criados | {month_report['n_created']} |",
-        f"| Ganhos | {month_report['n_won']} |",
-        f"| Perdidos | {month_report['n_lost']} |",
-        f"| Conversão | {month_report['conv']:.1f}% |",
-        "",
-        "### Origem (manual)",
-        "",
-        *markdown_origin_table(month_report['manual_created'], month_report['manual_won'], month_report['n_created']),
-        "",
-    ]
-
-    if month_report['bot_created'] is not None and month_report['bot_won'] is not None:
-        md_lines.extend([
-            "### Origem (automática)",
-            "",
-            *markdown_origin_table(month_report['bot_created'], month_report['bot_won'], month_report['n_created']),
-            "",
-        ])
-
-    if month_report['sec_created'] is not None and month_report['sec_won'] is not None:
-        md_lines.extend([
-            "### Origem (secretária)",
-            "",
-            *markdown_origin_table(month_report['sec_created'], month_report['sec_won'], month_report['n_created']),
-            "",
-        ])
-
-    md_lines.extend([
-        f"_Relatório gerado em {timestamp}_",
-        "",
-    ])
+    else:
+        month_report = monthly_reports[0]
+        print("\n".join(reporting.console_period(month_report)))
+        document = reporting.markdown_report(
+            config["client_name"], f"Relatório {mes_nome} {ano}", f"{mes_nome} de {ano}", [month_report],
+            generated_at=now.strftime("%d/%m/%Y %H:%M"),
+        )
+        output_path = args.md_output or f"relatorio_{mes_nome.lower()}_{args.client}.md"
 
-    output_path = args.md_output or f"relatorio_{mes_nome.lower()}_{args.client}.md"
     with open(output_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(md_lines))
+        f.write(document)
 
     print(f"📝 Arquivo Markdown gerado: {output_path}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Relatórios em lote para todos os clientes de config/ — um processo por cliente.
+
+Cada processo usa a própria conta do Kommo, com limite de requisições por
+segundo (--max-rps), e o cache de períodos encerrados em disco
+(core.period_cache) é compartilhado entre processos e execuções. O tempo total
+fica próximo ao do cliente mais lento. Gravando um cassete do Kommo
+(KOMMO_CASSETTE_MODE=record), os clientes rodam em sequência no próprio
+processo: vários processos no mesmo arquivo sobrescreveriam uns aos outros.
+
+Uso:
+  python generate_batch_reports.py                       → mês anterior, todos os clientes
+  python generate_batch_reports.py --kind ytd
+  python generate_batch_reports.py --kind quarter --year 2026 --quarter 1
+  python generate_batch_reports.py --clients eliney_faria daniel_dourado --out-dir relatorios
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+# Adiciona src/ ao path para reutilizar os módulos existentes
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.config_loader import ConfigLoader
+from core import reporting
+from integrations import kommo_cassette
+from integrations.kommo_client import KommoClient
+from integrations.kommo_schema import lead_field_ids_from_config
+
+DIMENSIONS = ("manual", "bot", "secretary")
+KINDS = ("monthly", "ytd", "quarter")
+
+
+def batch_periods(kind: str, year: int, month: int = None, quarter: int = None):
+    """
+    (períodos, total, título, texto do período, sufixo do arquivo) do tipo de relatório.
+    `total` é o período consolidado (None no mensal).
+    """
+    if kind == "monthly":
+        nome = reporting.MESES_PT[month - 1]
+        return [reporting.month_period(year, month)], None, f"Relatório {nome} {year}", f"{nome} de {year}", nome.lower()
+    if kind == "ytd":
+        periods = [reporting.month_period(year, m) for m in range(1, month + 1)]
+        text = f"Janeiro a {reporting.MESES_PT[month - 1]} de {year}"
+        total = reporting.span_period(f"Janeiro a {reporting.MESES_PT[month - 1]} {year}", periods)
+        return periods, total, f"Relatório YTD {year}", text, "ytd"
+    if kind == "quarter":
+        months = range(3 * quarter - 2, 3 * quarter + 1)
+        periods = [reporting.month_period(year, m) for m in months]
+        names = [reporting.MESES_PT[m - 1] for m in months]
+        text = f"{names[0]}, {names[1]} e {names[2]} de {year}"
+        total = reporting.span_period(f"Q{quarter} Total", periods)
+        return periods, total, f"Relatório Q{quarter} {year}", text, f"q{quarter}"
+    raise ValueError(f"Tipo de relatório desconhecido: {kind}")
+
+
+def run_client(client_id: str, kind: str, year: int, month: int, quarter: int, out_dir: str,
+               max_rps: float, cache_dir: str = None) -> dict:
+    """Gera o relatório de um cliente (roda no processo filho) e retorna o resumo"""
+    started = time.perf_counter()
+    summary = {"client_id": client_id, "ok": False}
+    try:
+        config = ConfigLoader.load_client_config(client_id)
+        client = KommoClient(
+            config["kommo"]["subdomain"],
+            config["kommo"]["api_token"],
+            lead_field_ids=lead_field_ids_from_config(config),
+            max_rps=max_rps,
+        )
+        is_ok, msg = client.health_check()
+        if not is_ok:
+            summary["error"] = f"Falha na conexão com Kommo: {msg}"
+            return summary
+
+        periods, total, title, text, suffix = batch_periods(kind, year, month, quarter)
+        results = reporting.build_report_cached(
+            client, client_id, config, periods + ([total] if total else []), DIMENSIONS, cache_dir=cache_dir
+        )
+        if total:
+            total = results.pop()
+        headline = total or results[0]
+
+        document = reporting.markdown_report(config["client_name"], title, text, results, total)
+        path = os.path.join(out_dir, f"relatorio_{suffix}_{client_id}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(document)
+
+        summary.update({
+            "ok": True,
+            "file": path,
+            "client_name": config["client_name"],
+            "n_created": headline["n_created"],
+            "n_won": headline["n_won"],
+            "n_lost": headline["n_lost"],
+            "conv": headline["conv"],
+            "kommo_requests": client.request_count,
+        })
+    except Exception as e:
+        summary["error"] = str(e)
+    finally:
+        summary["elapsed_s"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def main():
+    now = datetime.now()
+    previous_month = now.replace(day=1) - timedelta(days=1)
+
+    parser = argparse.ArgumentParser(description="Relatórios em lote — todos os clientes Kommo")
+    parser.add_argument("--kind", choices=KINDS, default="monthly", help="monthly (padrão), ytd ou quarter")
+    parser.add_argument("--year", type=int, default=previous_month.year)
+    parser.add_argument("--month", type=int, default=previous_month.month,
+                        help="Mês do relatório mensal / último mês do YTD (padrão: mês anterior)")
+    parser.add_argument("--quarter", type=int, choices=(1, 2, 3, 4), default=(previous_month.month - 1) // 3 + 1)
+    parser.add_argument("--clients", nargs="*", default=None, help="IDs dos clientes (padrão: todos de config/)")
+    parser.add_argument("--out-dir", default=".", help="Pasta dos arquivos .md e do resumo JSON")
+    parser.add_argument("--workers", type=int, default=None, help="Processos simultâneos (padrão: um por cliente)")
+    parser.add_argument("--max-rps", type=float, default=7.0, help="Requisições por segundo por conta do Kommo")
+    args = parser.parse_args()
+
+    clients = args.clients or ConfigLoader.list_clients()
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    summaries = {}
+
+    def collect(summary: dict):
+        summaries[summary["client_id"]] = summary
+        if summary["ok"]:
+            print(f"✅ {summary['client_id']}: {summary['file']} ({summary['elapsed_s']}s, "
+                  f"{summary['kommo_requests']} requisições)")
+        else:
+            print(f"❌ {summary['client_id']}: {summary.get('error')}")
+
+    job_args = (args.kind, args.year, args.month, args.quarter, args.out_dir, args.max_rps)
+    if kommo_cassette.recording_from_env():
+        # Um único gravador por arquivo de cassete (e fechado no atexit deste processo)
+        print("📼 Gravando cassete: clientes em sequência, sem processos filhos")
+        for client_id in clients:
+            collect(run_client(client_id, *job_args))
+    else:
+        with ProcessPoolExecutor(max_workers=max(1, args.workers or len(clients))) as pool:
+            futures = [pool.submit(run_client, client_id, *job_args) for client_id in clients]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    elapsed = round(time.perf_counter() - started, 2)
+    summary_path = os.path.join(args.out_dir, f"relatorios_{args.kind}_resumo.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "kind": args.kind,
+            "year": args.year,
+            "month": args.month if args.kind != "quarter" else None,
+            "quarter": args.quarter if args.kind == "quarter" else None,
+            "generated_at": now.isoformat(timespec="seconds"),
+            "elapsed_s": elapsed,
+            "slowest_client_s": max((s["elapsed_s"] for s in summaries.values()), default=0),
+            "clients": [summaries[c] for c in clients],
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"📝 Resumo: {summary_path} ({elapsed}s no total)")
+    if not all(s["ok"] for s in summaries.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,6 @@ Uso:
 
 import sys
 import os
-import calendar
 import argparse
 from datetime import datetime
 
@@ -25,98 +24,23 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from core.config_loader import ConfigLoader
-from core.analytics import AnalyticsEngine
+from core import reporting, rollups
 from integrations.kommo_client import KommoClient
+from integrations.kommo_schema import lead_field_ids_from_config
 
 # ─── Constantes ──────────────────────────────────────────────────────────────
 
-MESES_PT = [
-    "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
-    "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro",
-]
-
 CLIENT_ID = "marcela_di_lollo"
 
-
-# ─── Helpers ─────────────────────────────────────────────────────────────────
-
-def get_month_timestamps(year: int, month: int):
-    """Retorna (start_ts, end_ts) para o mês/ano indicados."""
-    first = datetime(year, month, 1, 0, 0, 0)
-    last_day = calendar.monthrange(year, month)[1]
-    last = datetime(year, month, last_day, 23, 59, 59)
-    return int(first.timestamp()), int(last.timestamp())
-
-
-def fetch_all_leads(client: KommoClient, params: dict) -> list:
-    """Busca leads com paginação automática."""
-    return (
-        client._request_get_all_pages(f"{client.base_url}/leads", params)
-        .get("_embedded", {})
-        .get("leads", [])
-    )
-
-
-def origin_breakdown(leads: list, field_id: int) -> dict:
-    """Agrupa leads por valor do campo `field_id`. Retorna dict ordenado por volume."""
-    counts: dict = {}
-    for lead in leads:
-        val = AnalyticsEngine.get_origin_value(lead, field_id)
-        counts[val] = counts.get(val, 0) + 1
-    return dict(sorted(counts.items(), key=lambda x: x[1], reverse=True))
-
-
-def print_origin_table(title: str, created_by_origin: dict, won_by_origin: dict, total_created: int):
-    """Imprime tabela de origem com colunas: Leads | % Leads | Ganhos | Conv%."""
-    print(f"\n  {title}")
-    print(f"  {'Origem':<32} {'Leads':>6}  {'% Leads':>7}  {'Ganhos':>7}  {'Conv%':>6}")
-    print(f"  {'─'*32} {'─'*6}  {'─'*7}  {'─'*7}  {'─'*6}")
-    for origin, created in created_by_origin.items():
-        won = won_by_origin.get(origin, 0)
-        pct_leads = round(created / total_created * 100, 1) if total_created else 0.0
-        conv = round(won / created * 100, 1) if created else 0.0
-        print(f"  {origin:<32} {created:>6}  {pct_leads:>6.1f}%  {won:>7}  {conv:>5.1f}%")
-
-
-def print_origin_table_q1(title: str, origins_q1: dict, total_created_q1: int):
-    """Imprime tabela de origem consolidada do Q1."""
-    print(f"\n  {title}")
-    print(f"  {'Origem':<32} {'Leads':>6}  {'% Leads':>7}  {'Ganhos':>7}  {'Conv%':>6}")
-    print(f"  {'─'*32} {'─'*6}  {'─'*7}  {'─'*7}  {'─'*6}")
-    sorted_items = sorted(origins_q1.items(), key=lambda x: x[1][0], reverse=True)
-    for origin, (c, w) in sorted_items:
-        pct_o = round(c / total_created_q1 * 100, 1) if total_created_q1 else 0.0
-        conv_o = round(w / c * 100, 1) if c else 0.0
-        print(f"  {origin:<32} {c:>6}  {pct_o:>6.1f}%  {w:>7}  {conv_o:>5.1f}%")
+# Para esta cliente, origin_field_id é a origem automática
+DIMENSIONS = ("manual", "secretary")
+TITLES = {"manual": "Origem (automática)"}
+ICONS = {"manual": "🌍"}
+# Títulos do consolidado do trimestre (console e Markdown)
+Q1_TITLES = {"manual": "Origem automática", "secretary": "Origem secretária"}
 
 
-def markdown_origin_table(created_by_origin: dict, won_by_origin: dict, total_created: int) -> list:
-    """Retorna linhas Markdown para tabela de origem mensal."""
-    lines = [
-        "| Origem | Leads | % Leads | Ganhos | Conv% |",
-        "|---|---:|---:|---:|---:|",
-    ]
-    for origin, created in created_by_origin.items():
-        won = won_by_origin.get(origin, 0)
-        pct_leads = round(created / total_created * 100, 1) if total_created else 0.0
-        conv = round(won / created * 100, 1) if created else 0.0
-        lines.append(f"| {origin} | {created} | {pct_leads:.1f}% | {won} | {conv:.1f}% |")
-    return lines
-
-
-def markdown_origin_table_q1(origins_q1: dict, total_created_q1: int) -> list:
-    """Retorna linhas Markdown para tabela de origem consolidada Q1."""
-    lines = [
-        "| Origem | Leads | % Leads | Ganhos | Conv% |",
-        "|---|---:|---:|---:|---:|",
-    ]
-    sorted_items = sorted(origins_q1.items(), key=lambda x: x[1][0], reverse=True)
-    for origin, (created, won) in sorted_items:
-        pct = round(created / total_created_q1 * 100, 1) if total_created_q1 else 0.0
-        conv = round(won / created * 100, 1) if created else 0.0
-        lines.append(f"| {origin} | {created} | {pct:.1f}% | {won} | {conv:.1f}% |")
-    return lines
-
+# ─── Helpers ─────────────────────────────────────────────────────────────────
 
 def discover_fields(client: KommoClient):
     """Lista todos os campos customizados dos leads para identificar o campo da secretária."""
@@ -140,20 +64,6 @@ def discover_fields(client: KommoClient):
     )
 
 
-# ─── Acumulador de origens Q1 ─────────────────────────────────────────────────
-
-def accumulate_origins(dest: dict, created_origins: dict, won_origins: dict):
-    """Acumula [leads_criados, ganhos] por origem no dict `dest` (in-place)."""
-    for origin, count in created_origins.items():
-        if origin not in dest:
-            dest[origin] = [0, 0]
-        dest[origin][0] += count
-    for origin, count in won_origins.items():
-        if origin not in dest:
-            dest[origin] = [0, 0]
-        dest[origin][1] += count
-
-
 # ─── Main ─────────────────────────────────────────────────────────────────────
 
 def main():
@@ -168,11 +78,20 @@ def main():
         default="relatorio_q1_marcela_di_lollo.md",
         help="Caminho do arquivo .md de saída (padrão: relatorio_q1_marcela_di_lollo.md)",
     )
+    parser.add_argument(
+        "--rollups",
+        action="store_true",
+        help="Responde pelos agregados diários (sincronização incremental, sem varrer leads)",
+    )
     args = parser.parse_args()
 
     # Carrega config e inicializa cliente
     config = ConfigLoader.load_client_config(CLIENT_ID)
-    client = KommoClient(config["kommo"]["subdomain"], config["kommo"]["api_token"])
+    client = KommoClient(
+        config["kommo"]["subdomain"],
+        config["kommo"]["api_token"],
+        lead_field_ids=lead_field_ids_from_config(config),
+    )
 
     # Verifica conexão
     is_ok, msg = client.health_check()
@@ -185,11 +104,8 @@ def main():
         discover_fields(client)
         return
 
-    origin_field_id = config["kommo"]["origin_field_id"]          # origem automática
     secretary_field_id = config["kommo"].get("secretary_origin_field_id")  # secretária
-    pipeline_id = config["kommo"]["pipeline_id"]
-    won_status_id = config["kommo"]["won_status_id"]
-    lost_status_id = config["kommo"]["lost_status_id"]
+    pipeline_ids = [config["kommo"]["pipeline_id"]]
 
     # Aviso se campo da secretária não configurado
     if not secretary_field_id:
@@ -201,6 +117,17 @@ def main():
         )
         print("   Continuando relatório apenas com a origem automática...\n")
 
+    # Meses + consolidado do trimestre, calculados na mesma passada
+    months = [reporting.month_period(2026, month) for month in (1, 2, 3)]
+    periods = months + [reporting.span_period("Q1 Total", months)]
+    if args.rollups:
+        # Agregados diários (pipeline principal), sem buscar leads
+        store = rollups.synced_store(CLIENT_ID, config, client)
+        results = reporting.build_report_from_rollups(store, config, periods, DIMENSIONS, pipeline_ids)
+    else:
+        results = reporting.build_report_cached(client, CLIENT_ID, config, periods, DIMENSIONS, pipeline_ids)
+    *monthly, total = results
+
     # ── Cabeçalho ────────────────────────────────────────────────────────────
     print()
     print("=" * 65)
@@ -208,188 +135,41 @@ def main():
     print(f"  Janeiro, Fevereiro e Março de 2026")
     print("=" * 65)
 
-    # Totais acumulados
-    total_created_q1 = 0
-    total_won_q1 = 0
-    total_lost_q1 = 0
-    q1_origins_auto: dict = {}
-    q1_origins_sec: dict = {}
-    monthly_rows: list = []
-    md_sections: list = []
-
-    # ── Loop por mês ─────────────────────────────────────────────────────────
-    for month in (1, 2, 3):
-        start_ts, end_ts = get_month_timestamps(2026, month)
-        mes = MESES_PT[month - 1]
-
-        # Leads criados no mês (na pipeline principal)
-        leads_created = fetch_all_leads(
-            client,
-            {
-                "filter[created_at][from]": start_ts,
-                "filter[created_at][to]": end_ts,
-                "filter[pipeline_id][0]": pipeline_id,
-            },
-        )
-
-        # Leads fechados como GANHO no mês
-        leads_won = fetch_all_leads(
-            client,
-            {
-                "filter[pipeline_id][0]": pipeline_id,
-                "filter[status][0]": won_status_id,
-                "filter[closed_at][from]": start_ts,
-                "filter[closed_at][to]": end_ts,
-            },
-        )
-
-        # Leads fechados como PERDIDO no mês
-        leads_lost = fetch_all_leads(
-            client,
-            {
-                "filter[pipeline_id][0]": pipeline_id,
-                "filter[status][0]": lost_status_id,
-                "filter[closed_at][from]": start_ts,
-                "filter[closed_at][to]": end_ts,
-            },
-        )
-
-        n_created = len(leads_created)
-        n_won = len(leads_won)
-        n_lost = len(leads_lost)
-        conv = round(n_won / n_created * 100, 1) if n_created else 0.0
-
-        total_created_q1 += n_created
-        total_won_q1 += n_won
-        total_lost_q1 += n_lost
-
-        # ── Cabeçalho do mês ─────────────────────────────────────────────────
-        print(f"\n{'─' * 65}")
-        print(f"  📅 {mes.upper()} 2026")
-        print(f"{'─' * 65}")
-        print(f"  📥  Leads criados  : {n_created}")
-        print(f"  ✅  Ganhos         : {n_won}")
-        print(f"  ❌  Perdidos       : {n_lost}")
-        print(f"  📈  Conversão      : {conv:.1f}%")
-
-        # ── Origem automática ─────────────────────────────────────────────────
-        auto_created = origin_breakdown(leads_created, origin_field_id)
-        auto_won = {}
-        for lead in leads_won:
-            val = AnalyticsEngine.get_origin_value(lead, origin_field_id)
-            auto_won[val] = auto_won.get(val, 0) + 1
-
-        print_origin_table("🌍 Origem (automática)", auto_created, auto_won, n_created)
-        accumulate_origins(q1_origins_auto, auto_created, auto_won)
-
-        sec_created = None
-        sec_won = None
-
-        # ── Origem secretária ─────────────────────────────────────────────────
-        if secretary_field_id:
-            sec_created = origin_breakdown(leads_created, secretary_field_id)
-            sec_won = {}
-            for lead in leads_won:
-                val = AnalyticsEngine.get_origin_value(lead, secretary_field_id)
-                sec_won[val] = sec_won.get(val, 0) + 1
-
-            print_origin_table("📝 Origem (secretária)", sec_created, sec_won, n_created)
-            accumulate_origins(q1_origins_sec, sec_created, sec_won)
-
-        monthly_rows.append({
-            "mes": mes,
-            "created": n_created,
-            "won": n_won,
-            "lost": n_lost,
-            "conv": conv,
-        })
-
-        month_md = [
-            f"## {mes} 2026",
-            "",
-            "| Métrica | Valor |",
-            "|---|---:|",
-            f"| Leads criados | {n_created} |",
-            f"| Ganhos | {n_won} |",
-            f"| Perdidos | {n_lost} |",
-            f"| Conversão | {conv:.1f}% |",
-            "",
-            "### Origem (automática)",
-            "",
-            *markdown_origin_table(auto_created, auto_won, n_created),
-            "",
-        ]
-        if secretary_field_id and sec_created is not None and sec_won is not None:
-            month_md.extend([
-                "### Origem (secretária)",
-                "",
-                *markdown_origin_table(sec_created, sec_won, n_created),
-                "",
-            ])
-        md_sections.extend(month_md)
+    for result in monthly:
+        print("\n".join(reporting.console_period(result, TITLES, ICONS)))
 
     # ── Resumo Q1 ─────────────────────────────────────────────────────────────
-    conv_q1 = round(total_won_q1 / total_created_q1 * 100, 1) if total_created_q1 else 0.0
-
     print(f"\n{'=' * 65}")
     print(f"  📊 RESUMO Q1 2026 — JANEIRO + FEVEREIRO + MARÇO")
     print(f"{'=' * 65}")
-    print(f"  📥  Total Leads    : {total_created_q1}")
-    print(f"  ✅  Total Ganhos   : {total_won_q1}")
-    print(f"  ❌  Total Perdidos : {total_lost_q1}")
-    print(f"  📈  Conversão Q1   : {conv_q1:.1f}%")
+    print(f"  📥  Total Leads    : {total['n_created']}")
+    print(f"  ✅  Total Ganhos   : {total['n_won']}")
+    print(f"  ❌  Total Perdidos : {total['n_lost']}")
+    print(f"  📈  Conversão Q1   : {total['conv']:.1f}%")
 
-    print_origin_table_q1("🌍 ORIGEM AUTOMÁTICA — Q1", q1_origins_auto, total_created_q1)
-
-    if secretary_field_id:
-        print_origin_table_q1("📝 ORIGEM SECRETÁRIA — Q1", q1_origins_sec, total_created_q1)
+    for dim in total["created_by"]:
+        title = f"{ICONS.get(dim, '📝')} {Q1_TITLES[dim].upper()} — Q1"
+        print("\n".join(reporting.console_origin_table(
+            title, total["created_by"][dim], total["won_by"][dim], total["n_created"], include_won_only=True
+        )))
 
     print(f"\n{'=' * 65}")
-    print(f"  ✅  Relatório gerado em {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    generated_at = datetime.now().strftime("%d/%m/%Y %H:%M")
+    print(f"  ✅  Relatório gerado em {generated_at}")
     print(f"{'=' * 65}\n")
 
     # ── Geração do relatório em Markdown ────────────────────────────────────
-    timestamp = datetime.now().strftime('%d/%m/%Y %H:%M')
-    md_lines = [
-        "# Relatório Q1 2026 — Marcela Di Lollo",
-        "",
-        "Período: **Janeiro, Fevereiro e Março de 2026**",
-        "",
-        "## Visão geral",
-        "",
-        "| Mês | Leads criados | Ganhos | Perdidos | Conversão |",
-        "|---|---:|---:|---:|---:|",
-    ]
-    for row in monthly_rows:
-        md_lines.append(
-            f"| {row['mes']} | {row['created']} | {row['won']} | {row['lost']} | {row['conv']:.1f}% |"
-        )
-
-    md_lines.extend([
-        f"| **Q1 Total** | **{total_created_q1}** | **{total_won_q1}** | **{total_lost_q1}** | **{conv_q1:.1f}%** |",
-        "",
-        *md_sections,
-        "## Consolidado Q1 — Origem automática",
-        "",
-        *markdown_origin_table_q1(q1_origins_auto, total_created_q1),
-        "",
-    ])
-
-    if secretary_field_id:
-        md_lines.extend([
-            "## Consolidado Q1 — Origem secretária",
-            "",
-            *markdown_origin_table_q1(q1_origins_sec, total_created_q1),
-            "",
-        ])
-
-    md_lines.extend([
-        f"_Relatório gerado em {timestamp}_",
-        "",
-    ])
+    body = reporting.markdown_overview_table(monthly, total, column="Mês",
+                                             labels=[reporting.MESES_PT[m - 1] for m in (1, 2, 3)])
+    for result in monthly:
+        body.extend(reporting.markdown_period(result, titles=TITLES))
+    body.extend(reporting.markdown_consolidated(total, Q1_TITLES, heading="Consolidado Q1"))
+    document = reporting.markdown_document(
+        config["client_name"], "Relatório Q1 2026", "Janeiro, Fevereiro e Março de 2026", body, generated_at
+    )
 
     with open(args.md_output, "w", encoding="utf-8") as f:
-        f.write("\n".join(md_lines))
+        f.write(document)
 
     print(f"📝 Arquivo Markdown gerado: {args.md_output}")
 
@@ -28,6 +28,18 @@ class AnalyticsEngine:
 
         return dict(sorted(origins.items(), key=lambda item: item[1], reverse=True))
 
+    @staticmethod
+    def count_won_by_origin(leads_won, origin_field_id, bot_field_id: int = None):
+        """Ganhos por origem (preferindo a manual quando há campo de bot), sem ordenar"""
+        won_by_origin = {}
+        for lead in leads_won:
+            if bot_field_id:
+                origin = AnalyticsEngine.get_preferred_origin_value(lead, origin_field_id, bot_field_id)
+            else:
+                origin = AnalyticsEngine.get_origin_value(lead, origin_field_id)
+            won_by_origin[origin] = won_by_origin.get(origin, 0) + 1
+        return won_by_origin
+
     @staticmethod
     def get_first_messages(leads, message_field_id):
         messages = []
@@ -49,13 +61,18 @@ class AnalyticsEngine:
         # 2. Métrica de Volume (Batida de meta real)
         total_closed_won = len(leads_won_in_period)
         
-        # 3. O Norte: Quantos leads preciso para 1 venda?
+        return AnalyticsEngine.metrics_from_counts(total_created, len(new_leads_already_won), total_closed_won)
+    
+    @staticmethod
+    def metrics_from_counts(total_created: int, cohort_won: int, total_closed_won: int):
+        """Mesmas métricas do calculate_metrics a partir de contagens (ex.: agregados diários)"""
+        # O Norte: Quantos leads preciso para 1 venda?
         # Usamos o volume total de fechamento vs o volume total de entrada
         ratio = round(total_created / total_closed_won, 2) if total_closed_won > 0 else float('inf')
         
         return {
             "total_created": total_created,
-            "cohort_won": len(new_leads_already_won),
+            "cohort_won": cohort_won,
             "total_closed_won": total_closed_won,
             "ratio": ratio
         }
@@ -31,3 +31,28 @@ def get_client_by_chat_id(chat_id: int | str) -> str | None:
         logger.error(f"Erro ao buscar cliente por chat_id {chat_id}: {e}")
         
     return None
+
+
+def get_client_by_subdomain(subdomain: str) -> str | None:
+    """
+    Busca qual cliente usa uma conta Kommo (kommo.subdomain na config).
+    Usado pelos webhooks do Kommo, que identificam a conta pelo subdomínio.
+    """
+    config_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config')
+    
+    try:
+        for filename in os.listdir(config_dir):
+            if not filename.endswith('.json'):
+                continue
+                
+            filepath = os.path.join(config_dir, filename)
+            with open(filepath, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+                
+            if str(config.get('kommo', {}).get('subdomain', '')).lower() == str(subdomain).lower():
+                return filename.replace('.json', '')
+                
+    except Exception as e:
+        logger.error(f"Erro ao buscar cliente pelo subdomínio {subdomain}: {e}")
+        
+    return None
@@ -16,4 +16,11 @@ class ConfigLoader:
         env_var_name = f"{client_filename.upper()}_TOKEN"
         config['kommo']['api_token'] = os.getenv(env_var_name)
 
-        return config
\ No newline at end of file
+        return config
+
+    @staticmethod
+    def list_clients():
+        """IDs dos clientes configurados (arquivos .json da pasta config)"""
+        base_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        config_dir = os.path.join(base_path, 'config')
+        return sorted(f.replace('.json', '') for f in os.listdir(config_dir) if f.endswith('.json'))
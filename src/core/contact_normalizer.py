@@ -0,0 +1,117 @@
+import re
+
+# Padrões compilados uma única vez (antes eram recompilados/buscados no cache do `re` a cada valor)
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+PHONE_PATTERN = r'^\d{10,15}$'
+PHONE_STRIP_PATTERN = r'[\s\-\(\)\.+]'
+
+EMAIL_RE = re.compile(EMAIL_PATTERN)
+PHONE_RE = re.compile(PHONE_PATTERN)
+PHONE_STRIP_RE = re.compile(PHONE_STRIP_PATTERN)
+
+# Fora do ASCII imprimível, `\s`, `\d` e `$` do RE2 (usado pelas strings Arrow)
+# divergem do `re` do Python; esses valores seguem pelo caminho escalar.
+_NON_PRINTABLE_ASCII = r'[^\x20-\x7e]'
+
+
+# ─── Versões escalares (referência) ──────────────────────────────────────────
+
+def is_valid_email(email: str) -> bool:
+    """Valida formato de email"""
+    return bool(EMAIL_RE.match(email))
+
+
+def is_valid_phone(phone: str) -> bool:
+    """Valida formato de telefone: 10 a 15 dígitos após remover separadores"""
+    return bool(PHONE_RE.match(PHONE_STRIP_RE.sub('', phone)))
+
+
+def format_phone(phone: str) -> str:
+    """
+    Formata o telefone para o padrão internacional +55...
+    Remove o 55 inicial, usa os últimos 11 dígitos e devolve "" se faltar dígito.
+    """
+    clean_phone = PHONE_STRIP_RE.sub('', phone)
+    if clean_phone.startswith('55'):
+        clean_phone = clean_phone[2:]
+    if len(clean_phone) > 11:
+        clean_phone = clean_phone[-11:]
+    elif len(clean_phone) < 11:
+        return ""
+    return f"+55{clean_phone}"
+
+
+def normalize_contact(value: str) -> tuple:
+    """(email, phone, contact) de um único valor; mesma regra do lote"""
+    value = (value or "").strip()
+    email = value if is_valid_email(value) else ""
+    phone = format_phone(value) if is_valid_phone(value) else ""
+    return email, phone, email or phone
+
+
+# ─── Versões em lote ─────────────────────────────────────────────────────────
+
+def _as_string_series(values):
+    import pandas as pd
+
+    if isinstance(values, pd.Series):
+        values = values.tolist()
+    values = ["" if v is None else str(v) for v in values]
+    try:
+        # Strings Arrow: replace/match rodam em C sobre a coluna inteira
+        return pd.Series(values, dtype="string[pyarrow]")
+    except ImportError:
+        return pd.Series(values, dtype=object)
+
+
+def _is_arrow(series) -> bool:
+    return getattr(series.dtype, "storage", None) == "pyarrow"
+
+
+def normalize_contacts(values):
+    """
+    Normaliza uma coluna de valores crus de contato de uma vez.
+    Retorna um DataFrame (strings Python) com as colunas:
+      - email: o valor original quando é um email válido, senão ""
+      - phone: o telefone formatado em +55... quando válido, senão ""
+      - contact: email se houver, senão o telefone (mesma prioridade de _extract_contact)
+    O resultado é idêntico ao de `normalize_contact` aplicado valor a valor.
+    """
+    import pandas as pd
+
+    raw = _as_string_series(values)
+    series = raw.str.strip()
+
+    email = series.where(series.str.match(EMAIL_PATTERN).fillna(False).astype(bool), "")
+
+    clean = series.str.replace(PHONE_STRIP_PATTERN, "", regex=True)
+    valid_phone = clean.str.match(PHONE_PATTERN).fillna(False).astype(bool)
+    clean = clean.where(~clean.str.startswith("55"), clean.str[2:])
+    formatted = ("+55" + clean.str[-11:]).where(clean.str.len() >= 11, "")
+    phone = formatted.where(valid_phone, "")
+
+    contact = email.where(email != "", phone)
+
+    result = pd.DataFrame({
+        "email": email.astype(object),
+        "phone": phone.astype(object),
+        "contact": contact.astype(object),
+    })
+
+    if _is_arrow(raw):
+        fallback = raw.str.contains(_NON_PRINTABLE_ASCII, regex=True).fillna(False).astype(bool)
+        if fallback.any():
+            idx = fallback[fallback].index
+            fixed = [normalize_contact(v) for v in raw[idx].tolist()]
+            result.loc[idx, ["email", "phone", "contact"]] = fixed
+    return result
+
+
+def normalize_phones(values):
+    """Telefones válidos já formatados em +55...; inválidos viram ""."""
+    return normalize_contacts(values)["phone"]
+
+
+def valid_email_mask(values):
+    """Máscara booleana de emails válidos (valores já sem espaços nas pontas)"""
+    return normalize_contacts(values)["email"] != ""
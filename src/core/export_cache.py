@@ -0,0 +1,159 @@
+"""
+Cache endereçado por conteúdo das exportações.
+
+A chave é o hash de (cliente, categorias, período, formatos, versão dos dados).
+A versão dos dados vem do Kommo (último updated_at de leads e contatos), então
+pedir a mesma exportação sem nada ter mudado reaproveita os arquivos já gerados
+em vez de refazer a busca, a resolução de contatos e a gravação.
+
+Lead apagado ou movido para fora das pipelines não muda esse updated_at, e a
+listagem do Kommo não informa o total de itens. Por isso o manifesto vale no
+máximo EXPORT_CACHE_TTL_MIN minutos desde a gravação, com ou sem acessos:
+remoções aparecem na exportação seguinte ao fim desse prazo.
+
+O manifesto de cada chave fica em <output_dir>/<cliente>/.cache/<chave>.json
+com os paths dos arquivos e a hora da gravação. `evict` limita o diretório de exportações por
+tamanho total e idade (arquivos mais antigos saem primeiro).
+"""
+import hashlib
+import json
+import os
+import time
+from core.logger import logger
+
+EXPORT_CACHE_MAX_MB = float(os.getenv("EXPORT_CACHE_MAX_MB", "500"))
+EXPORT_CACHE_MAX_AGE_DAYS = float(os.getenv("EXPORT_CACHE_MAX_AGE_DAYS", "7"))
+EXPORT_CACHE_TTL_MIN = float(os.getenv("EXPORT_CACHE_TTL_MIN", "30"))
+
+CACHE_DIRNAME = ".cache"
+
+
+def cache_key(client_id: str, categories, period_timestamps, formats, data_version: str) -> str:
+    """Chave estável para a combinação pedida sobre uma versão dos dados"""
+    payload = json.dumps({
+        "client_id": client_id,
+        "categories": sorted(categories),
+        "period": list(period_timestamps) if period_timestamps else None,
+        "formats": sorted(formats),
+        "data_version": data_version,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _manifest_path(output_dir: str, client_id: str, key: str) -> str:
+    return os.path.join(output_dir, client_id, CACHE_DIRNAME, f"{key}.json")
+
+
+def _iter_paths(files: dict):
+    for category_files in files.values():
+        for value in category_files.values():
+            if isinstance(value, (list, tuple)):
+                yield from value
+            else:
+                yield value
+
+
+def _read_manifest(path: str):
+    """Arquivos do manifesto, ou None se inválido, vencido ou com arquivo faltando"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        age_s = time.time() - manifest["created_at"]
+        files = manifest["files"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if age_s > EXPORT_CACHE_TTL_MIN * 60:
+        return None
+    if not all(os.path.isfile(p) for p in _iter_paths(files)):
+        return None
+    return files
+
+
+def lookup(output_dir: str, client_id: str, key: str):
+    """
+    Retorna o dict de arquivos de uma exportação já gerada, ou None.
+    Só é hit se o manifesto estiver no prazo e todos os arquivos ainda
+    existirem. O mtime dos arquivos é renovado para que a eviction trate a
+    entrada como recém-usada; o prazo do manifesto não muda.
+    """
+    path = _manifest_path(output_dir, client_id, key)
+    if not os.path.isfile(path):
+        return None
+    files = _read_manifest(path)
+    if files is None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    now = time.time()
+    for p in _iter_paths(files):
+        os.utime(p, (now, now))
+    return files
+
+
+def store(output_dir: str, client_id: str, key: str, files: dict):
+    """Grava o manifesto da exportação (escrita atômica)"""
+    path = _manifest_path(output_dir, client_id, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"created_at": time.time(), "files": files}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _export_files(output_dir: str):
+    for root, dirs, names in os.walk(output_dir):
+        dirs[:] = [d for d in dirs if d != CACHE_DIRNAME]
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield path, stat.st_size, stat.st_mtime
+
+
+def _drop_stale_manifests(output_dir: str):
+    for root, dirs, names in os.walk(output_dir):
+        if os.path.basename(root) != CACHE_DIRNAME:
+            continue
+        for name in names:
+            path = os.path.join(root, name)
+            if _read_manifest(path) is None:
+                os.remove(path)
+
+
+def evict(output_dir: str, max_bytes: float = None, max_age_days: float = None) -> int:
+    """
+    Remove exportações com mais de `max_age_days` e, se o total ainda passar
+    de `max_bytes`, as menos usadas até caber. Manifestos vencidos ou que
+    apontam para arquivos removidos são descartados. Retorna quantos arquivos saíram.
+    """
+    if max_bytes is None:
+        max_bytes = EXPORT_CACHE_MAX_MB * 1024 * 1024
+    if max_age_days is None:
+        max_age_days = EXPORT_CACHE_MAX_AGE_DAYS
+    if not os.path.isdir(output_dir):
+        return 0
+
+    cutoff = time.time() - max_age_days * 86400
+    entries = sorted(_export_files(output_dir), key=lambda e: e[2])
+    total = sum(size for _, size, _ in entries)
+
+    removed = 0
+    for path, size, mtime in entries:
+        if mtime >= cutoff and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+
+    if removed:
+        _drop_stale_manifests(output_dir)
+        logger.info("🧹 Cache de exportações: %d arquivo(s) removido(s)", removed)
+    return removed
@@ -0,0 +1,123 @@
+import os
+from datetime import datetime, timezone
+from core.analytics import AnalyticsEngine
+
+# Formatos colunares suportados → extensão do arquivo
+SNAPSHOT_FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+SNAPSHOT_COLUMNS = (
+    "client_id", "category", "lead_id", "lead_name", "status_id", "pipeline_id",
+    "created_at", "updated_at", "closed_at",
+    "origin_manual", "origin_bot", "origin_secretary",
+    "contact_name", "contact_phone", "snapshot_at",
+)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Exportação Parquet/Arrow requer o pacote 'pyarrow' (pip install pyarrow)"
+        ) from e
+    return pyarrow
+
+
+def snapshot_schema():
+    """Schema Arrow do snapshot de leads (timestamps em UTC, IDs inteiros)"""
+    pa = _require_pyarrow()
+    ts = pa.timestamp("s", tz="UTC")
+    return pa.schema([
+        ("client_id", pa.string()),
+        ("category", pa.string()),
+        ("lead_id", pa.int64()),
+        ("lead_name", pa.string()),
+        ("status_id", pa.int64()),
+        ("pipeline_id", pa.int64()),
+        ("created_at", ts),
+        ("updated_at", ts),
+        ("closed_at", ts),
+        ("origin_manual", pa.string()),
+        ("origin_bot", pa.string()),
+        ("origin_secretary", pa.string()),
+        ("contact_name", pa.string()),
+        ("contact_phone", pa.string()),
+        ("snapshot_at", ts),
+    ])
+
+
+def _origin(lead: dict, field_id):
+    if not field_id:
+        return None
+    return AnalyticsEngine.get_origin_value(lead, field_id)
+
+
+def _to_datetime(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc) if ts else None
+
+
+def build_snapshot_records(client_id: str, category: str, config: dict, resolved, snapshot_at: datetime) -> list:
+    """
+    Monta as linhas do snapshot a partir de (lead, nome, telefone) já resolvidos
+    (qualquer iterável, inclusive a fila do gravador da exportação).
+    """
+    kommo = config["kommo"]
+    manual_id = kommo.get("origin_field_id")
+    bot_id = kommo.get("origin_bot_field_id")
+    secretary_id = kommo.get("secretary_origin_field_id")
+
+    records = []
+    for lead, nome, telefone in resolved:
+        records.append({
+            "client_id": client_id,
+            "category": category,
+            "lead_id": lead.get("id"),
+            "lead_name": lead.get("name"),
+            "status_id": lead.get("status_id"),
+            "pipeline_id": lead.get("pipeline_id"),
+            "created_at": _to_datetime(lead.get("created_at")),
+            "updated_at": _to_datetime(lead.get("updated_at")),
+            "closed_at": _to_datetime(lead.get("closed_at")),
+            "origin_manual": _origin(lead, manual_id),
+            "origin_bot": _origin(lead, bot_id),
+            "origin_secretary": _origin(lead, secretary_id),
+            "contact_name": nome,
+            "contact_phone": telefone or None,
+            "snapshot_at": snapshot_at,
+        })
+    return records
+
+
+def write_snapshot(records: list, output_dir: str, client_id: str, category: str,
+                   timestamp: str, fmt: str = "parquet") -> list:
+    """
+    Grava o snapshot particionado por cliente e mês de criação do lead:
+        <output_dir>/snapshots/client=<id>/month=YYYY-MM/<categoria>_<timestamp>.<ext>
+    Retorna a lista de arquivos gravados.
+    """
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Formato de snapshot desconhecido: {fmt}")
+    pa = _require_pyarrow()
+    schema = snapshot_schema()
+
+    partitions = {}
+    for record in records:
+        created = record["created_at"]
+        month = created.strftime("%Y-%m") if created else "unknown"
+        partitions.setdefault(month, []).append(record)
+
+    paths = []
+    for month, rows in sorted(partitions.items()):
+        part_dir = os.path.join(output_dir, "snapshots", f"client={client_id}", f"month={month}")
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, f"{category}_{timestamp}.{SNAPSHOT_FORMATS[fmt]}")
+        table = pa.Table.from_pylist(rows, schema=schema)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            pq.write_table(table, path, compression="zstd")
+        else:
+            # Arrow IPC (Feather v2) sem compressão: pode ser lido via memory-map
+            import pyarrow.feather as feather
+            feather.write_feather(table, path, compression="uncompressed")
+        paths.append(path)
+    return paths
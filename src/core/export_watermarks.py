@@ -0,0 +1,57 @@
+"""
+Marcas d'água das exportações delta.
+
+Guarda, por chat e categoria, o maior `updated_at` entre os leads da última
+exportação entregue (relógio do Kommo, não o local). A exportação delta
+seguinte pede ao Kommo só os leads com `updated_at >= marca`, ou seja,
+criados, alterados ou movidos de categoria desde então; o lead da própria
+marca sai de novo, o que evita perder alterações no mesmo segundo.
+Fica em EXPORT_WATERMARK_DIR/<cliente>.json, fora de exports/: a limpeza do
+cache de exportações (core.export_cache.evict) apaga arquivos antigos de lá,
+e perder a marca transformaria o delta seguinte numa exportação completa.
+"""
+import json
+import os
+import threading
+
+EXPORT_WATERMARK_DIR = os.getenv("EXPORT_WATERMARK_DIR", "./data/export_watermarks")
+
+_lock = threading.Lock()
+
+
+def _path(directory: str, client_id: str) -> str:
+    return os.path.join(directory or EXPORT_WATERMARK_DIR, f"{client_id}.json")
+
+
+def _load(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _key(chat_id, category: str) -> str:
+    return f"{chat_id}:{category}"
+
+
+def get_watermarks(client_id: str, chat_id, categories, directory: str = None) -> dict:
+    """{categoria: timestamp} das categorias que já tiveram exportação neste chat"""
+    with _lock:
+        data = _load(_path(directory, client_id))
+    return {c: data[_key(chat_id, c)] for c in categories if _key(chat_id, c) in data}
+
+
+def set_watermarks(client_id: str, chat_id, marks: dict, directory: str = None):
+    """Avança a marca das categorias entregues, {categoria: timestamp} (escrita atômica)"""
+    path = _path(directory, client_id)
+    with _lock:
+        data = _load(path)
+        for category, timestamp in marks.items():
+            data[_key(chat_id, category)] = int(timestamp)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
@@ -0,0 +1,84 @@
+import csv
+import os
+
+EXPORT_COLUMNS = ("Nome", "Telefone")
+EXPORT_FORMATS = ("excel", "csv")
+
+
+class StreamingExportWriter:
+    """
+    Escreve as linhas de uma exportação direto em CSV e XLSX, uma a uma.
+
+    O Excel usa o modo write-only do openpyxl (memória constante) e o CSV
+    é gravado em utf-8-sig, no mesmo formato que o pandas gerava antes.
+    `formats` permite gravar só um dos dois (ex.: cada formato em uma thread).
+    Uso:
+        with StreamingExportWriter(directory, filename) as writer:
+            for row in rows:
+                writer.write_row(row)
+        writer.paths  # {"excel": ..., "csv": ...}
+    """
+
+    def __init__(self, directory: str, filename: str, columns: tuple = EXPORT_COLUMNS,
+                 formats: tuple = EXPORT_FORMATS):
+        self.columns = columns
+        self.formats = formats
+        self.excel_path = os.path.join(directory, f"{filename}.xlsx")
+        self.csv_path = os.path.join(directory, f"{filename}.csv")
+        self.rows_written = 0
+        self._csv_file = None
+        self._csv = None
+        self._workbook = None
+        self._sheet = None
+
+    @property
+    def paths(self) -> dict:
+        return {"excel": self.excel_path, "csv": self.csv_path}
+
+    def open(self):
+        if "csv" in self.formats:
+            self._csv_file = open(self.csv_path, "w", encoding="utf-8-sig", newline="")
+            self._csv = csv.writer(self._csv_file, lineterminator="\n")
+            self._csv.writerow(self.columns)
+        if "excel" in self.formats:
+            self._open_workbook()
+        return self
+
+    def _open_workbook(self):
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet("Sheet1")
+        header = []
+        for name in self.columns:
+            cell = WriteOnlyCell(self._sheet, value=name)
+            cell.font = Font(bold=True)
+            header.append(cell)
+        self._sheet.append(header)
+
+    def write_row(self, row):
+        """Grava uma linha (sequência na ordem de `columns`) nos formatos abertos"""
+        if self._csv is not None:
+            self._csv.writerow(row)
+        if self._sheet is not None:
+            self._sheet.append(list(row))
+        self.rows_written += 1
+
+    def close(self):
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv = None
+        if self._workbook is not None:
+            self._workbook.save(self.excel_path)
+            self._workbook = None
+            self._sheet = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -1,16 +1,95 @@
 import os
-import re
-import pandas as pd
-from datetime import datetime
+import queue
+import threading
+from concurrent.futures import FIRST_EXCEPTION, Future, wait
+from datetime import datetime, timezone
 from core.logger import logger
+from core.export_writers import StreamingExportWriter, EXPORT_COLUMNS, EXPORT_FORMATS
+from core import contact_normalizer, export_cache, metrics, profiling, tracing
+from core.export_snapshots import SNAPSHOT_FORMATS, build_snapshot_records, write_snapshot
 from integrations.kommo_client import KommoClient
+from integrations.kommo_schema import lead_field_ids_from_config
+from core.lead_index import get_ready_index
+
+EXPORT_CATEGORIES = ("ganhos", "perdidos", "perdidos_followup", "ativos")
+
+# Linhas em trânsito por gravador: o produtor espera quando um formato atrasa
+EXPORT_STREAM_QUEUE_ROWS = int(os.getenv("EXPORT_STREAM_QUEUE_ROWS", "1000"))
+
+
+class ExportAborted(RuntimeError):
+    """A exportação falhou em outra etapa; o gravador para sem completar o arquivo"""
+
+
+class _RowFeed:
+    """
+    Fila limitada entre a resolução de contatos (um produtor) e um gravador.
+    Cada formato consome as linhas enquanto elas são produzidas, então a
+    memória fica constante qualquer que seja o tamanho da exportação.
+    """
+
+    _END = object()
+
+    def __init__(self, maxsize: int = None):
+        self._queue = queue.Queue(maxsize or EXPORT_STREAM_QUEUE_ROWS)
+        self._aborted = threading.Event()
+
+    def put(self, item):
+        # Sem bloquear para sempre: se o gravador falhou, as linhas são descartadas
+        while not self._aborted.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        self.put(self._END)
+
+    def abort(self):
+        self._aborted.set()
+
+    def __iter__(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._aborted.is_set():
+                    raise ExportAborted("Exportação interrompida")
+                continue
+            if item is self._END:
+                return
+            if self._aborted.is_set():
+                raise ExportAborted("Exportação interrompida")
+            yield item
+
+
+def _start_writer(feed: _RowFeed, fn, *args) -> Future:
+    """Roda `fn(*args)` numa thread própria; o Future ganha `abort` para interromper o consumo"""
+    future = Future()
+    future.abort = feed.abort
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            feed.abort()
+            future.set_exception(e)
+
+    threading.Thread(target=tracing.bind(run), name="export-writer", daemon=True).start()
+    return future
 
 
 class ExportEngine:
     """Gera arquivos de exportação de leads por categoria"""
     
     @staticmethod
-    def generate_exports(client_id: str, config: dict, period_timestamps: tuple = None, output_dir: str = "./exports") -> dict:
+    @profiling.profiled("generate_exports")
+    def generate_exports(client_id: str, config: dict, period_timestamps: tuple = None, output_dir: str = "./exports",
+                         formats: tuple = None, categories: tuple = None, use_cache: bool = True,
+                         since: dict = None, watermarks: dict = None) -> dict:
         """
         Gera 4 arquivos por cliente: ganhos, perdidos, perdidos_followup, ativos
         
@@ -19,15 +98,28 @@ class ExportEngine:
             config: Configuração do cliente
             period_timestamps: Tupla (start_ts, end_ts) para filtrar período. Se None, busca tudo
             output_dir: Diretório de saída
+            formats: Formatos a gerar ('excel', 'csv', 'parquet', 'arrow'). Se None, usa
+                settings.export_formats da config ou EXPORT_FORMATS do ambiente (padrão Excel + CSV)
+            categories: Categorias a gerar. Se None, gera as 4
+            use_cache: Reaproveita arquivos de uma exportação idêntica (ver core.export_cache)
+            since: Exportação delta: {categoria: timestamp}. Só entram leads com updated_at
+                a partir do timestamp (criados, alterados ou que mudaram de categoria).
+                Categorias sem timestamp saem completas (primeira exportação delta)
+            watermarks: Se informado, recebe {categoria: maior updated_at dos leads buscados}
+                (relógio do Kommo), a marca da próxima exportação delta. Categorias sem
+                leads ficam de fora
             
-        Retorna dict com paths dos arquivos gerados (Excel e CSV)
+        Retorna dict com paths dos arquivos gerados por categoria e formato
+        (snapshots Parquet/Arrow retornam a lista de arquivos por partição)
         """
+        formats = ExportEngine._resolve_formats(config, formats)
+        categories = tuple(c for c in EXPORT_CATEGORIES if categories is None or c in categories)
         period_label = ""
         if period_timestamps:
             start_ts, end_ts = period_timestamps
             period_label = f" ({datetime.fromtimestamp(start_ts).strftime('%d/%m')} a {datetime.fromtimestamp(end_ts).strftime('%d/%m/%Y')})"
         
-        logger.info(f"📁 Gerando exportações para {client_id}{period_label}")
+        logger.info("📁 Gerando exportações para %s%s", client_id, period_label)
         
         # Criar diretório de saída
         os.makedirs(output_dir, exist_ok=True)
@@ -35,7 +127,12 @@ class ExportEngine:
         os.makedirs(client_dir, exist_ok=True)
         
         # Inicializar cliente Kommo
-        kommo = KommoClient(config['kommo']['subdomain'], config['kommo']['api_token'])
+        kommo = KommoClient(
+            config['kommo']['subdomain'],
+            config['kommo']['api_token'],
+            lead_field_ids=lead_field_ids_from_config(config),
+            lead_index=get_ready_index(client_id),
+        )
         
         # IDs necessários
         pipeline_id = config['kommo']['pipeline_id']
@@ -43,142 +140,242 @@ class ExportEngine:
         lost_status_id = config['kommo']['lost_status_id']
         followup_pipeline_ids = config['kommo'].get('pipeline_followup_id', [])
         
+        # Cache: mesma requisição sobre os mesmos dados reaproveita os arquivos
+        cache_key = None
+        # Deltas dependem da marca d'água de cada chat; não passam pelo cache
+        if use_cache and since is None:
+            try:
+                data_version = kommo.get_data_version([pipeline_id] + list(followup_pipeline_ids))
+                if data_version is not None:
+                    cache_key = export_cache.cache_key(client_id, categories, period_timestamps, formats, data_version)
+                cached = export_cache.lookup(output_dir, client_id, cache_key) if cache_key else None
+                if cached is not None:
+                    logger.info("♻️ Exportação reaproveitada do cache para %s (%s)", client_id, cache_key)
+                    return cached
+            except Exception as e:
+                logger.warning("⚠️ Cache de exportação indisponível para %s: %s", client_id, e)
+                cache_key = None
+        
         # Timestamp para nome dos arquivos
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = "_delta" if since is not None else ""
+        since = since or {}
+        
+        # Gravadores em andamento (um por formato e categoria); aguardados antes de retornar os paths
+        pending_writes = []
+        snapshot = {
+            "client_id": client_id,
+            "config": config,
+            "output_dir": output_dir,
+            "timestamp": timestamp,
+            "snapshot_at": datetime.now(timezone.utc).replace(microsecond=0),
+        }
+        files = {}
+        counts = {}
         
         # Extrair timestamps se informado
         start_ts = period_timestamps[0] if period_timestamps else None
         end_ts = period_timestamps[1] if period_timestamps else None
         
-        # 1. GANHOS - leads fechados como ganho no período
-        endpoint_ganhos = f"{kommo.base_url}/leads"
-        params_ganhos = {
-            "filter[pipeline_id][0]": pipeline_id,
-            "filter[status][0]": won_status_id,
-            "with": "contacts"
-        }
-        # Filtra pela data de fechamento (quando virou ganho)
-        if start_ts and end_ts:
-            params_ganhos["filter[closed_at][from]"] = start_ts
-            params_ganhos["filter[closed_at][to]"] = end_ts
-        
-        logger.info(f"🔍 Buscando ganhos: {endpoint_ganhos}")
-        response_ganhos = kommo._request_get_all_pages(endpoint_ganhos, params_ganhos)
-        logger.info(f"📦 Resposta ganhos: total {len(response_ganhos.get('_embedded', {}).get('leads', []))} leads")
-        won_leads_raw = response_ganhos.get('_embedded', {}).get('leads', [])
-        # Dedupe por ID para evitar duplicatas entre páginas
-        seen_ids = set()
-        won_leads = []
-        for l in won_leads_raw:
-            lid = l.get('id')
-            if lid and lid not in seen_ids:
-                seen_ids.add(lid)
-                won_leads.append(l)
-        logger.info(f"✅ Total de ganhos encontrados: {len(won_leads)}")
-        won_df = ExportEngine._leads_to_dataframe(won_leads, kommo)
-        won_files = ExportEngine._save_both_formats(
-            won_df, 
-            client_dir, 
-            f"{client_id}_ganhos_{timestamp}"
-        )
-        
-        # 2. PERDIDOS - apenas pipeline principal, filtrando por closed_at
-        endpoint_perdidos = f"{kommo.base_url}/leads"
-        params_perdidos = {
-            "filter[pipeline_id][0]": pipeline_id,
-            "filter[status][0]": lost_status_id,
-            "with": "contacts"
-        }
-        if start_ts and end_ts:
-            params_perdidos["filter[closed_at][from]"] = start_ts
-            params_perdidos["filter[closed_at][to]"] = end_ts
-        response_perdidos = kommo._request_get_all_pages(endpoint_perdidos, params_perdidos)
-        lost_leads_raw = response_perdidos.get('_embedded', {}).get('leads', [])
-        seen_ids = set()
-        lost_leads = []
-        for l in lost_leads_raw:
-            lid = l.get('id')
-            if lid and lid not in seen_ids:
-                seen_ids.add(lid)
-                lost_leads.append(l)
-        lost_df = ExportEngine._leads_to_dataframe(lost_leads, kommo)
-        lost_files = ExportEngine._save_both_formats(
-            lost_df, 
-            client_dir, 
-            f"{client_id}_perdidos_{timestamp}"
-        )
-        
-        # 3. PERDIDOS FOLLOW-UP (todas as pipelines de follow-up com status perdido)
-        lost_followup_leads = []
-        for fup_id in followup_pipeline_ids:
-            endpoint_fup = f"{kommo.base_url}/leads"
-            params_fup_closed = {
-                "filter[pipeline_id][0]": fup_id,
-                "filter[status][0]": lost_status_id,
-                "with": "contacts"
-            }
-            params_fup_updated = params_fup_closed.copy()
-            # Filtra pela data de fechamento (quando virou perdido) e fallback updated_at
-            if start_ts and end_ts:
-                params_fup_closed["filter[closed_at][from]"] = start_ts
-                params_fup_closed["filter[closed_at][to]"] = end_ts
-                params_fup_updated["filter[updated_at][from]"] = start_ts
-                params_fup_updated["filter[updated_at][to]"] = end_ts
+        try:
+            # 1. GANHOS - leads fechados como ganho no período
+            if "ganhos" in categories:
+                endpoint_ganhos = f"{kommo.base_url}/leads"
+                params_ganhos = {
+                    "filter[pipeline_id][0]": pipeline_id,
+                    "filter[status][0]": won_status_id,
+                    "with": "contacts"
+                }
+                # Filtra pela data de fechamento (quando virou ganho)
+                if start_ts and end_ts:
+                    params_ganhos["filter[closed_at][from]"] = start_ts
+                    params_ganhos["filter[closed_at][to]"] = end_ts
+                if since.get("ganhos"):
+                    params_ganhos["filter[updated_at][from]"] = since["ganhos"]
             
-            response_fup_closed = kommo._request_get_all_pages(endpoint_fup, params_fup_closed)
-            response_fup_updated = kommo._request_get_all_pages(endpoint_fup, params_fup_updated)
-            lost_fup_raw = []
-            lost_fup_raw.extend(response_fup_closed.get('_embedded', {}).get('leads', []))
-            lost_fup_raw.extend(response_fup_updated.get('_embedded', {}).get('leads', []))
-            # Dedupe incremental
-            existing = {l.get('id') for l in lost_followup_leads}
-            for l in lost_fup_raw:
-                lid = l.get('id')
-                if lid and lid not in existing:
-                    lost_followup_leads.append(l)
-                    existing.add(lid)
-        
-        lost_fup_df = ExportEngine._leads_to_dataframe(lost_followup_leads, kommo)
-        lost_fup_files = ExportEngine._save_both_formats(
-            lost_fup_df, 
-            client_dir, 
-            f"{client_id}_perdidos_followup_{timestamp}"
-        )
-        
-        # 4. ATIVOS - pipeline principal exceto ganhos/perdidos
-        endpoint_ativos = f"{kommo.base_url}/leads"
-        params_ativos = {
-            "filter[pipeline_id][0]": pipeline_id,
-            "with": "contacts"
-        }
-        response_ativos = kommo._request_get_all_pages(endpoint_ativos, params_ativos)
-        all_leads_raw = response_ativos.get('_embedded', {}).get('leads', [])
-        seen_ids = set()
-        all_leads = []
-        for l in all_leads_raw:
-            lid = l.get('id')
-            if lid and lid not in seen_ids:
-                seen_ids.add(lid)
-                all_leads.append(l)
-        active_leads = [
-            l for l in all_leads 
-            if str(l.get('status_id')) not in [str(won_status_id), str(lost_status_id)]
-        ]
-        active_df = ExportEngine._leads_to_dataframe(active_leads, kommo)
-        active_files = ExportEngine._save_both_formats(
-            active_df, 
-            client_dir, 
-            f"{client_id}_ativos_{timestamp}"
-        )
-        
-        logger.info(f"✅ Exportações geradas: {len(won_leads)} ganhos, {len(lost_leads)} perdidos, {len(lost_followup_leads)} follow-up perdidos, {len(active_leads)} ativos")
-        
-        return {
-            "ganhos": won_files,
-            "perdidos": lost_files,
-            "perdidos_followup": lost_fup_files,
-            "ativos": active_files,
-        }
+                logger.info("🔍 Buscando ganhos: %s", endpoint_ganhos)
+                response_ganhos = ExportEngine._fetch(kommo, endpoint_ganhos, params_ganhos)
+                logger.info("📦 Resposta ganhos: total %d leads", len(response_ganhos.get('_embedded', {}).get('leads', [])))
+                won_leads_raw = response_ganhos.get('_embedded', {}).get('leads', [])
+                # Dedupe por ID para evitar duplicatas entre páginas
+                seen_ids = set()
+                won_leads = []
+                for l in won_leads_raw:
+                    lid = l.get('id')
+                    if lid and lid not in seen_ids:
+                        seen_ids.add(lid)
+                        won_leads.append(l)
+                logger.info("✅ Total de ganhos encontrados: %d", len(won_leads))
+                counts["ganhos"] = len(won_leads)
+                ExportEngine._record_watermark(watermarks, "ganhos", won_leads)
+                files["ganhos"] = ExportEngine._submit_formats(
+                    pending_writes,
+                    won_leads,
+                    kommo,
+                    client_dir, 
+                    f"{client_id}_ganhos{suffix}_{timestamp}",
+                    formats,
+                    {**snapshot, "category": "ganhos"},
+                )
+        
+            # 2. PERDIDOS - apenas pipeline principal, filtrando por closed_at
+            if "perdidos" in categories:
+                endpoint_perdidos = f"{kommo.base_url}/leads"
+                params_perdidos = {
+                    "filter[pipeline_id][0]": pipeline_id,
+                    "filter[status][0]": lost_status_id,
+                    "with": "contacts"
+                }
+                if start_ts and end_ts:
+                    params_perdidos["filter[closed_at][from]"] = start_ts
+                    params_perdidos["filter[closed_at][to]"] = end_ts
+                if since.get("perdidos"):
+                    params_perdidos["filter[updated_at][from]"] = since["perdidos"]
+                response_perdidos = ExportEngine._fetch(kommo, endpoint_perdidos, params_perdidos)
+                lost_leads_raw = response_perdidos.get('_embedded', {}).get('leads', [])
+                seen_ids = set()
+                lost_leads = []
+                for l in lost_leads_raw:
+                    lid = l.get('id')
+                    if lid and lid not in seen_ids:
+                        seen_ids.add(lid)
+                        lost_leads.append(l)
+                counts["perdidos"] = len(lost_leads)
+                ExportEngine._record_watermark(watermarks, "perdidos", lost_leads)
+                files["perdidos"] = ExportEngine._submit_formats(
+                    pending_writes,
+                    lost_leads,
+                    kommo,
+                    client_dir, 
+                    f"{client_id}_perdidos{suffix}_{timestamp}",
+                    formats,
+                    {**snapshot, "category": "perdidos"},
+                )
+        
+            # 3. PERDIDOS FOLLOW-UP (todas as pipelines de follow-up com status perdido)
+            if "perdidos_followup" in categories:
+                lost_followup_leads = []
+                for fup_id in followup_pipeline_ids:
+                    endpoint_fup = f"{kommo.base_url}/leads"
+                    params_fup_closed = {
+                        "filter[pipeline_id][0]": fup_id,
+                        "filter[status][0]": lost_status_id,
+                        "with": "contacts"
+                    }
+                    params_fup_updated = params_fup_closed.copy()
+                    # Filtra pela data de fechamento (quando virou perdido) e fallback updated_at
+                    if start_ts and end_ts:
+                        params_fup_closed["filter[closed_at][from]"] = start_ts
+                        params_fup_closed["filter[closed_at][to]"] = end_ts
+                        params_fup_updated["filter[updated_at][from]"] = start_ts
+                        params_fup_updated["filter[updated_at][to]"] = end_ts
+                
+                
+                    lost_fup_raw = []
+                    if since.get("perdidos_followup"):
+                        # Delta: uma única busca pelo que mudou desde a marca
+                        params_fup_closed["filter[updated_at][from]"] = since["perdidos_followup"]
+                        response_fup_delta = ExportEngine._fetch(kommo, endpoint_fup, params_fup_closed)
+                        lost_fup_raw.extend(response_fup_delta.get('_embedded', {}).get('leads', []))
+                    else:
+                        response_fup_closed = ExportEngine._fetch(kommo, endpoint_fup, params_fup_closed)
+                        response_fup_updated = ExportEngine._fetch(kommo, endpoint_fup, params_fup_updated)
+                        lost_fup_raw.extend(response_fup_closed.get('_embedded', {}).get('leads', []))
+                        lost_fup_raw.extend(response_fup_updated.get('_embedded', {}).get('leads', []))
+                    # Dedupe incremental
+                    existing = {l.get('id') for l in lost_followup_leads}
+                    for l in lost_fup_raw:
+                        lid = l.get('id')
+                        if lid and lid not in existing:
+                            lost_followup_leads.append(l)
+                            existing.add(lid)
+            
+                counts["perdidos_followup"] = len(lost_followup_leads)
+                ExportEngine._record_watermark(watermarks, "perdidos_followup", lost_followup_leads)
+                files["perdidos_followup"] = ExportEngine._submit_formats(
+                    pending_writes,
+                    lost_followup_leads,
+                    kommo,
+                    client_dir, 
+                    f"{client_id}_perdidos_followup{suffix}_{timestamp}",
+                    formats,
+                    {**snapshot, "category": "perdidos_followup"},
+                )
+        
+            # 4. ATIVOS - pipeline principal exceto ganhos/perdidos
+            if "ativos" in categories:
+                endpoint_ativos = f"{kommo.base_url}/leads"
+                params_ativos = {
+                    "filter[pipeline_id][0]": pipeline_id,
+                    "with": "contacts"
+                }
+                if since.get("ativos"):
+                    params_ativos["filter[updated_at][from]"] = since["ativos"]
+                response_ativos = ExportEngine._fetch(kommo, endpoint_ativos, params_ativos)
+                all_leads_raw = response_ativos.get('_embedded', {}).get('leads', [])
+                seen_ids = set()
+                all_leads = []
+                for l in all_leads_raw:
+                    lid = l.get('id')
+                    if lid and lid not in seen_ids:
+                        seen_ids.add(lid)
+                        all_leads.append(l)
+                active_leads = [
+                    l for l in all_leads 
+                    if str(l.get('status_id')) not in [str(won_status_id), str(lost_status_id)]
+                ]
+                counts["ativos"] = len(active_leads)
+                # A busca com updated_at cobriu também os ganhos/perdidos da pipeline
+                ExportEngine._record_watermark(watermarks, "ativos", all_leads)
+                files["ativos"] = ExportEngine._submit_formats(
+                    pending_writes,
+                    active_leads,
+                    kommo,
+                    client_dir, 
+                    f"{client_id}_ativos{suffix}_{timestamp}",
+                    formats,
+                    {**snapshot, "category": "ativos"},
+                )
+        except BaseException:
+            # Nenhum gravador continua escrevendo arquivo parcial depois da falha
+            ExportEngine._wait_writes(pending_writes, abort=True)
+            raise
+        # Aguarda todas as gravações (propaga o primeiro erro de escrita)
+        ExportEngine._wait_writes(pending_writes)
+        
+        summary = ", ".join(f"{n} {category.replace('_', ' ')}" for category, n in counts.items())
+        logger.info("✅ Exportações geradas: %s", summary)
+        
+        # Snapshots só conhecem seus arquivos (um por partição) depois de gravados
+        for category_files in files.values():
+            for fmt, value in category_files.items():
+                if isinstance(value, Future):
+                    category_files[fmt] = value.result()
+        
+        if cache_key:
+            export_cache.store(output_dir, client_id, cache_key, files)
+            export_cache.evict(output_dir)
+        return files
+
+    @staticmethod
+    def _fetch(kommo, endpoint: str, params: dict) -> dict:
+        """Varredura paginada de uma categoria (fase `fetch` em /metrics)"""
+        with metrics.EXPORT_PHASE_SECONDS.time(phase="fetch"):
+            return kommo._request_get_all_pages(endpoint, params)
+
+    @staticmethod
+    def _resolve_formats(config: dict, formats=None) -> tuple:
+        """Define os formatos da exportação: argumento > config > ambiente > Excel + CSV"""
+        if formats is None:
+            formats = config.get('settings', {}).get('export_formats')
+        if formats is None:
+            formats = os.getenv("EXPORT_FORMATS", ",".join(EXPORT_FORMATS)).split(",")
+        formats = tuple(f.strip().lower() for f in formats if f and f.strip())
+
+        unknown = [f for f in formats if f not in EXPORT_FORMATS and f not in SNAPSHOT_FORMATS]
+        if unknown or not formats:
+            raise ValueError(f"Formatos de exportação inválidos: {unknown or formats}")
+        return formats
     
     @staticmethod
     def _extract_contact(lead: dict) -> str:
@@ -196,7 +393,7 @@ class ExportEngine:
             for field in custom_fields:
                 values = field.get('values', [])
                 if values:
-                    contact_value = values[0].get('value', '').strip()
+                    contact_value = str(values[0].get('value') or '').strip()
                     if contact_value:
                         contacts.append(contact_value)
         
@@ -214,16 +411,12 @@ class ExportEngine:
     @staticmethod
     def _is_valid_email(email: str) -> bool:
         """Valida formato de email"""
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(email_pattern, email))
+        return contact_normalizer.is_valid_email(email)
     
     @staticmethod
     def _is_valid_phone(phone: str) -> bool:
         """Valida formato de telefone (pode incluir números e alguns caracteres especiais)"""
-        # Remove espaços e caracteres comuns em telefones
-        clean_phone = re.sub(r'[\s\-\(\)\.+]', '', phone)
-        # Verifica se tem entre 10 e 15 dígitos (padrão internacional)
-        return bool(re.match(r'^\d{10,15}$', clean_phone)) and len(clean_phone) >= 10
+        return contact_normalizer.is_valid_phone(phone)
     
     @staticmethod
     def _format_phone(phone: str) -> str:
@@ -234,84 +427,90 @@ class ExportEngine:
         - (11) 9876-5432 → +5511987654321
         - +55 11 98765-4321 → +5511987654321
         - 5511987654321 → +5511987654321
+        Para colunas inteiras, use `contact_normalizer.normalize_contacts`.
         """
-        # Remove todos os caracteres especiais
-        clean_phone = re.sub(r'[\s\-\(\)\.+]', '', phone)
-        
-        # Remove o código do país se já existir
-        if clean_phone.startswith('55'):
-            clean_phone = clean_phone[2:]
-        
-        # Garante que temos 11 dígitos (DDD + número)
-        # Se tiver menos, assume que está incompleto
-        # Se tiver mais, pega os últimos 11
-        if len(clean_phone) > 11:
-            clean_phone = clean_phone[-11:]
-        elif len(clean_phone) < 11:
-            # Se tiver menos de 11, não formata
-            return ""
-        
-        # Formata com o código do país Brasil
-        return f"+55{clean_phone}"
+        return contact_normalizer.format_phone(phone)
     
     @staticmethod
-    def _leads_to_dataframe(leads: list, kommo_client=None) -> pd.DataFrame:
+    def _iter_lead_rows(leads: list, kommo_client=None, batch_size: int = 250):
+        """Gera as linhas (Nome, Telefone) de cada lead, na ordem recebida."""
+        for _, nome, telefone in ExportEngine._iter_resolved_leads(leads, kommo_client, batch_size):
+            yield (nome, telefone)
+
+    @staticmethod
+    def _record_watermark(watermarks: dict, category: str, leads: list):
+        """Guarda em `watermarks` o maior updated_at entre os leads buscados da categoria"""
+        if watermarks is None:
+            return
+        latest = max((l.get("updated_at") or 0 for l in leads), default=0)
+        if latest:
+            watermarks[category] = latest
+
+    @staticmethod
+    def _iter_resolved_leads(leads: list, kommo_client=None, batch_size: int = 250):
         """
-        Converte lista de leads em DataFrame com Nome e Telefone do contato.
+        Gera (lead, Nome, Telefone) para cada lead, na ordem recebida.
+        Os contatos são resolvidos em lotes de até `batch_size` IDs e cada lote
+        é liberado assim que suas linhas são entregues, mantendo a memória constante.
         """
-        if not leads:
-            return pd.DataFrame(columns=["Nome", "Telefone"])
-        
-        # Extrair todos os IDs de contatos únicos
-        all_contact_ids = []
-        lead_contact_map = {}  # Mapeia lead_id -> contact_id principal
-        
+        chunk = []
+        chunk_contact_ids = []
+        seen_in_chunk = set()
+
         for lead in leads:
             contact_ids = ExportEngine._extract_contact_ids(lead)
-            if contact_ids:
-                lead_id = lead.get('id')
-                lead_contact_map[lead_id] = contact_ids[0]  # Primeiro contato (principal)
-                if contact_ids[0] not in all_contact_ids:
-                    all_contact_ids.append(contact_ids[0])
-        
-        # Buscar todos os contatos em lotes de até 250 IDs
+            if contact_ids and contact_ids[0] not in seen_in_chunk:
+                if len(chunk_contact_ids) >= batch_size:
+                    yield from ExportEngine._resolve_chunk(chunk, chunk_contact_ids, kommo_client)
+                    chunk, chunk_contact_ids, seen_in_chunk = [], [], set()
+                seen_in_chunk.add(contact_ids[0])
+                chunk_contact_ids.append(contact_ids[0])
+            chunk.append(lead)
+
+        if chunk:
+            yield from ExportEngine._resolve_chunk(chunk, chunk_contact_ids, kommo_client)
+
+    @staticmethod
+    def _resolve_chunk(leads: list, contact_ids: list, kommo_client=None):
+        """Busca os contatos de um lote de leads e gera (lead, Nome, Telefone)"""
         contacts_data = {}
-        if all_contact_ids and kommo_client:
-            BATCH = 250
-            for i in range(0, len(all_contact_ids), BATCH):
-                chunk_ids = all_contact_ids[i:i+BATCH]
-                contacts_list = kommo_client.get_contacts_batch(chunk_ids)
-                if contacts_list:
-                    for contact in contacts_list:
-                        contact_id = contact.get('id')
-                        if contact_id:
-                            contacts_data[contact_id] = contact
-        
-        # Montar as linhas do DataFrame
-        rows = []
+        if contact_ids and kommo_client:
+            contacts_list = kommo_client.get_contacts_batch(contact_ids)
+            if contacts_list:
+                for contact in contacts_list:
+                    contact_id = contact.get('id')
+                    if contact_id:
+                        contacts_data[contact_id] = contact
+
         for lead in leads:
-            lead_id = lead.get('id')
             nome = ""
             telefone = ""
-            
-            # Se tem contato vinculado, busca dados do contato
-            if lead_id in lead_contact_map:
-                contact_id = lead_contact_map[lead_id]
-                contact = contacts_data.get(contact_id)
+
+            # Se tem contato vinculado, busca dados do contato principal
+            contact_ids = ExportEngine._extract_contact_ids(lead)
+            if contact_ids:
+                contact = contacts_data.get(contact_ids[0])
                 if contact:
                     nome = contact.get('name', '')
                     telefone = ExportEngine._extract_phone_from_contact(contact)
-            
+
             # Se não encontrou dados no contato, usa nome do lead
             if not nome:
-                nome = lead.get('name', 'Sem nome').strip()
-            
-            rows.append({
-                "Nome": nome,
-                "Telefone": telefone,
-            })
-        
-        return pd.DataFrame(rows)
+                nome = (lead.get('name') or 'Sem nome').strip()
+
+            yield (lead, nome, telefone)
+
+    @staticmethod
+    @tracing.traced()
+    def _leads_to_dataframe(leads: list, kommo_client=None):
+        """
+        Converte lista de leads em DataFrame com Nome e Telefone do contato.
+        Mantido para análises ad hoc; a exportação usa `_iter_lead_rows` sem pandas.
+        """
+        import pandas as pd
+
+        rows = list(ExportEngine._iter_lead_rows(leads, kommo_client))
+        return pd.DataFrame(rows, columns=list(EXPORT_COLUMNS))
     
     @staticmethod
     def _extract_contact_ids(lead: dict) -> list:
@@ -346,25 +545,116 @@ class ExportEngine:
             if field_code == 'PHONE':
                 values = field.get('values', [])
                 if values:
-                    phone_value = values[0].get('value', '').strip()
+                    phone_value = str(values[0].get('value') or '').strip()
                     if phone_value:
                         return phone_value
         
         return ""
     
     @staticmethod
-    def _save_both_formats(df: pd.DataFrame, directory: str, filename: str) -> dict:
-        """Salva DataFrame em Excel e CSV, retorna paths"""
-        excel_path = os.path.join(directory, f"{filename}.xlsx")
-        csv_path = os.path.join(directory, f"{filename}.csv")
-        
-        # Salvar Excel
-        df.to_excel(excel_path, index=False, engine='openpyxl')
-        
-        # Salvar CSV
-        df.to_csv(csv_path, index=False, encoding='utf-8-sig')
-        
-        return {
-            "excel": excel_path,
-            "csv": csv_path
-        }
+    @tracing.traced()
+    def _save_both_formats(rows, directory: str, filename: str) -> dict:
+        """
+        Salva as linhas em Excel e CSV em uma única passada, retorna paths.
+        Aceita qualquer iterável de (Nome, Telefone) ou um DataFrame.
+        """
+        if hasattr(rows, 'itertuples'):
+            rows = rows.itertuples(index=False, name=None)
+
+        with StreamingExportWriter(directory, filename) as writer:
+            for row in rows:
+                writer.write_row(row)
+
+        return writer.paths
+
+    @staticmethod
+    @tracing.traced()
+    def _write_format(rows, directory: str, filename: str, fmt: str) -> str:
+        """Grava um único formato ('excel' ou 'csv') e retorna o path; se falhar, remove o parcial"""
+        phase = "write_xlsx" if fmt == "excel" else f"write_{fmt}"
+        writer = StreamingExportWriter(directory, filename, formats=(fmt,))
+        try:
+            with metrics.EXPORT_PHASE_SECONDS.time(phase=phase), writer:
+                for row in rows:
+                    writer.write_row(row)
+        except BaseException:
+            if os.path.exists(writer.paths[fmt]):
+                os.remove(writer.paths[fmt])
+            raise
+        return writer.paths[fmt]
+
+    @staticmethod
+    def _write_snapshot(resolved, snapshot: dict, fmt: str) -> list:
+        records = build_snapshot_records(
+            snapshot["client_id"], snapshot["category"], snapshot["config"], resolved, snapshot["snapshot_at"]
+        )
+        return write_snapshot(records, snapshot["output_dir"], snapshot["client_id"], snapshot["category"],
+                              snapshot["timestamp"], fmt)
+
+    @staticmethod
+    def _wait_writes(pending: list, abort: bool = False):
+        """
+        Aguarda todos os gravadores. No primeiro erro os demais são interrompidos
+        e, depois de todos pararem, o erro é propagado. Com `abort` (a exportação
+        já falhou) só interrompe e aguarda.
+        """
+        if not abort:
+            wait(pending, return_when=FIRST_EXCEPTION)
+        if abort or any(f.done() and f.exception() for f in pending):
+            for future in pending:
+                future.abort()
+        wait(pending)
+        if abort:
+            return
+        errors = [f.exception() for f in pending if f.exception()]
+        # O erro de origem vem antes dos ExportAborted dos gravadores interrompidos por ele
+        errors.sort(key=lambda e: isinstance(e, ExportAborted))
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    def _submit_formats(pending: list, leads: list, kommo_client, directory: str, filename: str,
+                        formats: tuple, snapshot: dict) -> dict:
+        """
+        Resolve os contatos na thread atual e entrega cada linha, assim que
+        resolvida, a um gravador por formato (fila limitada, ver _RowFeed).
+        Os futures são adicionados em `pending`. Excel/CSV retornam o path final;
+        Parquet/Arrow retornam um Future com a lista de arquivos por partição.
+        """
+        # Um gravador anterior já falhou: não adianta buscar e gravar a próxima categoria
+        for future in pending:
+            if future.done() and future.exception():
+                raise future.exception()
+
+        feeds = []
+        paths = {}
+
+        tabular = [fmt for fmt in formats if fmt in EXPORT_FORMATS]
+        writer_paths = StreamingExportWriter(directory, filename).paths
+        for fmt in tabular:
+            feed = _RowFeed()
+            rows = ((nome, telefone) for _, nome, telefone in feed)
+            pending.append(_start_writer(feed, ExportEngine._write_format, rows, directory, filename, fmt))
+            feeds.append(feed)
+            paths[fmt] = writer_paths[fmt]
+
+        for fmt in (fmt for fmt in formats if fmt in SNAPSHOT_FORMATS):
+            feed = _RowFeed()
+            future = _start_writer(feed, ExportEngine._write_snapshot, feed, snapshot, fmt)
+            pending.append(future)
+            feeds.append(feed)
+            paths[fmt] = future
+
+        with metrics.EXPORT_PHASE_SECONDS.time(phase="resolve_contacts"), \
+                tracing.span("resolve_contacts", leads=len(leads)):
+            try:
+                for item in ExportEngine._iter_resolved_leads(leads, kommo_client):
+                    for feed in feeds:
+                        feed.put(item)
+            except BaseException:
+                for feed in feeds:
+                    feed.abort()
+                raise
+        for feed in feeds:
+            feed.close()
+        return paths
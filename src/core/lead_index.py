@@ -0,0 +1,363 @@
+"""
+Índice local de leads e contatos por cliente, alimentado pelos webhooks do Kommo.
+
+Os eventos de lead/contato (add/update/status/delete) são aplicados conforme
+chegam; o índice fica marcado como alterado e é salvo em disco por uma thread
+de gravação, no máximo a cada LEAD_INDEX_FLUSH_S segundos (`schedule_flush`),
+em vez de reescrever o arquivo inteiro a cada evento. Uma varredura periódica
+(`reconcile`) refaz o estado das pipelines configuradas para curar eventos
+perdidos.
+
+Depois da primeira reconciliação o índice está "pronto" e o KommoClient pode
+responder buscas de leads a partir dele, sem ir à API (ver `query`).
+"""
+import json
+import os
+import threading
+import time
+from core.logger import logger
+
+LEAD_INDEX_DIR = os.getenv("LEAD_INDEX_DIR", "./data/lead_index")
+# Liga o uso do índice como fonte das buscas de leads (os webhooks alimentam sempre)
+LEAD_INDEX_ENABLED = os.getenv("KOMMO_LEAD_INDEX", "").lower() in ("1", "true", "yes")
+# Atraso da gravação em disco depois de um evento (agrupa as rajadas de webhooks)
+LEAD_INDEX_FLUSH_S = float(os.getenv("LEAD_INDEX_FLUSH_S", "5"))
+
+_FILTERABLE_DATES = ("created_at", "updated_at", "closed_at")
+
+
+class LeadIndex:
+    """Estado local de um cliente: {lead_id: lead} e {contact_id: contato}"""
+
+    def __init__(self, client_id: str, directory: str = None):
+        self.client_id = client_id
+        self.path = os.path.join(directory or LEAD_INDEX_DIR, f"{client_id}.json")
+        self.leads = {}
+        self.contacts = {}
+        self.reconciled_at = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @property
+    def ready(self) -> bool:
+        """Só responde consultas depois de ao menos uma varredura completa"""
+        return self.reconciled_at is not None
+
+    # ─── Persistência ────────────────────────────────────────────────────────
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+        with self._lock:
+            self.leads = {int(k): v for k, v in data.get("leads", {}).items()}
+            self.contacts = {int(k): v for k, v in data.get("contacts", {}).items()}
+            self.reconciled_at = data.get("reconciled_at")
+        return self
+
+    def save(self):
+        with self._lock:
+            data = {
+                "client_id": self.client_id,
+                "reconciled_at": self.reconciled_at,
+                "leads": self.leads,
+                "contacts": self.contacts,
+            }
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+    def flush(self) -> bool:
+        """Salva só se houve mudança desde a última gravação"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            self.save()
+            return True
+
+    # ─── Eventos ─────────────────────────────────────────────────────────────
+
+    def upsert_lead(self, lead: dict) -> bool:
+        """Aplica o lead se for mais novo que o guardado (eventos podem chegar fora de ordem)"""
+        with self._lock:
+            current = self.leads.get(lead["id"])
+            if current and (current.get("updated_at") or 0) > (lead.get("updated_at") or 0):
+                return False
+            merged = dict(current or {})
+            for key, value in lead.items():
+                # Webhooks parciais não apagam o que já sabemos
+                if value is not None or key not in merged:
+                    merged[key] = value
+            # Sem "_embedded" os contatos do lead são desconhecidos (o webhook de
+            # lead não traz os vínculos); query manda esses casos para a API
+            self.leads[lead["id"]] = merged
+            return True
+
+    def upsert_contact(self, contact: dict):
+        with self._lock:
+            contact = dict(contact)
+            for lead_id in contact.pop("lead_ids", []):
+                refs = (self.leads.get(lead_id) or {}).get("_embedded", {}).get("contacts")
+                # Lead sem lista conhecida continua desconhecido: um só vínculo
+                # não diz se há outros contatos
+                if refs is None:
+                    continue
+                if all(ref.get("id") != contact["id"] for ref in refs):
+                    refs.append({"id": contact["id"]})
+            self.contacts[contact["id"]] = contact
+
+    def apply_events(self, events: list) -> int:
+        """Aplica eventos de kommo_webhook.parse_events; retorna quantos mudaram o índice"""
+        applied = 0
+        with self._lock:
+            for event in events:
+                data = event["data"]
+                if event["entity"] == "lead":
+                    if event["action"] == "delete":
+                        applied += self.leads.pop(data["id"], None) is not None
+                    else:
+                        applied += self.upsert_lead(data)
+                else:
+                    if event["action"] == "delete":
+                        applied += self.contacts.pop(data["id"], None) is not None
+                    else:
+                        self.upsert_contact(data)
+                        applied += 1
+            self._dirty = self._dirty or applied > 0
+        return applied
+
+    # ─── Reconciliação ───────────────────────────────────────────────────────
+
+    def reconcile(self, kommo, pipeline_ids: list) -> dict:
+        """
+        Varre as pipelines no Kommo e substitui o estado local delas:
+        leads novos/alterados entram, os que sumiram saem. Retorna contadores.
+
+        A varredura inteira acontece antes de qualquer mudança: uma página que
+        falha (KommoRequestError) aborta sem tocar no índice. Leads que os
+        webhooks atualizaram depois do que a varredura viu (updated_at maior,
+        relógio do Kommo) não são sobrescritos nem removidos.
+        """
+        started = int(time.time())
+        scanned = {}
+        for pipeline_id in pipeline_ids:
+            response = kommo._request_get_all_pages(
+                f"{kommo.base_url}/leads",
+                {"filter[pipeline_id][0]": pipeline_id, "with": "contacts"},
+            )
+            for lead in response.get("_embedded", {}).get("leads", []):
+                scanned[lead["id"]] = lead
+        scanned_until = max((lead.get("updated_at") or 0 for lead in scanned.values()), default=0) or started
+
+        pipelines = {int(p) for p in pipeline_ids}
+        with self._lock:
+            stale = [
+                lead_id for lead_id, lead in self.leads.items()
+                if lead.get("pipeline_id") in pipelines and lead_id not in scanned
+                and (lead.get("updated_at") or 0) <= scanned_until
+            ]
+            for lead_id in stale:
+                del self.leads[lead_id]
+            changed = 0
+            for lead_id, lead in scanned.items():
+                current = self.leads.get(lead_id)
+                if current == lead or (current and (current.get("updated_at") or 0) > (lead.get("updated_at") or 0)):
+                    continue
+                self.leads[lead_id] = lead
+                changed += 1
+            self.reconciled_at = started
+            self._dirty = True
+        return {"scanned": len(scanned), "changed": changed, "removed": len(stale)}
+
+    # ─── Consultas ───────────────────────────────────────────────────────────
+
+    def query(self, params: dict):
+        """
+        Responde uma busca de /leads com os mesmos filtros usados pelo projeto
+        (pipeline, status e intervalos de created_at/updated_at/closed_at).
+        Retorna None se houver filtro não suportado, ou se `with` pede contatos
+        e algum lead encontrado veio só de webhook (vínculos desconhecidos):
+        o chamador vai à API.
+        """
+        with_contacts = "contacts" in str(params.get("with", "")).split(",")
+        pipelines, statuses, ranges = set(), set(), {}
+        for key, value in params.items():
+            if key in ("with", "page", "limit"):
+                continue
+            if key.startswith("filter[pipeline_id]["):
+                pipelines.add(int(value))
+            elif key.startswith("filter[status]["):
+                statuses.add(int(value))
+            elif key.startswith("filter[") and key.count("[") == 2:
+                field, bound = key[len("filter["):-1].split("][")
+                if field not in _FILTERABLE_DATES or bound not in ("from", "to"):
+                    return None
+                ranges.setdefault(field, {})[bound] = int(value)
+            else:
+                return None
+
+        with self._lock:
+            leads = list(self.leads.values())
+        result = []
+        for lead in leads:
+            if pipelines and lead.get("pipeline_id") not in pipelines:
+                continue
+            if statuses and lead.get("status_id") not in statuses:
+                continue
+            if not all(_in_range(lead.get(f), r) for f, r in ranges.items()):
+                continue
+            if with_contacts and "contacts" not in lead.get("_embedded", {}):
+                return None
+            result.append(lead)
+        result.sort(key=lambda l: l["id"])
+        return result
+
+    def get_contacts(self, contact_ids: list) -> list:
+        with self._lock:
+            return [self.contacts[cid] for cid in contact_ids if cid in self.contacts]
+
+
+def _in_range(value, bounds: dict) -> bool:
+    if value is None:
+        return False
+    if "from" in bounds and value < bounds["from"]:
+        return False
+    if "to" in bounds and value > bounds["to"]:
+        return False
+    return True
+
+
+# ─── Registro por cliente ────────────────────────────────────────────────────
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(client_id: str) -> LeadIndex:
+    """Índice do cliente (carregado do disco na primeira vez)"""
+    with _indexes_lock:
+        index = _indexes.get(client_id)
+        if index is None:
+            index = _indexes[client_id] = LeadIndex(client_id).load()
+        return index
+
+
+def get_ready_index(client_id: str):
+    """Índice pronto para responder buscas, ou None (desligado/não reconciliado)"""
+    if not LEAD_INDEX_ENABLED:
+        return None
+    index = get_index(client_id)
+    return index if index.ready else None
+
+
+def reconcile_client(client_id: str, config: dict):
+    """Reconcilia um cliente contra o Kommo e salva o índice"""
+    from integrations.kommo_client import KommoClient
+    from integrations.kommo_schema import lead_field_ids_from_config
+
+    kommo = KommoClient(
+        config["kommo"]["subdomain"],
+        config["kommo"]["api_token"],
+        lead_field_ids=lead_field_ids_from_config(config),
+    )
+    pipeline_ids = [config["kommo"]["pipeline_id"]] + list(config["kommo"].get("pipeline_followup_id", []))
+    index = get_index(client_id)
+    stats = index.reconcile(kommo, pipeline_ids)
+    index.save()
+    logger.info(
+        "🔄 Índice de leads %s: %d lidos, %d atualizados, %d removidos",
+        client_id, stats["scanned"], stats["changed"], stats["removed"],
+    )
+    return stats
+
+
+# ─── Gravação adiada ─────────────────────────────────────────────────────────
+
+_pending = {}
+_pending_lock = threading.Lock()
+_flush_wake = threading.Event()
+_flusher = None
+
+
+def schedule_flush(*stores):
+    """
+    Agenda a gravação de índices (e de outros estados com `flush()`, como o
+    core.rollups.RollupStore) na thread de gravação: todas as mudanças que
+    chegarem dentro de LEAD_INDEX_FLUSH_S segundos saem numa gravação só.
+    """
+    global _flusher
+    with _pending_lock:
+        for store in stores:
+            _pending[id(store)] = store
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, daemon=True, name="lead-index-flusher")
+            _flusher.start()
+    _flush_wake.set()
+
+
+def flush_pending():
+    """Grava agora tudo que está pendente (também usado no desligamento do servidor)"""
+    with _pending_lock:
+        stores = list(_pending.values())
+        _pending.clear()
+    for store in stores:
+        try:
+            store.flush()
+        except Exception as e:
+            logger.error("❌ Falha ao gravar %s de %s: %s", type(store).__name__, store.client_id, e)
+
+
+def _flush_loop():
+    while True:
+        _flush_wake.wait()
+        _flush_wake.clear()
+        time.sleep(LEAD_INDEX_FLUSH_S)
+        flush_pending()
+
+
+# ─── Reconciliação periódica ─────────────────────────────────────────────────
+
+_reconciler = None
+_wake = threading.Event()
+
+
+def request_reconcile():
+    """Acorda o reconciliador (ex.: índice novo que ainda não está pronto)"""
+    _wake.set()
+
+
+def start_reconciler(load_config, interval_min: float):
+    """
+    Inicia (uma vez) a thread que reconcilia os índices carregados a cada
+    `interval_min` minutos; índices ainda não prontos são reconciliados assim
+    que `request_reconcile` é chamado. `load_config(client_id)` devolve a config.
+    """
+    global _reconciler
+    with _indexes_lock:
+        if _reconciler is not None or interval_min <= 0:
+            return
+        _reconciler = threading.Thread(
+            target=_reconcile_loop, args=(load_config, interval_min * 60), daemon=True, name="lead-index-reconciler"
+        )
+        _reconciler.start()
+
+
+def _reconcile_loop(load_config, interval_s: float):
+    while True:
+        with _indexes_lock:
+            indexes = list(_indexes.values())
+        now = time.time()
+        for index in indexes:
+            if index.ready and now - index.reconciled_at < interval_s:
+                continue
+            try:
+                reconcile_client(index.client_id, load_config(index.client_id))
+            except Exception as e:
+                logger.error(f"❌ Falha ao reconciliar índice de {index.client_id}: {e}")
+        _wake.wait(interval_s)
+        _wake.clear()
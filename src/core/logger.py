@@ -1,6 +1,83 @@
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Variáveis de ambiente:
+#   LOG_LEVEL   → nível mínimo (padrão INFO; DEBUG mostra as linhas por página)
+#   LOG_FORMAT  → "text" (padrão) ou "json" (uma linha JSON por registro)
+#   LOG_SAMPLE  → amostragem por módulo das linhas DEBUG/INFO, ex.: "kommo_client=0.1,messenger=0.5"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_SAMPLE = os.getenv("LOG_SAMPLE", "")
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha: ts, level, module, message (+ exc)"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém 1 a cada N linhas DEBUG/INFO dos módulos configurados (N = 1/taxa).
+    Avisos e erros passam sempre.
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.every = {module: max(1, round(1 / rate)) for module, rate in rates.items() if rate > 0}
+        self.muted = {module for module, rate in rates.items() if rate <= 0}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(spec: str) -> dict:
+        rates = {}
+        for item in spec.split(","):
+            if "=" in item:
+                module, rate = item.split("=", 1)
+                rates[module.strip()] = float(rate)
+        return rates
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        if record.module in self.muted:
+            return False
+        every = self.every.get(record.module)
+        if every is None or every == 1:
+            return True
+        with self._lock:
+            count = self._counts.get(record.module, 0)
+            self._counts[record.module] = count + 1
+        return count % every == 0
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Enfileira o registro sem formatar: a mensagem (args) só é montada na
+    thread do QueueListener, fora do caminho de quem loga.
+    """
+
+    def prepare(self, record):
+        return record
+
 
 def setup_logger():
     # Cria a pasta de logs se não existir
@@ -8,10 +85,13 @@ def setup_logger():
         os.makedirs('logs')
 
     logger = logging.getLogger("KommoAnalytics")
-    logger.setLevel(logging.INFO)
+    logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
 
-    # Formato da mensagem: Data - Nome - Nível - Mensagem
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # Formato da mensagem: Data - Nome - Nível - Mensagem (ou JSON)
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
     # Handler 1: Console (Saída colorida/rápida)
     console_handler = logging.StreamHandler()
@@ -22,12 +102,20 @@ def setup_logger():
     file_handler = RotatingFileHandler('logs/app.log', maxBytes=5*1024*1024, backupCount=5)
     file_handler.setFormatter(formatter)
 
-    # Adiciona os handlers ao logger
+    # Quem loga só enfileira; a escrita em console/arquivo roda na thread do listener
     if not logger.handlers:
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+        log_queue = queue.SimpleQueue()
+        queue_handler = DeferredQueueHandler(log_queue)
+        if LOG_SAMPLE:
+            queue_handler.addFilter(SamplingFilter(SamplingFilter.parse(LOG_SAMPLE)))
+        logger.addHandler(queue_handler)
+        listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        listener.start()
+        # Esvazia a fila ao encerrar o processo
+        atexit.register(listener.stop)
+        logger.listener = listener
 
     return logger
 
 # Instância única para ser importada
-logger = setup_logger()
\ No newline at end of file
+logger = setup_logger()
@@ -0,0 +1,77 @@
+"""
+Cache em disco dos metadados quase estáticos do Kommo.
+
+`/account` (health_check antes de cada cliente), `/leads/pipelines` e
+`/leads/custom_fields` quase nunca mudam, mas eram buscados a cada execução.
+A resposta crua (status 200, corpo e validadores) fica num arquivo por URL,
+escrito de forma atômica, para que vários processos compartilhem o mesmo
+diretório. Dentro de METADATA_CACHE_TTL_MIN minutos a entrada é usada sem
+HTTP; depois o KommoClient revalida com If-None-Match/If-Modified-Since
+quando a API mandou ETag/Last-Modified, ou busca de novo.
+METADATA_CACHE_TTL_MIN=0 desliga o cache.
+"""
+import hashlib
+import json
+import os
+import time
+
+METADATA_CACHE_DIR = os.getenv("METADATA_CACHE_DIR", "./data/metadata_cache")
+METADATA_CACHE_TTL_MIN = float(os.getenv("METADATA_CACHE_TTL_MIN", "60"))
+
+# Cabeçalhos guardados com o corpo: tipo e validadores da revalidação
+KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+
+def _path(directory: str, subdomain: str, url: str, scope: str) -> str:
+    # A URL inteira entra no hash (a mesma conta num servidor falso não colide com a
+    # real), e o escopo (token) também: outro token não herda o health_check de um válido
+    digest = hashlib.sha256(f"{url}\n{scope}".encode("utf-8")).hexdigest()[:16]
+    name = url.rstrip("/").rsplit("/", 1)[-1]
+    return os.path.join(directory or METADATA_CACHE_DIR, subdomain, f"{name}_{digest}.json")
+
+
+def get(subdomain: str, url: str, scope: str = "", directory: str = None):
+    """Entrada guardada ({stored_at, headers, body}), fresca ou não; None se ausente"""
+    try:
+        with open(_path(directory, subdomain, url, scope), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def fresh(entry: dict, ttl_min: float = None) -> bool:
+    ttl_min = METADATA_CACHE_TTL_MIN if ttl_min is None else ttl_min
+    return time.time() - entry.get("stored_at", 0) <= ttl_min * 60
+
+
+def validators(entry: dict) -> dict:
+    """Cabeçalhos condicionais para revalidar a entrada (vazio se a API não mandou validadores)"""
+    headers = (entry or {}).get("headers", {})
+    conditional = {}
+    if headers.get("etag"):
+        conditional["If-None-Match"] = headers["etag"]
+    if headers.get("last-modified"):
+        conditional["If-Modified-Since"] = headers["last-modified"]
+    return conditional
+
+
+def put(subdomain: str, url: str, headers, body: str, scope: str = "", directory: str = None) -> dict:
+    """Guarda uma resposta 200 (headers aceita o CaseInsensitiveDict do requests)"""
+    kept = {}
+    for name, value in headers.items():
+        if name.lower() in KEPT_HEADERS:
+            kept[name.lower()] = value
+    entry = {"stored_at": time.time(), "headers": kept, "body": body}
+    path = _path(directory, subdomain, url, scope)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return entry
+
+
+def touch(subdomain: str, url: str, entry: dict, scope: str = "", directory: str = None) -> dict:
+    """Renova o prazo de uma entrada confirmada pela API (304 Not Modified)"""
+    return put(subdomain, url, entry["headers"], entry["body"], scope, directory)
+
@@ -0,0 +1,169 @@
+"""
+Métricas em processo no formato texto do Prometheus (exposto em /metrics).
+
+Contadores, histogramas e gauges com labels, seguros entre threads e sem
+dependência externa. Os pontos instrumentados são os caminhos quentes:
+requisições ao Kommo (KommoClient._get), páginas por varredura, tamanho dos
+lotes de contatos, fases da exportação, profundidade das filas e envios ao
+Telegram.
+"""
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Buckets em segundos (requisições e fases) e em unidades (páginas, lotes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def _label_key(labelnames: tuple, labels: dict) -> tuple:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series[1] if series else 0
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (bucket_counts, count, total) in sorted(self._series.items()):
+                for bound, n in zip(self.buckets, bucket_counts):
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {n}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_count{labels} {count}")
+                lines.append(f"{self.name}_sum{labels} {round(total, 6)}")
+        return lines
+
+
+class Gauge:
+    """Gauge lido na hora da coleta: `collect()` retorna {valores dos labels: valor}"""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.collect().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+_registry = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def endpoint_label(url: str, base_url: str = "") -> str:
+    """Caminho da API sem a base e com IDs trocados por {id} (cardinalidade baixa)"""
+    path = url[len(base_url):] if base_url and url.startswith(base_url) else url
+    return _ID_SEGMENT.sub("/{id}", path.split("?")[0]) or "/"
+
+
+# ─── Métricas do projeto ─────────────────────────────────────────────────────
+
+KOMMO_REQUESTS = register(Counter(
+    "kommo_requests_total", "Requisições à API do Kommo", ("endpoint", "status"),
+))
+KOMMO_REQUEST_SECONDS = register(Histogram(
+    "kommo_request_seconds", "Latência das requisições à API do Kommo", ("endpoint", "status"),
+))
+KOMMO_METADATA_CACHE = register(Counter(
+    "kommo_metadata_cache_total", "Consultas ao cache de metadados do Kommo (hit, revalidated, miss)",
+    ("endpoint", "result"),
+))
+KOMMO_SCAN_PAGES = register(Histogram(
+    "kommo_scan_pages", "Páginas buscadas por varredura paginada", ("endpoint",), SIZE_BUCKETS,
+))
+KOMMO_CONTACT_BATCH_SIZE = register(Histogram(
+    "kommo_contact_batch_size", "IDs por lote de contatos pedido ao Kommo", (), SIZE_BUCKETS,
+))
+EXPORT_PHASE_SECONDS = register(Histogram(
+    "export_phase_seconds", "Duração das fases da exportação", ("phase",),
+))
+TELEGRAM_SEND_SECONDS = register(Histogram(
+    "telegram_send_seconds", "Latência dos envios ao Telegram", ("method",),
+))
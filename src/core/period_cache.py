@@ -0,0 +1,60 @@
+"""
+Cache em disco dos resultados de período do core.reporting.
+
+Só períodos já encerrados são guardados (os abertos mudam a cada lead novo).
+A chave cobre cliente, intervalo, campos de origem, pipelines e medidas, então
+o mês de setembro calculado para o YTD serve também ao relatório mensal e ao
+trimestral. A versão dos dados do Kommo (KommoClient.get_data_version) também
+entra na chave: um lead alterado depois do fechamento (ganho tardio, origem
+corrigida) gera chave nova em vez de servir o resultado antigo. Um arquivo por
+entrada, escrito de forma atômica, para que vários processos (ver
+generate_batch_reports.py) compartilhem o mesmo diretório. Entradas expiram
+em PERIOD_CACHE_TTL_H horas, o que limita o acúmulo de versões antigas.
+"""
+import hashlib
+import json
+import os
+import time
+
+PERIOD_CACHE_DIR = os.getenv("PERIOD_CACHE_DIR", "./data/period_cache")
+PERIOD_CACHE_TTL_H = float(os.getenv("PERIOD_CACHE_TTL_H", "24"))
+
+
+def cache_key(client_id: str, period: dict, fields: dict, pipeline_ids: list, measures, data_version: str) -> str:
+    payload = json.dumps(
+        [client_id, period["start_ts"], period["end_ts"], sorted(fields.items()), list(pipeline_ids), list(measures),
+         data_version],
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def _path(directory: str, client_id: str, key: str) -> str:
+    return os.path.join(directory or PERIOD_CACHE_DIR, client_id, f"{key}.json")
+
+
+def cacheable(period: dict, now: float = None) -> bool:
+    return period["end_ts"] < (now or time.time())
+
+
+def get(client_id: str, key: str, directory: str = None, max_age_h: float = None):
+    """Resultado guardado (sem o label) ou None se ausente/expirado"""
+    max_age_h = PERIOD_CACHE_TTL_H if max_age_h is None else max_age_h
+    try:
+        with open(_path(directory, client_id, key), encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("stored_at", 0) > max_age_h * 3600:
+        return None
+    return entry["result"]
+
+
+def put(client_id: str, key: str, result: dict, directory: str = None):
+    path = _path(directory, client_id, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {k: v for k, v in result.items() if k != "label"}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"stored_at": time.time(), "result": data}, f, ensure_ascii=False)
+    os.replace(tmp, path)
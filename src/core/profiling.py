@@ -0,0 +1,117 @@
+"""
+Perfil sob demanda (cProfile + tracemalloc) dos pipelines e exportações.
+
+Ativação sem alterar código:
+  - PROFILE=run_analytics_pipeline,generate_exports (ou PROFILE=all) perfila
+    toda chamada dessas funções
+  - `/perfil <comando>` no Telegram (chats de ADMIN_CHAT_IDS) perfila só
+    aquele comando — o pedido segue pelas filas via contextvars
+
+Cada execução grava `<alvo>_<data>_<id>.prof` em PROFILE_DIR (padrão
+logs/profiles), legível com `python -m pstats`, snakeviz ou flameprof. Com
+PROFILE_MEMORY=1 grava também `<...>.mem.txt` com o pico de memória e o
+diff do tracemalloc (maiores alocações por linha). O `<id>` é o run ID do
+trace quando TRACING=1 (core.tracing), para cruzar os dois.
+"""
+import contextvars
+import cProfile
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from core import tracing
+from core.logger import logger
+
+PROFILE_TARGETS = {t.strip() for t in os.getenv("PROFILE", "").split(",") if t.strip()}
+PROFILE_MEMORY = os.getenv("PROFILE_MEMORY", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("logs", "profiles"))
+MEMORY_TOP = 30
+
+_forced = contextvars.ContextVar("profile_forced", default=False)
+_active = contextvars.ContextVar("profile_active", default=False)
+# Um perfil por vez no processo: cProfile e tracemalloc são globais
+_lock = threading.Lock()
+
+
+@contextmanager
+def forced():
+    """Perfila os alvos chamados dentro do bloco (e nas tarefas enfileiradas nele)"""
+    token = _forced.set(True)
+    try:
+        yield
+    finally:
+        _forced.reset(token)
+
+
+def should_profile(name: str) -> bool:
+    return _forced.get() or "all" in PROFILE_TARGETS or name in PROFILE_TARGETS
+
+
+def _write_memory_report(path: str, before, after, peak: int):
+    stats = after.compare_to(before, "lineno")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Pico de memória rastreada: {peak / 1024 / 1024:.1f} MiB\n\n")
+        for stat in stats[:MEMORY_TOP]:
+            f.write(f"{stat}\n")
+
+
+def _run_profiled(name: str, fn, args, kwargs):
+    base = os.path.join(
+        PROFILE_DIR,
+        f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{tracing.current_run_id() or uuid.uuid4().hex[:12]}",
+    )
+    profiler = cProfile.Profile()
+    started_tracemalloc = False
+    if PROFILE_MEMORY:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            started_tracemalloc = True
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+    token = _active.set(True)
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+    finally:
+        _active.reset(token)
+        elapsed = time.perf_counter() - started
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(f"{base}.prof")
+            if PROFILE_MEMORY:
+                _write_memory_report(f"{base}.mem.txt", before, tracemalloc.take_snapshot(),
+                                     tracemalloc.get_traced_memory()[1])
+            logger.info("🔬 Perfil de %s salvo em %s.prof (%.1fs)", name, base, elapsed)
+        except OSError as e:
+            logger.error(f"❌ Falha ao gravar perfil de {name}: {e}")
+        finally:
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+
+def profiled(name: str):
+    """Decorador: roda a função sob cProfile quando `name` estiver ativado"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Chamadas aninhadas já estão no perfil de quem chamou
+            if _active.get() or not should_profile(name):
+                return fn(*args, **kwargs)
+            if not _lock.acquire(blocking=False):
+                logger.warning(f"⚠️ Perfil de {name} ignorado: outro perfil em andamento")
+                return fn(*args, **kwargs)
+            try:
+                return _run_profiled(name, fn, args, kwargs)
+            finally:
+                _lock.release()
+        return wrapper
+    return decorator
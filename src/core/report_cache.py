@@ -0,0 +1,40 @@
+"""
+Cache em memória das mensagens de relatório já calculadas.
+
+A chave é (cliente, tipo de relatório) e a entrada só vale para o mesmo
+início de período e por até REPORT_CACHE_TTL_MIN minutos. O agendador
+(core.scheduler) mantém quentes os relatórios de /semana e /mes e
+pré-calcula os do dia de envio.
+"""
+import os
+import threading
+import time
+
+REPORT_CACHE_TTL_MIN = float(os.getenv("REPORT_CACHE_TTL_MIN", "45"))
+
+_entries = {}
+_lock = threading.Lock()
+
+
+def get(client_id: str, report_type: str, start_ts: int, max_age_s: float = None):
+    """Mensagem em cache para o período que começa em `start_ts`, ou None"""
+    if max_age_s is None:
+        max_age_s = REPORT_CACHE_TTL_MIN * 60
+    with _lock:
+        entry = _entries.get((client_id, report_type))
+    if entry is None:
+        return None
+    cached_start, computed_at, msg = entry
+    if cached_start != start_ts or time.time() - computed_at > max_age_s:
+        return None
+    return msg
+
+
+def put(client_id: str, report_type: str, start_ts: int, msg: str):
+    with _lock:
+        _entries[(client_id, report_type)] = (start_ts, time.time(), msg)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
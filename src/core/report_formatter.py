@@ -40,18 +40,14 @@ def build_weekly_message(client_name: str, stats: dict, origins: dict, conversio
 
 def build_monthly_message(client_name: str, stats: dict, origins: dict, conversion_pct: float,
                           total_lost: int, leads_won: list, origin_field_id: int, label_periodo: str,
-                          start_ts: int, origin_bot_field_id: int = None) -> str:
+                          start_ts: int, origin_bot_field_id: int = None, won_by_origin: dict = None) -> str:
+    """`won_by_origin` já contado (ex.: agregados diários) dispensa a lista `leads_won`."""
     cohort_won = stats['cohort_won']
     old_won = max(stats['total_closed_won'] - cohort_won, 0)
 
     created_by_origin = origins
-    won_by_origin = {}
-    for l in leads_won:
-        if origin_bot_field_id:
-            origin = AnalyticsEngine.get_preferred_origin_value(l, origin_field_id, origin_bot_field_id)
-        else:
-            origin = AnalyticsEngine.get_origin_value(l, origin_field_id)
-        won_by_origin[origin] = won_by_origin.get(origin, 0) + 1
+    if won_by_origin is None:
+        won_by_origin = AnalyticsEngine.count_won_by_origin(leads_won, origin_field_id, origin_bot_field_id)
 
     mes_idx = datetime.fromtimestamp(start_ts).month
     mes_nome = MESES_PT[mes_idx - 1]
@@ -80,9 +76,15 @@ def build_monthly_message(client_name: str, stats: dict, origins: dict, conversi
     return msg
 
 
-def build_annual_message(client_name: str, stats: dict, origins: dict, leads_won: list, start_ts: int) -> str:
+def build_annual_message(client_name: str, stats: dict, origins: dict, leads_won: list, start_ts: int,
+                         won_by_month: dict = None) -> str:
+    """`won_by_month` ({"YYYY-MM": vendas}, dos agregados diários) dispensa a lista `leads_won`."""
     vendas_por_mes = {}
-    for l in leads_won:
+    if won_by_month is not None:
+        for month, count in sorted(won_by_month.items()):
+            key = MESES_PT[int(month[5:7]) - 1]
+            vendas_por_mes[key] = vendas_por_mes.get(key, 0) + count
+    for l in leads_won if won_by_month is None else []:
         ts = l.get('closed_at') or l.get('updated_at')
         if ts:
             dt = datetime.fromtimestamp(int(ts))
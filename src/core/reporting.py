@@ -0,0 +1,446 @@
+"""
+Motor de relatórios por período usado pelos scripts de relatório.
+
+Recebe um cliente, uma lista qualquer de períodos (meses, trimestre, ano...)
+e as dimensões de origem desejadas:
+  1. planeja as buscas mínimas — os períodos são unidos em intervalos
+     contínuos e cada medida (criados, ganhos, perdidos) é buscada uma vez
+     por pipeline e intervalo, não uma vez por período
+  2. calcula tudo numa única passada pelos leads, distribuindo cada lead nos
+     períodos que o contêm (períodos podem se sobrepor, ex.: meses + total)
+  3. renderiza em Markdown, console ou Telegram
+
+Cada resultado de período é um dict com label, start_ts, end_ts, n_created,
+n_won, n_lost, conv e created_by/won_by por dimensão ({dimensão: {origem: n}}).
+"""
+from datetime import datetime, timedelta
+from core import period_cache
+from core.analytics import AnalyticsEngine
+from core.report_formatter import MESES_PT
+
+# Dimensão de origem → chave do campo na config do cliente
+ORIGIN_DIMENSIONS = {
+    "manual": "origin_field_id",
+    "bot": "origin_bot_field_id",
+    "secretary": "secretary_origin_field_id",
+}
+
+DIMENSION_TITLES = {
+    "manual": "Origem (manual)",
+    "bot": "Origem (automática)",
+    "secretary": "Origem (secretária)",
+}
+
+DIMENSION_ICONS = {
+    "manual": "📝",
+    "bot": "🤖",
+    "secretary": "📝",
+}
+
+MEASURES = ("created", "won", "lost")
+
+# Medida → campo de data usado no filtro e na distribuição por período
+_MEASURE_TS = {"created": "created_at", "won": "closed_at", "lost": "closed_at"}
+
+
+# ─── Períodos ────────────────────────────────────────────────────────────────
+
+def period(label: str, start_ts: int, end_ts: int) -> dict:
+    return {"label": label, "start_ts": int(start_ts), "end_ts": int(end_ts)}
+
+
+def month_period(year: int, month: int, label: str = None) -> dict:
+    """Período do mês inteiro (00:00:00 do dia 1 até 23:59:59 do último dia)"""
+    first_day = datetime(year, month, 1)
+    if month == 12:
+        last_day = datetime(year + 1, 1, 1) - timedelta(seconds=1)
+    else:
+        last_day = datetime(year, month + 1, 1) - timedelta(seconds=1)
+    return period(label or f"{MESES_PT[month - 1]} {year}", first_day.timestamp(), last_day.timestamp())
+
+
+def span_period(label: str, periods: list) -> dict:
+    """Período que cobre do início do primeiro ao fim do último (ex.: total do trimestre)"""
+    return period(label, min(p["start_ts"] for p in periods), max(p["end_ts"] for p in periods))
+
+
+# ─── Planejamento e coleta ───────────────────────────────────────────────────
+
+def dimension_fields(config: dict, dimensions) -> dict:
+    """{dimensão: field_id} das dimensões pedidas que estão configuradas para o cliente"""
+    kommo = config["kommo"]
+    return {
+        dim: kommo.get(ORIGIN_DIMENSIONS[dim])
+        for dim in dimensions
+        if kommo.get(ORIGIN_DIMENSIONS[dim])
+    }
+
+
+def _merged_ranges(periods: list) -> list:
+    ranges = []
+    for p in sorted(periods, key=lambda p: p["start_ts"]):
+        if ranges and p["start_ts"] <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], p["end_ts"])
+        else:
+            ranges.append([p["start_ts"], p["end_ts"]])
+    return [tuple(r) for r in ranges]
+
+
+def _pipeline_ids(config: dict, pipeline_ids: list = None) -> list:
+    if pipeline_ids is not None:
+        return list(pipeline_ids)
+    return [config["kommo"]["pipeline_id"]] + (config["kommo"].get("pipeline_followup_id") or [])
+
+
+def plan_fetches(config: dict, periods: list, pipeline_ids: list = None, measures=MEASURES) -> list:
+    """
+    Buscas mínimas para cobrir `periods`: (medida, params) por medida,
+    pipeline e intervalo contínuo.
+    """
+    kommo = config["kommo"]
+    pipeline_ids = _pipeline_ids(config, pipeline_ids)
+    statuses = {"won": kommo["won_status_id"], "lost": kommo["lost_status_id"]}
+
+    plan = []
+    for measure in measures:
+        ts_field = _MEASURE_TS[measure]
+        for start_ts, end_ts in _merged_ranges(periods):
+            for pipeline_id in pipeline_ids:
+                params = {"filter[pipeline_id][0]": pipeline_id}
+                if measure in statuses:
+                    params["filter[status][0]"] = statuses[measure]
+                params[f"filter[{ts_field}][from]"] = start_ts
+                params[f"filter[{ts_field}][to]"] = end_ts
+                plan.append((measure, params))
+    return plan
+
+
+def fetch_planned(kommo, plan: list) -> dict:
+    """Executa o plano; retorna {medida: leads} deduplicados por id (na ordem da API)"""
+    leads = {}
+    seen = {}
+    for measure, params in plan:
+        bucket = leads.setdefault(measure, [])
+        ids = seen.setdefault(measure, set())
+        response = kommo._request_get_all_pages(f"{kommo.base_url}/leads", params)
+        for lead in response.get("_embedded", {}).get("leads", []):
+            lead_id = lead.get("id")
+            if lead_id and lead_id not in ids:
+                ids.add(lead_id)
+                bucket.append(lead)
+    return leads
+
+
+# ─── Cálculo ─────────────────────────────────────────────────────────────────
+
+def _sorted_by_volume(counts: dict) -> dict:
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+
+
+def _finish(p: dict, n_created: int, n_won: int, n_lost: int, created_by: dict, won_by: dict) -> dict:
+    return {
+        **p,
+        "n_created": n_created,
+        "n_won": n_won,
+        "n_lost": n_lost,
+        "conv": round(n_won / n_created * 100, 1) if n_created else 0.0,
+        "created_by": created_by,
+        "won_by": won_by,
+    }
+
+
+def compute(leads_by_measure: dict, periods: list, fields: dict) -> list:
+    """Distribui os leads nos períodos (numa passada por medida) e conta por origem"""
+    acc = [
+        {
+            "created": 0, "won": 0, "lost": 0,
+            "created_by": {dim: {} for dim in fields},
+            "won_by": {dim: {} for dim in fields},
+        }
+        for _ in periods
+    ]
+    bounds = [(p["start_ts"], p["end_ts"]) for p in periods]
+
+    for measure, leads in leads_by_measure.items():
+        ts_field = _MEASURE_TS[measure]
+        by_origin = f"{measure}_by" if measure in ("created", "won") else None
+        for lead in leads:
+            ts = lead.get(ts_field)
+            if not ts:
+                continue
+            targets = [i for i, (start, end) in enumerate(bounds) if start <= ts <= end]
+            if not targets:
+                continue
+            origins = {dim: AnalyticsEngine.get_origin_value(lead, fid) for dim, fid in fields.items()} if by_origin else {}
+            for i in targets:
+                acc[i][measure] += 1
+                for dim, value in origins.items():
+                    counts = acc[i][by_origin][dim]
+                    counts[value] = counts.get(value, 0) + 1
+
+    return [
+        _finish(
+            p, a["created"], a["won"], a["lost"],
+            {dim: _sorted_by_volume(counts) for dim, counts in a["created_by"].items()},
+            a["won_by"],
+        )
+        for p, a in zip(periods, acc)
+    ]
+
+
+def build_report(kommo, config: dict, periods: list, dimensions=("manual",), pipeline_ids: list = None,
+                 measures=MEASURES) -> list:
+    """Planeja, busca e calcula os períodos pedidos; um resultado por período, na mesma ordem"""
+    plan = plan_fetches(config, periods, pipeline_ids, measures)
+    return compute(fetch_planned(kommo, plan), periods, dimension_fields(config, dimensions))
+
+
+def build_report_cached(kommo, client_id: str, config: dict, periods: list, dimensions=("manual",),
+                        pipeline_ids: list = None, measures=MEASURES, cache_dir: str = None) -> list:
+    """
+    build_report reaproveitando períodos encerrados do core.period_cache;
+    só os períodos ausentes entram no plano de buscas. A chave inclui a
+    versão dos dados do Kommo (get_data_version): qualquer lead alterado nas
+    pipelines invalida as entradas. Sem versão, o cache não é usado.
+    """
+    fields = dimension_fields(config, dimensions)
+    pipeline_ids = _pipeline_ids(config, pipeline_ids)
+    data_version = kommo.get_data_version(pipeline_ids) if any(map(period_cache.cacheable, periods)) else None
+    if data_version is None:
+        return build_report(kommo, config, periods, dimensions, pipeline_ids, measures)
+    keys = [period_cache.cache_key(client_id, p, fields, pipeline_ids, measures, data_version) for p in periods]
+
+    results = [None] * len(periods)
+    for i, (p, key) in enumerate(zip(periods, keys)):
+        if period_cache.cacheable(p):
+            cached = period_cache.get(client_id, key, cache_dir)
+            if cached is not None:
+                results[i] = {**cached, **p}
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        computed = build_report(kommo, config, [periods[i] for i in missing], dimensions, pipeline_ids, measures)
+        for i, result in zip(missing, computed):
+            results[i] = result
+            if period_cache.cacheable(periods[i]):
+                period_cache.put(client_id, keys[i], result, cache_dir)
+    return results
+
+
+def build_report_from_rollups(store, config: dict, periods: list, dimensions=("manual",),
+                              pipeline_ids: list = None) -> list:
+    """Mesmos resultados do build_report, somando os agregados diários (core.rollups)"""
+    fields = dimension_fields(config, dimensions)
+    results = []
+    for p in periods:
+        window = store.window(p["start_ts"], p["end_ts"], pipeline_ids)
+        results.append(_finish(
+            p, window["created"], window["won"], window["lost"],
+            {dim: window["created_by"].get(dim, {}) for dim in fields},
+            {dim: window["won_by"].get(dim, {}) for dim in fields},
+        ))
+    return results
+
+
+# ─── Renderização ────────────────────────────────────────────────────────────
+
+def origin_rows(created_by: dict, won_by: dict, total_created: int, include_won_only: bool = False) -> list:
+    """Linhas (origem, leads, % leads, ganhos, conv%) na ordem de `created_by`"""
+    origins = list(created_by)
+    if include_won_only:
+        origins += [origin for origin in won_by if origin not in created_by]
+    rows = []
+    for origin in origins:
+        created = created_by.get(origin, 0)
+        won = won_by.get(origin, 0)
+        pct_leads = round(created / total_created * 100, 1) if total_created else 0.0
+        conv = round(won / created * 100, 1) if created else 0.0
+        rows.append((origin, created, pct_leads, won, conv))
+    return rows
+
+
+def _titles(result: dict, titles: dict = None) -> list:
+    titles = {**DIMENSION_TITLES, **(titles or {})}
+    return [(dim, titles[dim]) for dim in result["created_by"]]
+
+
+def markdown_origin_table(created_by: dict, won_by: dict, total_created: int, include_won_only: bool = False) -> list:
+    lines = [
+        "| Origem | Leads | % Leads | Ganhos | Conv% |",
+        "|---|---:|---:|---:|---:|",
+    ]
+    for origin, created, pct_leads, won, conv in origin_rows(created_by, won_by, total_created, include_won_only):
+        lines.append(f"| {origin} | {created} | {pct_leads:.1f}% | {won} | {conv:.1f}% |")
+    return lines
+
+
+def markdown_metrics_table(result: dict) -> list:
+    return [
+        "| Métrica | Valor |",
+        "|---|---:|",
+        f"| Leads criados | {result['n_created']} |",
+        f"| Ganhos | {result['n_won']} |",
+        f"| Perdidos | {result['n_lost']} |",
+        f"| Conversão | {result['conv']:.1f}% |",
+        "",
+    ]
+
+
+def markdown_overview_table(results: list, total: dict = None, column: str = "Período", labels: list = None) -> list:
+    """Uma linha por período (e a linha de total em negrito, se houver); `labels` troca o rótulo das linhas"""
+    lines = [
+        f"| {column} | Leads criados | Ganhos | Perdidos | Conversão |",
+        "|---|---:|---:|---:|---:|",
+    ]
+    for r, label in zip(results, labels or [r["label"] for r in results]):
+        lines.append(f"| {label} | {r['n_created']} | {r['n_won']} | {r['n_lost']} | {r['conv']:.1f}% |")
+    if total:
+        lines.append(
+            f"| **{total['label']}** | **{total['n_created']}** | **{total['n_won']}** | "
+            f"**{total['n_lost']}** | **{total['conv']:.1f}%** |"
+        )
+    lines.append("")
+    return lines
+
+
+def markdown_origin_sections(result: dict, heading: str = "###", titles: dict = None,
+                             include_won_only: bool = False) -> list:
+    lines = []
+    for dim, title in _titles(result, titles):
+        lines.extend([
+            f"{heading} {title}",
+            "",
+            *markdown_origin_table(result["created_by"][dim], result["won_by"][dim], result["n_created"],
+                                   include_won_only),
+            "",
+        ])
+    return lines
+
+
+def markdown_period(result: dict, heading: str = "##", titles: dict = None) -> list:
+    """Seção do período: métricas e uma tabela por dimensão de origem"""
+    return [
+        f"{heading} {result['label']}",
+        "",
+        *markdown_metrics_table(result),
+        *markdown_origin_sections(result, heading + "#", titles),
+    ]
+
+
+def markdown_consolidated(total: dict, titles: dict = None, heading: str = None) -> list:
+    """Tabelas de origem do período acumulado, incluindo origens só com ganhos"""
+    heading = heading or f"Consolidado {total['label']}"
+    lines = []
+    for dim, dim_title in _titles(total, titles):
+        lines.extend([
+            f"## {heading} — {dim_title}",
+            "",
+            *markdown_origin_table(total["created_by"][dim], total["won_by"][dim], total["n_created"],
+                                   include_won_only=True),
+            "",
+        ])
+    return lines
+
+
+def markdown_document(client_name: str, title: str, period_text: str, body: list, generated_at: str = None) -> str:
+    """Cabeçalho, visão geral (`body`) e rodapé com a data de geração"""
+    generated_at = generated_at or datetime.now().strftime("%d/%m/%Y %H:%M")
+    return "\n".join([
+        f"# {title} — {client_name}",
+        "",
+        f"Período: **{period_text}**",
+        "",
+        "## Visão geral",
+        "",
+        *body,
+        f"_Relatório gerado em {generated_at}_",
+        "",
+    ])
+
+
+def markdown_report(client_name: str, title: str, period_text: str, results: list, total: dict = None,
+                    titles: dict = None, generated_at: str = None) -> str:
+    """
+    Documento completo: um período vira métricas + tabelas de origem; vários
+    viram visão geral, uma seção por período e o consolidado de `total`.
+    """
+    if len(results) == 1 and total is None:
+        body = [*markdown_metrics_table(results[0]), *markdown_origin_sections(results[0], titles=titles)]
+    else:
+        body = markdown_overview_table(results, total)
+        for result in results:
+            body.extend(markdown_period(result, titles=titles))
+        if total is not None:
+            body.extend(markdown_consolidated(total, titles))
+    return markdown_document(client_name, title, period_text, body, generated_at)
+
+
+def console_origin_table(title: str, created_by: dict, won_by: dict, total_created: int,
+                         include_won_only: bool = False) -> list:
+    lines = [
+        f"\n  {title}",
+        f"  {'Origem':<32} {'Leads':>6}  {'% Leads':>7}  {'Ganhos':>7}  {'Conv%':>6}",
+        f"  {'─'*32} {'─'*6}  {'─'*7}  {'─'*7}  {'─'*6}",
+    ]
+    for origin, created, pct_leads, won, conv in origin_rows(created_by, won_by, total_created, include_won_only):
+        lines.append(f"  {origin:<32} {created:>6}  {pct_leads:>6.1f}%  {won:>7}  {conv:>5.1f}%")
+    return lines
+
+
+def console_share_table(counts: dict, total: int) -> list:
+    """Tabela origem → leads e % (sem conversão)"""
+    lines = [
+        f"  {'Origem':<40} {'Leads':>10}  {'%':>6}",
+        f"  {'─'*40} {'─'*10}  {'─'*6}",
+    ]
+    for origin, count in counts.items():
+        pct = round(count / total * 100, 1) if total else 0.0
+        lines.append(f"  {origin:<40} {count:>10}  {pct:>5.1f}%")
+    lines.extend([
+        f"  {'─'*40} {'─'*10}  {'─'*6}",
+        f"  {'TOTAL':<40} {total:>10}  {'100.0%':>6}",
+    ])
+    return lines
+
+
+def console_period(result: dict, titles: dict = None, icons: dict = None, include_won_only: bool = False,
+                   with_origins: bool = True) -> list:
+    """Bloco do período no console: cabeçalho, métricas e tabelas de origem"""
+    icons = {**DIMENSION_ICONS, **(icons or {})}
+    lines = [
+        f"\n{'─' * 65}",
+        f"  📅 {result['label'].upper()}",
+        f"{'─' * 65}",
+        f"  📥  Leads criados  : {result['n_created']}",
+        f"  ✅  Ganhos         : {result['n_won']}",
+        f"  ❌  Perdidos       : {result['n_lost']}",
+        f"  📈  Conversão      : {result['conv']:.1f}%",
+    ]
+    for dim, title in _titles(result, titles) if with_origins else ():
+        lines.extend(console_origin_table(
+            f"{icons[dim]} {title}", result["created_by"][dim], result["won_by"][dim], result["n_created"],
+            include_won_only,
+        ))
+    return lines
+
+
+def telegram_message(client_name: str, results: list, titles: dict = None, top: int = 5) -> str:
+    """Resumo dos períodos no formato das mensagens do bot (Markdown do Telegram)"""
+    msg = f"💎 Cliente: {client_name.upper()}\n━━━━━━━━━━━━━━━━━━━━\n\n"
+    for r in results:
+        msg += (
+            f"📅 *{r['label']}*\n"
+            f"├ Leads Novos: *{r['n_created']}*\n"
+            f"├ Vendas: *{r['n_won']}*\n"
+            f"├ Perdidos: *{r['n_lost']}*\n"
+            f"└ 📈 Conversão: *{r['conv']}%*\n"
+        )
+        for dim, title in _titles(r, titles):
+            rows = origin_rows(r["created_by"][dim], r["won_by"][dim], r["n_created"])[:top]
+            if rows:
+                msg += f"🌍 _{title}_\n"
+                for idx, (origin, created, _, won, _) in enumerate(rows, 1):
+                    msg += f"{idx}. {origin}: *{created}* ({won} vendas)\n"
+        msg += "\n"
+    msg += "━━━━━━━━━━━━━━━━━━━━\n_Atualizado em análise automática_ ⚙️"
+    return msg
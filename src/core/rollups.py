@@ -0,0 +1,298 @@
+"""
+Agregados diários materializados por cliente.
+
+Para cada dia (data local) e pipeline são mantidos os contadores usados pelos
+relatórios: leads criados por origem (manual, bot, secretária e a origem
+preferida manual→bot), ganhos por origem (pelo dia do fechamento), perdidos e
+"ganhos da coorte" (leads criados no dia que hoje estão ganhos).
+
+Qualquer janela de relatório vira uma soma sobre os dias da janela, sem
+varrer leads. A atualização é incremental: cada lead guarda o "fato" com que
+contribuiu; quando muda, a contribuição antiga sai e a nova entra. A sincronia
+busca só os leads com `updated_at` desde a última (e refaz tudo de tempos em
+tempos para curar leads removidos).
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from core.analytics import AnalyticsEngine
+from core.logger import logger
+
+ROLLUP_DIR = os.getenv("ROLLUP_DIR", "./data/rollups")
+# Liga os agregados no run_analytics_pipeline
+ROLLUPS_ENABLED = os.getenv("ANALYTICS_ROLLUPS", "").lower() in ("1", "true", "yes")
+# Sincronia completa periódica (remove leads apagados no Kommo)
+ROLLUP_FULL_SYNC_DAYS = float(os.getenv("ROLLUP_FULL_SYNC_DAYS", "7"))
+
+def day_key(ts) -> str | None:
+    """Dia local (mesmo fuso do DateHelper) de um timestamp"""
+    return datetime.fromtimestamp(int(ts)).strftime("%Y-%m-%d") if ts else None
+
+
+def _empty_bucket() -> dict:
+    return {"created": 0, "cohort_won": 0, "won": 0, "lost": 0, "created_by": {}, "won_by": {}}
+
+
+def _bump(counter: dict, key: str, delta: int):
+    value = counter.get(key, 0) + delta
+    if value:
+        counter[key] = value
+    else:
+        counter.pop(key, None)
+
+
+def _sorted_counts(counts: dict) -> dict:
+    # Mesmo critério do group_by_origin (volume desc); empates em ordem alfabética
+    return dict(sorted(counts.items(), key=lambda item: (-item[1], item[0])))
+
+
+class RollupStore:
+    """Contadores diários de um cliente + fatos por lead para atualização incremental"""
+
+    def __init__(self, client_id: str, config: dict, directory: str = None):
+        kommo = config["kommo"]
+        self.client_id = client_id
+        self.path = os.path.join(directory or ROLLUP_DIR, f"{client_id}.json")
+        self.pipeline_ids = [kommo["pipeline_id"]] + list(kommo.get("pipeline_followup_id") or [])
+        self.won_status_id = kommo["won_status_id"]
+        self.lost_status_id = kommo["lost_status_id"]
+        self.manual_field_id = kommo.get("origin_field_id")
+        self.bot_field_id = kommo.get("origin_bot_field_id")
+        self.secretary_field_id = kommo.get("secretary_origin_field_id")
+        self.days = {}
+        self.facts = {}
+        self.synced_at = None
+        self.full_synced_at = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    # ─── Persistência ────────────────────────────────────────────────────────
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return self
+        with self._lock:
+            self.days = data.get("days", {})
+            self.facts = {int(k): v for k, v in data.get("facts", {}).items()}
+            self.synced_at = data.get("synced_at")
+            self.full_synced_at = data.get("full_synced_at")
+        return self
+
+    def save(self):
+        with self._lock:
+            data = {
+                "client_id": self.client_id,
+                "synced_at": self.synced_at,
+                "full_synced_at": self.full_synced_at,
+                "days": self.days,
+                "facts": self.facts,
+            }
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+    def flush(self) -> bool:
+        """Salva só se houve mudança desde a última gravação (ver lead_index.schedule_flush)"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            self.save()
+            return True
+
+    # ─── Atualização incremental ─────────────────────────────────────────────
+
+    def _origins(self, lead: dict) -> dict:
+        origins = {"manual": str(AnalyticsEngine.get_origin_value(lead, self.manual_field_id))}
+        if self.bot_field_id:
+            origins["bot"] = str(AnalyticsEngine.get_origin_value(lead, self.bot_field_id))
+            origins["preferred"] = str(AnalyticsEngine.get_preferred_origin_value(
+                lead, self.manual_field_id, self.bot_field_id
+            ))
+        else:
+            origins["preferred"] = origins["manual"]
+        if self.secretary_field_id:
+            origins["secretary"] = str(AnalyticsEngine.get_origin_value(lead, self.secretary_field_id))
+        return origins
+
+    def _fact(self, lead: dict, previous: dict = None) -> dict:
+        previous = previous or {}
+        # Eventos parciais (ex.: webhook de mudança de etapa) mantêm o que já se sabia
+        origins = self._origins(lead) if lead.get("custom_fields_values") is not None else previous.get("o")
+        return {
+            "p": lead.get("pipeline_id") or previous.get("p"),
+            "s": lead.get("status_id") or previous.get("s"),
+            "c": day_key(lead.get("created_at")) or previous.get("c"),
+            "x": day_key(lead.get("closed_at")) or previous.get("x"),
+            "o": origins or self._origins(lead),
+        }
+
+    def _bucket(self, day: str, pipeline: str) -> dict:
+        return self.days.setdefault(day, {}).setdefault(pipeline, _empty_bucket())
+
+    def _contribute(self, fact: dict, sign: int):
+        pipeline = str(fact["p"])
+        if fact["c"]:
+            bucket = self._bucket(fact["c"], pipeline)
+            bucket["created"] += sign
+            for kind, value in fact["o"].items():
+                _bump(bucket["created_by"].setdefault(kind, {}), value, sign)
+            if fact["s"] == self.won_status_id:
+                bucket["cohort_won"] += sign
+        if fact["x"] and fact["s"] == self.won_status_id:
+            bucket = self._bucket(fact["x"], pipeline)
+            bucket["won"] += sign
+            for kind, value in fact["o"].items():
+                _bump(bucket["won_by"].setdefault(kind, {}), value, sign)
+        if fact["x"] and fact["s"] == self.lost_status_id:
+            self._bucket(fact["x"], pipeline)["lost"] += sign
+
+    def apply_lead(self, lead: dict):
+        """Aplica (ou reaplica) um lead: desfaz a contribuição anterior e soma a nova"""
+        with self._lock:
+            previous = self.facts.get(lead["id"])
+            fact = self._fact(lead, previous)
+            if fact == previous:
+                return False
+            if previous:
+                self._contribute(previous, -1)
+            self._contribute(fact, +1)
+            self.facts[lead["id"]] = fact
+            return True
+
+    def remove_lead(self, lead_id: int):
+        with self._lock:
+            previous = self.facts.pop(lead_id, None)
+            if previous:
+                self._contribute(previous, -1)
+            return previous is not None
+
+    def apply_events(self, events: list) -> int:
+        """Aplica eventos de lead de kommo_webhook.parse_events"""
+        applied = 0
+        with self._lock:
+            for event in events:
+                if event["entity"] != "lead":
+                    continue
+                if event["action"] == "delete":
+                    applied += self.remove_lead(event["data"]["id"])
+                else:
+                    applied += self.apply_lead(event["data"])
+            self._dirty = self._dirty or applied > 0
+        return applied
+
+    def sync(self, kommo, full: bool = None) -> dict:
+        """
+        Atualiza os agregados a partir do Kommo. Incremental (updated_at desde
+        a última sincronia) por padrão; completa na primeira vez e a cada
+        ROLLUP_FULL_SYNC_DAYS, removendo leads que sumiram.
+
+        Todas as pipelines são lidas antes de qualquer mudança: se uma página
+        falhar (KommoRequestError), nada é aplicado nem removido e a marca da
+        sincronia não avança. A marca é o maior updated_at lido (relógio do
+        Kommo), não o relógio local.
+        """
+        started = int(time.time())
+        if full is None:
+            full = (
+                self.synced_at is None or self.full_synced_at is None
+                or started - self.full_synced_at > ROLLUP_FULL_SYNC_DAYS * 86400
+            )
+
+        leads = []
+        for pipeline_id in self.pipeline_ids:
+            params = {"filter[pipeline_id][0]": pipeline_id}
+            if not full:
+                params["filter[updated_at][from]"] = self.synced_at
+            response = kommo._request_get_all_pages(f"{kommo.base_url}/leads", params)
+            leads.extend(response.get("_embedded", {}).get("leads", []))
+
+        seen = set()
+        changed = 0
+        removed = 0
+        with self._lock:
+            for lead in leads:
+                seen.add(lead["id"])
+                changed += self.apply_lead(lead)
+            if full:
+                for lead_id in [lid for lid in self.facts if lid not in seen]:
+                    removed += self.remove_lead(lead_id)
+                self.full_synced_at = started
+            # Sem leads lidos a marca fica onde estava (na primeira vez, o início da varredura)
+            latest = max((lead.get("updated_at") or 0 for lead in leads), default=0)
+            self.synced_at = max(latest, self.synced_at or 0) or started
+            self._dirty = True
+        return {"full": full, "scanned": len(seen), "changed": changed, "removed": removed}
+
+    # ─── Consultas ───────────────────────────────────────────────────────────
+
+    def window(self, start_ts: int, end_ts: int, pipeline_ids: list = None) -> dict:
+        """
+        Soma os dias de [start_ts, end_ts] (dias locais inteiros) nas pipelines pedidas.
+        Retorna created, cohort_won, won, lost, created_by/won_by por tipo de origem
+        e won_by_month ("YYYY-MM" → ganhos).
+        """
+        pipelines = {str(p) for p in (pipeline_ids or self.pipeline_ids)}
+        first = datetime.fromtimestamp(start_ts).date()
+        last = datetime.fromtimestamp(end_ts).date()
+
+        totals = {"created": 0, "cohort_won": 0, "won": 0, "lost": 0}
+        created_by, won_by, won_by_month = {}, {}, {}
+        with self._lock:
+            day = first
+            while day <= last:
+                for pipeline, bucket in self.days.get(day.isoformat(), {}).items():
+                    if pipeline not in pipelines:
+                        continue
+                    for key in totals:
+                        totals[key] += bucket[key]
+                    for target, source in ((created_by, bucket["created_by"]), (won_by, bucket["won_by"])):
+                        for kind, counts in source.items():
+                            merged = target.setdefault(kind, {})
+                            for value, n in counts.items():
+                                merged[value] = merged.get(value, 0) + n
+                    if bucket["won"]:
+                        month = day.strftime("%Y-%m")
+                        won_by_month[month] = won_by_month.get(month, 0) + bucket["won"]
+                day += timedelta(days=1)
+
+        return {
+            **totals,
+            "created_by": {kind: _sorted_counts(counts) for kind, counts in created_by.items()},
+            "won_by": won_by,
+            "won_by_month": won_by_month,
+        }
+
+
+# ─── Registro por cliente ────────────────────────────────────────────────────
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(client_id: str, config: dict) -> RollupStore:
+    """Agregados do cliente (carregados do disco na primeira vez)"""
+    with _stores_lock:
+        store = _stores.get(client_id)
+        if store is None:
+            store = _stores[client_id] = RollupStore(client_id, config).load()
+        return store
+
+
+def synced_store(client_id: str, config: dict, kommo) -> RollupStore:
+    """Agregados do cliente já sincronizados com o Kommo (e salvos)"""
+    store = get_store(client_id, config)
+    stats = store.sync(kommo)
+    store.save()
+    logger.info(
+        "📚 Agregados %s: %s, %d lidos, %d alterados, %d removidos",
+        client_id, "completa" if stats["full"] else "incremental", stats["scanned"], stats["changed"], stats["removed"],
+    )
+    return store
@@ -0,0 +1,171 @@
+"""
+Agendador em processo (APScheduler) dos relatórios por cliente.
+
+Para cada cliente com chat configurado, usando `settings.report_day` e
+`settings.timezone` da config:
+  - semanal: pré-calcula a semana passada REPORT_PREWARM_MINUTES antes de
+    REPORT_SEND_TIME no dia do relatório e envia no horário
+  - mensal: o mesmo para o mês anterior, no primeiro dia do relatório do mês
+  - /semana e /mes: recalculados a cada REPORT_CACHE_REFRESH_MIN minutos, para
+    que os comandos interativos saiam do cache (core.report_cache)
+
+Com vários workers do uvicorn, só o processo que obtém o lock em
+SCHEDULER_LOCK_PATH roda o agendador; os demais seguem sem ele. Cada envio
+agendado é registrado por cliente, tipo e início do período em
+SCHEDULED_SENDS_DIR, então um segundo disparo do mesmo período (outro
+processo, reinício dentro da janela de tolerância) não reenvia.
+
+As funções de trabalho são injetadas (o agendador não importa o main).
+"""
+import os
+from datetime import datetime, timedelta
+from core.logger import logger
+
+REPORT_SCHEDULER_ENABLED = os.getenv("REPORT_SCHEDULER", "").lower() in ("1", "true", "yes")
+REPORT_SEND_TIME = os.getenv("REPORT_SEND_TIME", "08:00")
+REPORT_PREWARM_MINUTES = int(os.getenv("REPORT_PREWARM_MINUTES", "20"))
+REPORT_CACHE_REFRESH_MIN = float(os.getenv("REPORT_CACHE_REFRESH_MIN", "30"))
+SCHEDULER_LOCK_PATH = os.getenv("SCHEDULER_LOCK_PATH", "./data/scheduler.lock")
+SCHEDULED_SENDS_DIR = os.getenv("SCHEDULED_SENDS_DIR", "./data/scheduled_sends")
+
+DEFAULT_REPORT_DAY = "Wednesday"
+DEFAULT_TIMEZONE = "America/Sao_Paulo"
+
+# Relatórios servidos do cache nos comandos /semana e /mes
+INTERACTIVE_REPORTS = ("weekly", "current_month")
+
+_DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def _day_index(report_day: str) -> int:
+    key = (report_day or DEFAULT_REPORT_DAY).strip().lower()[:3]
+    if key not in _DAYS:
+        raise ValueError(f"report_day inválido: {report_day}")
+    return _DAYS.index(key)
+
+
+def _cron_time(day_index: int, hhmm: str, minutes_before: int = 0) -> dict:
+    """Campos do CronTrigger para `hhmm` no dia `day_index`, recuando `minutes_before`"""
+    hour, minute = (int(part) for part in hhmm.split(":"))
+    # Semana de referência que começa numa segunda (2024-01-01)
+    moment = datetime(2024, 1, 1 + day_index, hour, minute) - timedelta(minutes=minutes_before)
+    return {"day_of_week": _DAYS[moment.weekday()], "hour": moment.hour, "minute": moment.minute}
+
+
+def cache_max_age_s(report_type: str):
+    """
+    Idade máxima de uma entrada do core.report_cache. As de /semana e /mes
+    valem só por um ciclo de atualização: entrada que nenhum refresh renovou
+    (worker sem o agendador, agendador parado) não passa desse prazo.
+    None = prazo padrão do cache.
+    """
+    if report_type in INTERACTIVE_REPORTS:
+        return REPORT_CACHE_REFRESH_MIN * 60
+    return None
+
+
+def acquire_leader_lock(path: str = None):
+    """
+    Lock exclusivo e não bloqueante do agendador. Retorna o arquivo aberto
+    (manter a referência enquanto o agendador roda) ou None se outro processo
+    já tem o lock. O sistema libera o lock quando o processo termina.
+    """
+    import fcntl
+
+    path = path or SCHEDULER_LOCK_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    lock_file = open(path, "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+
+def _send_marker(client_id: str, report_type: str, period_start: int, directory: str = None) -> str:
+    return os.path.join(directory or SCHEDULED_SENDS_DIR, client_id, f"{report_type}_{period_start}.sent")
+
+
+def claim_send(client_id: str, report_type: str, period_start: int, directory: str = None) -> bool:
+    """
+    Registra o envio do período; False se ele já foi registrado (por este ou
+    outro processo). Se o envio falhar, `release_send` desfaz o registro para
+    que o próximo disparo tente de novo.
+    """
+    path = _send_marker(client_id, report_type, period_start, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+
+def release_send(client_id: str, report_type: str, period_start: int, directory: str = None):
+    """Desfaz o claim_send de um envio que não aconteceu"""
+    try:
+        os.remove(_send_marker(client_id, report_type, period_start, directory))
+    except FileNotFoundError:
+        pass
+
+
+def client_jobs(client_id: str, config: dict) -> list:
+    """
+    Jobs de um cliente como (id, tarefa, tipo de relatório, kwargs do trigger).
+    Tarefa é "prewarm" ou "send"; trigger "cron" (com timezone) ou "interval".
+    """
+    settings = config.get("settings", {})
+    timezone = settings.get("timezone") or DEFAULT_TIMEZONE
+    day = _day_index(settings.get("report_day"))
+    prewarm = _cron_time(day, REPORT_SEND_TIME, REPORT_PREWARM_MINUTES)
+    send = _cron_time(day, REPORT_SEND_TIME)
+
+    jobs = []
+    for report_type, extra in (("last_week", {}), ("last_month", {"day": "1-7"})):
+        jobs.append((f"{client_id}:prewarm:{report_type}", "prewarm", report_type,
+                     {"trigger": "cron", "timezone": timezone, **prewarm, **extra}))
+        jobs.append((f"{client_id}:send:{report_type}", "send", report_type,
+                     {"trigger": "cron", "timezone": timezone, **send, **extra}))
+    for report_type in INTERACTIVE_REPORTS:
+        jobs.append((f"{client_id}:refresh:{report_type}", "prewarm", report_type,
+                     {"trigger": "interval", "minutes": REPORT_CACHE_REFRESH_MIN}))
+    return jobs
+
+
+def build_scheduler(clients: list, load_config, prewarm, send):
+    """
+    Monta (sem iniciar) o BackgroundScheduler com os jobs de cada cliente.
+    `prewarm(client_id, report_type)` calcula e guarda no cache;
+    `send(client_id, report_type)` envia (usando o cache se estiver quente).
+    """
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    scheduler = BackgroundScheduler(job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 600})
+    tasks = {"prewarm": prewarm, "send": send}
+    now = datetime.now()
+    for client_id in clients:
+        try:
+            config = load_config(client_id)
+        except Exception as e:
+            logger.error(f"❌ Agendador: config inválida para {client_id}: {e}")
+            continue
+        if not config.get("notifications", {}).get("telegram_chat_id"):
+            # Sem chat não há envio; também não vale aquecer cache
+            continue
+        for job_id, task, report_type, trigger in client_jobs(client_id, config):
+            trigger = dict(trigger)
+            kind = trigger.pop("trigger")
+            if kind == "interval":
+                # Aquece o cache logo na subida, escalonando os clientes
+                trigger["next_run_time"] = now + timedelta(seconds=5 * len(scheduler.get_jobs()))
+            scheduler.add_job(
+                tasks[task], kind, args=(client_id, report_type), id=job_id, replace_existing=True, **trigger
+            )
+    logger.info("⏰ Agendador com %d jobs para %d clientes", len(scheduler.get_jobs()), len(clients))
+    return scheduler
@@ -53,6 +53,9 @@ def exports_menu():
                 {"text": "Ativos 15d", "callback_data": "cmd:/exportar_ativos_15dias"},
                 {"text": "Follow-up 15d", "callback_data": "cmd:/exportar_perdidos_followup_15dias"},
             ],
+            [
+                {"text": "Novidades desde a última", "callback_data": "cmd:/exportar_delta"},
+            ],
             [
                 {"text": "🔙 Voltar", "callback_data": "menu_main"},
             ],
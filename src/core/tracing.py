@@ -0,0 +1,151 @@
+"""
+Rastreamento por execução (pipeline de relatórios e exportações).
+
+Com TRACING=1 cada execução (`run`) ganha um run ID propagado por contextvars
+e grava, ao terminar, um arquivo JSON no formato Chrome Trace em TRACE_DIR
+(padrão logs/traces) — abre em chrome://tracing ou https://ui.perfetto.dev.
+Os spans aninhados (`span` / `@traced`) mostram quanto tempo foi paginação,
+resolução de contatos, gravação dos arquivos e envio ao Telegram.
+
+Desligado (padrão), `span` e `@traced` custam só a leitura de um contextvar.
+Threads de pools não herdam o contexto: use `bind(fn)` ao submeter tarefas.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from functools import wraps
+from core.logger import logger
+
+TRACING_ENABLED = os.getenv("TRACING", "").lower() in ("1", "true", "yes")
+TRACE_DIR = os.getenv("TRACE_DIR", os.path.join("logs", "traces"))
+
+_current_run = contextvars.ContextVar("trace_run", default=None)
+_NOOP = nullcontext()
+
+
+class _Run:
+    def __init__(self, name: str):
+        self.name = name
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.events = []
+        self.threads = {}
+
+    def record(self, name: str, started: float, ended: float, args: dict):
+        thread = threading.current_thread()
+        self.threads.setdefault(thread.ident, thread.name)
+        # list.append é atômico: spans de várias threads sem lock
+        self.events.append({
+            "name": name,
+            "cat": self.name,
+            "ph": "X",
+            "ts": round((started - self.started) * 1e6, 1),
+            "dur": round((ended - started) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args,
+        })
+
+    def write(self, directory: str) -> str:
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(directory, f"{self.name}_{stamp}_{self.run_id}.json")
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for tid, name in self.threads.items()
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "traceEvents": metadata + self.events,
+                "displayTimeUnit": "ms",
+                "otherData": {"run_id": self.run_id, "run": self.name},
+            }, f, ensure_ascii=False)
+        return path
+
+
+def current_run_id() -> str | None:
+    """Run ID da execução em andamento (None fora de uma execução rastreada)"""
+    current = _current_run.get()
+    return current.run_id if current else None
+
+
+@contextmanager
+def _span(current: _Run, name: str, args: dict):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.record(name, started, time.perf_counter(), args)
+
+
+def span(name: str, **args):
+    """Span aninhado na execução atual; não faz nada fora de uma execução"""
+    current = _current_run.get()
+    if current is None:
+        return _NOOP
+    return _span(current, name, args)
+
+
+@contextmanager
+def run(name: str, **args):
+    """
+    Inicia uma execução rastreada e grava o trace ao sair.
+    Dentro de outra execução (ou com TRACING desligado) vira só um span.
+    """
+    if _current_run.get() is not None or not TRACING_ENABLED:
+        with span(name, **args):
+            yield
+        return
+
+    current = _Run(name)
+    token = _current_run.set(current)
+    try:
+        with _span(current, name, {**args, "run_id": current.run_id}):
+            yield
+    finally:
+        _current_run.reset(token)
+        try:
+            path = current.write(TRACE_DIR)
+            logger.info("🧭 Trace %s salvo em %s (%d spans)", current.run_id, path, len(current.events))
+        except OSError as e:
+            logger.error(f"❌ Falha ao gravar trace {current.run_id}: {e}")
+
+
+def traced(name: str = None, root: bool = False):
+    """Decorador: span com o nome da função (`root=True` inicia uma execução)"""
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if root:
+                with run(span_name):
+                    return fn(*args, **kwargs)
+            current = _current_run.get()
+            if current is None:
+                return fn(*args, **kwargs)
+            with _span(current, span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def bind(fn):
+    """
+    Leva a execução atual para outra thread (ThreadPoolExecutor, filas).
+    Uma chamada de `bind` por tarefa: o contexto copiado não pode rodar em
+    duas threads ao mesmo tempo.
+    """
+    if _current_run.get() is None:
+        return fn
+    context = contextvars.copy_context()
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return wrapper
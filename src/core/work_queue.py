@@ -0,0 +1,105 @@
+"""
+Filas de trabalho em segundo plano do servidor de webhooks.
+
+O webhook só valida e enfileira; tudo que faz I/O (busca do cliente no disco,
+envio ao Telegram, relatórios, exportações) roda nas threads das filas:
+  - updates: processamento dos updates do Telegram e eventos do Kommo (rápido)
+  - jobs: relatórios e exportações (lentos), para não ocupar a fila de updates
+
+Cada tarefa roda no contexto (contextvars) de quem a enfileirou, para que
+pedidos de perfil (core.profiling) e traces (core.tracing) sigam o trabalho.
+
+Os tempos de resposta do webhook (ack) ficam numa janela deslizante para
+acompanhar o p99 (ver /health).
+"""
+import contextvars
+import os
+import queue
+import threading
+import time
+from collections import deque
+from core import metrics
+from core.logger import logger
+
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "4"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+WORK_QUEUE_MAX = int(os.getenv("WORK_QUEUE_MAX", "1000"))
+
+
+class WorkQueue:
+    """Fila limitada com um número fixo de threads, iniciadas na primeira tarefa"""
+
+    def __init__(self, name: str, workers: int, maxsize: int = WORK_QUEUE_MAX):
+        self.name = name
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if len(self._threads) >= self.workers:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._run, name=f"{self.name}-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, fn, *args) -> bool:
+        """Enfileira `fn(*args)`; False se a fila estiver cheia"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((contextvars.copy_context(), fn, args))
+        except queue.Full:
+            logger.error(f"🚦 Fila {self.name} cheia ({self._queue.maxsize}); tarefa descartada")
+            return False
+        return True
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def join(self):
+        """Aguarda até a fila esvaziar (uso em testes e no desligamento)"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            context, fn, args = self._queue.get()
+            try:
+                context.run(fn, *args)
+            except Exception as e:
+                logger.error(f"💥 Erro na fila {self.name} ({getattr(fn, '__name__', fn)}): {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+
+updates = WorkQueue("updates", UPDATE_WORKERS)
+jobs = WorkQueue("jobs", JOB_WORKERS)
+
+metrics.register(metrics.Gauge(
+    "work_queue_depth", "Tarefas aguardando nas filas de trabalho", ("queue",),
+    lambda: {(wq.name,): wq.depth() for wq in (updates, jobs)},
+))
+
+
+# ─── Latência do ack ─────────────────────────────────────────────────────────
+
+_ack_ms = deque(maxlen=2048)
+
+
+def record_ack(started: float):
+    """Registra o tempo do ack a partir de `started` (time.perf_counter())"""
+    _ack_ms.append((time.perf_counter() - started) * 1000)
+
+
+def ack_percentiles() -> dict:
+    samples = sorted(_ack_ms)
+    if not samples:
+        return {"count": 0}
+
+    def pct(p):
+        return round(samples[min(len(samples) - 1, int(p / 100 * len(samples)))], 3)
+
+    return {"count": len(samples), "p50_ms": pct(50), "p99_ms": pct(99), "max_ms": round(samples[-1], 3)}
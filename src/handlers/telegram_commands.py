@@ -45,6 +45,13 @@ COMMAND_MAP = {
     "/exportar_perdidos_followup_mes": "export_lost_followup_monthly",
     "/exportar_perdidos_followup_ano": "export_lost_followup_yearly",
     
+    # Exportação delta - só o que mudou desde a última exportação delta do chat
+    "/exportar_delta": "export_all_delta",
+    "/exportar_ganhos_delta": "export_won_delta",
+    "/exportar_perdidos_delta": "export_lost_delta",
+    "/exportar_ativos_delta": "export_active_delta",
+    "/exportar_perdidos_followup_delta": "export_lost_followup_delta",
+    
     "/help": "help",
     "/start": "help",
 }
@@ -107,6 +114,12 @@ def help_message() -> str:
         "  /exportar_perdidos_ano\n"
         "  /exportar_ativos_ano\n"
         "  /exportar_perdidos_followup_ano\n\n"
+        "*Exportação Delta (só o que mudou desde a última):*\n"
+        "  /exportar_delta — Todas as categorias\n"
+        "  /exportar_ganhos_delta\n"
+        "  /exportar_perdidos_delta\n"
+        "  /exportar_ativos_delta\n"
+        "  /exportar_perdidos_followup_delta\n\n"
         "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n"
         "✨ Dúvidas? Use /help\n"
     )
@@ -0,0 +1,75 @@
+"""
+Decodificação de JSON para as respostas do Kommo e do Telegram.
+
+Usa o decodificador mais rápido disponível no ambiente (orjson ou msgspec)
+e cai para o módulo `json` da biblioteca padrão quando nenhum está instalado.
+"""
+import json
+
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    _orjson = None
+
+try:
+    import msgspec as _msgspec
+except ImportError:  # pragma: no cover - depende do ambiente
+    _msgspec = None
+
+
+def _stdlib_loads(data):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    return json.loads(data)
+
+
+def _msgspec_loads(data):
+    try:
+        return _msgspec.json.decode(data)
+    except _msgspec.DecodeError as e:
+        # Mantém o contrato do json.loads (ValueError em JSON inválido)
+        raise ValueError(str(e)) from e
+
+
+if _orjson is not None:
+    BACKEND = "orjson"
+    _loads = _orjson.loads
+elif _msgspec is not None:
+    BACKEND = "msgspec"
+    _loads = _msgspec_loads
+else:
+    BACKEND = "json"
+    _loads = _stdlib_loads
+
+
+def loads(data):
+    """
+    Decodifica um payload JSON (bytes ou str) com o backend ativo.
+    Levanta ValueError em caso de JSON inválido, como o `json.loads`.
+    """
+    return _loads(data)
+
+
+def decode_response(response):
+    """
+    Decodifica o corpo de uma `requests.Response` sem passar pelo `response.json()`.
+    Lê os bytes crus (`response.content`) e entrega ao backend ativo.
+    """
+    return loads(response.content)
+
+
+def set_backend(name: str):
+    """
+    Força um backend específico ('orjson', 'msgspec' ou 'json').
+    Útil para benchmarks e para isolar problemas de decodificação.
+    """
+    global BACKEND, _loads
+    if name == "orjson" and _orjson is not None:
+        _loads = _orjson.loads
+    elif name == "msgspec" and _msgspec is not None:
+        _loads = _msgspec_loads
+    elif name == "json":
+        _loads = _stdlib_loads
+    else:
+        raise ValueError(f"Backend JSON indisponível: {name}")
+    BACKEND = name
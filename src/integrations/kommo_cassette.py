@@ -0,0 +1,174 @@
+"""
+Cassete de gravação/reprodução das respostas HTTP do Kommo.
+
+Em modo `record`, cada GET feito pelo KommoClient (inclusive cada página de
+uma varredura) é gravado num arquivo JSON Lines comprimido com gzip: rota
+relativa à base da API, parâmetros, status, cabeçalhos, corpo e duração. Em
+modo `replay`, as mesmas chamadas são respondidas a partir do arquivo, sem
+rede — opcionalmente esperando o tempo original de cada resposta.
+
+Serve para reexecutar `generate_exports` ou o relatório de abril sobre dados
+reais de forma determinística (benchmarks, perfil, reprodução de bugs).
+
+Variáveis de ambiente:
+  KOMMO_CASSETTE=logs/kommo.cassette.jsonl.gz   arquivo do cassete (vazio = desligado)
+  KOMMO_CASSETTE_MODE=record|replay             padrão: replay
+  KOMMO_CASSETTE_TIMING=1                       no replay, respeita a duração gravada
+"""
+
+import atexit
+import base64
+import gzip
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from core.logger import logger
+
+KOMMO_CASSETTE = os.getenv("KOMMO_CASSETTE", "")
+KOMMO_CASSETTE_MODE = os.getenv("KOMMO_CASSETTE_MODE", "replay").lower()
+KOMMO_CASSETTE_TIMING = os.getenv("KOMMO_CASSETTE_TIMING", "").lower() in ("1", "true", "yes")
+
+MODES = ("record", "replay")
+
+
+class CassetteMiss(LookupError):
+    """Requisição sem resposta gravada no cassete (modo replay)"""
+
+
+class CassetteResponse:
+    """Resposta reproduzida com a parte da `requests.Response` que o cliente usa"""
+
+    def __init__(self, status_code: int, content: bytes, headers: dict, url: str = ""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _params_key(params) -> list:
+    # O requests envia tudo como texto; a ordem dos parâmetros não importa
+    return sorted([str(k), str(v)] for k, v in (params or {}).items())
+
+
+def _key(subdomain: str, path: str, params_key: list) -> str:
+    return json.dumps([subdomain, path, params_key], ensure_ascii=False)
+
+
+class Cassette:
+    """
+    Um arquivo de cassete, compartilhado por todos os KommoClient do processo.
+    Chamadas idênticas repetidas são reproduzidas na ordem em que foram
+    gravadas; esgotadas, a última resposta continua sendo servida.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", timing: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"Modo de cassete inválido: {mode!r} (use {' ou '.join(MODES)})")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._file = None
+        self._entries = None
+        self._served = defaultdict(int)
+        self.recorded = 0
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def record(self, subdomain: str, path: str, params, response, elapsed: float):
+        entry = {
+            "subdomain": subdomain,
+            "path": path,
+            "params": _params_key(params),
+            "status": response.status_code,
+            "headers": dict(response.headers),
+            "elapsed": round(elapsed, 6),
+        }
+        try:
+            entry["body"] = response.content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["body_b64"] = base64.b64encode(response.content).decode("ascii")
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = gzip.open(self.path, "wt", encoding="utf-8")
+                atexit.register(self.close)
+                logger.info("📼 Gravando respostas do Kommo em %s", self.path)
+            self._file.write(line)
+            self.recorded += 1
+
+    def _load(self) -> dict:
+        entries = defaultdict(list)
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[_key(entry["subdomain"], entry["path"], entry["params"])].append(entry)
+        logger.info("📼 Reproduzindo %d respostas do Kommo de %s", sum(map(len, entries.values())), self.path)
+        return entries
+
+    def replay(self, subdomain: str, path: str, params, url: str = "") -> CassetteResponse:
+        key = _key(subdomain, path, _params_key(params))
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            recorded = self._entries.get(key)
+            if not recorded:
+                raise CassetteMiss(f"Sem resposta gravada para {subdomain}{path} {_params_key(params)}")
+            entry = recorded[min(self._served[key], len(recorded) - 1)]
+            self._served[key] += 1
+
+        if self.timing and entry.get("elapsed"):
+            time.sleep(entry["elapsed"])
+        if "body_b64" in entry:
+            content = base64.b64decode(entry["body_b64"])
+        else:
+            content = entry.get("body", "").encode("utf-8")
+        return CassetteResponse(entry["status"], content, entry.get("headers") or {}, url)
+
+    def close(self):
+        """Fecha o arquivo em gravação (sem isso o final do gzip se perde)"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                logger.info("📼 Cassete salvo: %d respostas em %s", self.recorded, self.path)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def recording_from_env() -> bool:
+    """KOMMO_CASSETTE em modo record: o arquivo só pode ter um processo gravando"""
+    return bool(KOMMO_CASSETTE) and KOMMO_CASSETTE_MODE == "record"
+
+
+def from_env():
+    """Cassete configurado por KOMMO_CASSETTE (um por arquivo no processo), ou None"""
+    if not KOMMO_CASSETTE:
+        return None
+    with _shared_lock:
+        cassette = _shared.get(KOMMO_CASSETTE)
+        if cassette is None:
+            cassette = Cassette(KOMMO_CASSETTE, KOMMO_CASSETTE_MODE, KOMMO_CASSETTE_TIMING)
+            _shared[KOMMO_CASSETTE] = cassette
+        return cassette
@@ -1,27 +1,151 @@
-import requests
 import os
+import threading
+import time
 from datetime import datetime
+from core import metadata_cache, metrics, tracing
+from core.logger import logger
+from integrations import kommo_cassette
+from integrations.json_codec import decode_response
+from integrations.kommo_schema import decode_leads_page, decode_contacts_page, decode_contact
+
+# Limite de requisições por segundo por conta (0 = sem limite)
+KOMMO_MAX_RPS = float(os.getenv("KOMMO_MAX_RPS", "0"))
+# Base da API com {subdomain}, para apontar para outro servidor (ex.: benchmarks/fake_kommo.py)
+KOMMO_BASE_URL = os.getenv("KOMMO_BASE_URL", "https://{subdomain}.kommo.com/api/v4")
+
+
+class KommoRequestError(RuntimeError):
+    """Página de uma varredura que a API não entregou (429, 5xx...): resultado incompleto"""
+
+    def __init__(self, endpoint: str, status_code: int):
+        super().__init__(f"Kommo respondeu {status_code} em {endpoint}")
+        self.endpoint = endpoint
+        self.status_code = status_code
+
 
 class KommoClient:
-    def __init__(self, subdomain, api_token):
-        self.base_url = f"https://{subdomain}.kommo.com/api/v4"
+    def __init__(self, subdomain, api_token, lead_field_ids=None, lead_index=None, max_rps=None, base_url=None,
+                 cassette=None, metadata_ttl_min=None):
+        self.subdomain = subdomain
+        self.base_url = (base_url or KOMMO_BASE_URL).format(subdomain=subdomain).rstrip("/")
         self.headers = {
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json"
         }
-    
+        # Campos customizados de lead mantidos na decodificação (None = todos)
+        self.lead_field_ids = set(lead_field_ids) if lead_field_ids is not None else None
+        # Índice local alimentado por webhooks (core.lead_index); None = sempre a API
+        self.lead_index = lead_index
+        max_rps = KOMMO_MAX_RPS if max_rps is None else max_rps
+        self._min_interval = 1.0 / max_rps if max_rps else 0.0
+        self._next_request_at = 0.0
+        self._rate_lock = threading.Lock()
+        self.request_count = 0
+        # Gravação/reprodução das respostas (integrations.kommo_cassette); None = rede direto
+        self.cassette = cassette if cassette is not None else kommo_cassette.from_env()
+        # Validade do cache de /account, pipelines e campos (core.metadata_cache); 0 = sempre a API
+        self.metadata_ttl_min = metadata_cache.METADATA_CACHE_TTL_MIN if metadata_ttl_min is None else metadata_ttl_min
+
+    def _throttle(self):
+        """Espaça as requisições desta conta para respeitar max_rps"""
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + self._min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def _get(self, endpoint, params=None, headers=None):
+        """Executa o GET cru na API (ponto único de saída HTTP do cliente)"""
+        if self._min_interval:
+            self._throttle()
+        self.request_count += 1
+        label = metrics.endpoint_label(endpoint, self.base_url)
+        path = endpoint[len(self.base_url):] if endpoint.startswith(self.base_url) else endpoint
+        status = "error"
+        started = time.perf_counter()
+        try:
+            if self.cassette is not None and self.cassette.replaying:
+                response = self.cassette.replay(self.subdomain, path, params, endpoint)
+            else:
+                import requests  # sob demanda: não pesa no início do webhook
+                response = requests.get(endpoint, headers={**self.headers, **headers} if headers else self.headers,
+                                        params=params)
+                if self.cassette is not None:
+                    self.cassette.record(self.subdomain, path, params, response, time.perf_counter() - started)
+            status = str(response.status_code)
+            return response
+        finally:
+            metrics.KOMMO_REQUESTS.inc(endpoint=label, status=status)
+            metrics.KOMMO_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=label, status=status)
+
+    def _get_metadata(self, endpoint):
+        """
+        GET de metadados quase estáticos (conta, pipelines, campos customizados).
+        Dentro do TTL a resposta sai do cache em disco, sem HTTP; vencida, é
+        revalidada com ETag/Last-Modified quando a API os mandou (304 renova).
+        Com cassete (gravação ou reprodução) o cache fica de fora: toda chamada
+        passa pelo `_get`, para ser gravada e reproduzida igual.
+        """
+        if not self.metadata_ttl_min or self.cassette is not None:
+            return self._get(endpoint)
+        label = metrics.endpoint_label(endpoint, self.base_url)
+        scope = self.headers["Authorization"]
+        entry = metadata_cache.get(self.subdomain, endpoint, scope)
+        if entry is not None and metadata_cache.fresh(entry, self.metadata_ttl_min):
+            metrics.KOMMO_METADATA_CACHE.inc(endpoint=label, result="hit")
+            return self._cached_response(entry, endpoint)
+
+        conditional = metadata_cache.validators(entry) if entry is not None else None
+        response = self._get(endpoint, headers=conditional or None)
+        if response.status_code == 304:
+            if entry is not None:
+                metrics.KOMMO_METADATA_CACHE.inc(endpoint=label, result="revalidated")
+                return self._cached_response(metadata_cache.touch(self.subdomain, endpoint, entry, scope), endpoint)
+            # 304 sem entrada para renovar (ex.: cache apagado no meio): busca sem condição
+            response = self._get(endpoint)
+        metrics.KOMMO_METADATA_CACHE.inc(endpoint=label, result="miss")
+        if response.status_code == 200:
+            metadata_cache.put(self.subdomain, endpoint, response.headers, response.content.decode("utf-8"), scope)
+        return response
+
+    @staticmethod
+    def _cached_response(entry, endpoint):
+        return kommo_cassette.CassetteResponse(200, entry["body"].encode("utf-8"), entry["headers"], endpoint)
+
+    def _decode(self, response):
+        """Decodifica o corpo JSON com o decodificador mais rápido disponível"""
+        return decode_response(response)
+
+    def _decode_leads(self, response):
+        """Decodifica uma página de leads direto no esquema enxuto (ver kommo_schema)"""
+        return decode_leads_page(response.content, self.lead_field_ids)
+
+    def _leads_from_index(self, endpoint, params):
+        """Leads do índice local, ou None se não houver índice/filtro suportado"""
+        if self.lead_index is None or endpoint != f"{self.base_url}/leads":
+            return None
+        return self.lead_index.query(params or {})
+
     def _request_get(self, endpoint, params):
         """Método auxiliar para fazer requisições GET"""
-        response = requests.get(endpoint, headers=self.headers, params=params)
+        response = self._get(endpoint, params)
         if response.status_code == 200:
-            return response.json()
+            return self._decode(response)
         return {}
     
+    @tracing.traced()
     def _request_get_all_pages(self, endpoint, params):
         """
         Faz requisições GET com paginação automática.
-        Retorna todos os resultados de todas as páginas.
+        Retorna todos os resultados de todas as páginas; uma página que falha
+        (status diferente de 200/204) levanta KommoRequestError em vez de
+        devolver um resultado parcial como se fosse completo.
         """
+        indexed = self._leads_from_index(endpoint, params)
+        if indexed is not None:
+            return {'_embedded': {'leads': indexed}}
+        
         all_leads = []
         page = 1
         
@@ -30,17 +154,20 @@ class KommoClient:
             current_params = params.copy()
             current_params['page'] = page
             
-            response = requests.get(endpoint, headers=self.headers, params=current_params)
-            if response.status_code != 200:
+            response = self._get(endpoint, current_params)
+            if response.status_code == 204:
                 break
+            if response.status_code != 200:
+                raise KommoRequestError(endpoint, response.status_code)
             
-            data = response.json()
+            data = self._decode_leads(response)
             leads = data.get('_embedded', {}).get('leads', [])
             
             if not leads:
                 break
             
             all_leads.extend(leads)
+            logger.debug("📄 Página %d de %s: %d leads", page, endpoint, len(leads))
             
             # Verifica se há próxima página
             links = data.get('_links', {})
@@ -49,6 +176,7 @@ class KommoClient:
             
             page += 1
         
+        metrics.KOMMO_SCAN_PAGES.observe(page, endpoint=metrics.endpoint_label(endpoint, self.base_url))
         return {'_embedded': {'leads': all_leads}}
     
     def get_leads(self, start_ts: int = None, end_ts: int = None, pipeline_id: int = None):
@@ -66,9 +194,13 @@ class KommoClient:
         if pipeline_id is not None:
             params["filter[pipeline_id][0]"] = pipeline_id
         
-        response = requests.get(endpoint, headers=self.headers, params=params)
+        indexed = self._leads_from_index(endpoint, params)
+        if indexed is not None:
+            return indexed
+        
+        response = self._get(endpoint, params)
         if response.status_code == 200:
-            return response.json().get('_embedded', {}).get('leads', [])
+            return self._decode_leads(response).get('_embedded', {}).get('leads', [])
         return []
     
     def get_unsorted_leads(self, filter_date_from: int, filter_date_to: int):
@@ -81,10 +213,10 @@ class KommoClient:
             "filter[created_at][to]": filter_date_to
         }
         
-        response = requests.get(endpoint, headers=self.headers, params=params)
+        response = self._get(endpoint, params)
         if response.status_code == 200:
             # O retorno do unsorted é um pouco diferente do leads comum
-            return response.json().get('_embedded', {}).get('unsorted', [])
+            return self._decode(response).get('_embedded', {}).get('unsorted', [])
         return []
 
     def get_won_leads(self, filter_date_from: int, filter_date_to: int, pipeline_id: int):
@@ -99,9 +231,13 @@ class KommoClient:
             "filter[closed_at][to]": filter_date_to
         }
         
-        response = requests.get(endpoint, headers=self.headers, params=params)
+        indexed = self._leads_from_index(endpoint, params)
+        if indexed is not None:
+            return indexed
+        
+        response = self._get(endpoint, params)
         if response.status_code == 200:
-            return response.json().get('_embedded', {}).get('leads', [])
+            return self._decode_leads(response).get('_embedded', {}).get('leads', [])
         return []
 
     def get_lost_leads(self, filter_date_from: int, filter_date_to: int, pipeline_id: int):
@@ -117,9 +253,13 @@ class KommoClient:
             "filter[closed_at][to]": filter_date_to
         }
 
-        response = requests.get(endpoint, headers=self.headers, params=params)
+        indexed = self._leads_from_index(endpoint, params)
+        if indexed is not None:
+            return indexed
+        
+        response = self._get(endpoint, params)
         if response.status_code == 200:
-            return response.json().get('_embedded', {}).get('leads', [])
+            return self._decode_leads(response).get('_embedded', {}).get('leads', [])
         return []
     
     def get_lead_custom_fields(self):
@@ -127,17 +267,26 @@ class KommoClient:
         Identifica o ID do campo 'Origem'
         """
         endpoint = f"{self.base_url}/leads/custom_fields"
-        response = requests.get(endpoint, headers=self.headers)
-        return response.json()
+        response = self._get_metadata(endpoint)
+        return self._decode(response)
+    
+    def get_pipelines(self):
+        """
+        Lista as pipelines da conta com seus status.
+        """
+        response = self._get_metadata(f"{self.base_url}/leads/pipelines")
+        if response.status_code == 200:
+            return self._decode(response).get('_embedded', {}).get('pipelines', [])
+        return []
     
     def get_contact(self, contact_id: int):
         """
         Busca dados de um contato específico pelo ID.
         """
         endpoint = f"{self.base_url}/contacts/{contact_id}"
-        response = requests.get(endpoint, headers=self.headers)
+        response = self._get(endpoint)
         if response.status_code == 200:
-            return response.json()
+            return decode_contact(response.content)
         return None
     
     def get_contacts_batch(self, contact_ids: list):
@@ -147,16 +296,54 @@ class KommoClient:
         if not contact_ids:
             return []
         
+        cached = []
+        if self.lead_index is not None:
+            # Contatos já conhecidos pelo índice não vão à API
+            cached = self.lead_index.get_contacts(contact_ids)
+            known = {c['id'] for c in cached}
+            contact_ids = [cid for cid in contact_ids if cid not in known]
+            if not contact_ids:
+                return cached
+        
         endpoint = f"{self.base_url}/contacts"
         # API Kommo aceita até 250 IDs por vez usando filter[id]
         params = {}
         for i, contact_id in enumerate(contact_ids[:250]):  # Limite de 250
             params[f"filter[id][{i}]"] = contact_id
+        metrics.KOMMO_CONTACT_BATCH_SIZE.observe(len(params))
         
-        response = requests.get(endpoint, headers=self.headers, params=params)
+        response = self._get(endpoint, params)
         if response.status_code == 200:
-            return response.json().get('_embedded', {}).get('contacts', [])
-        return []
+            return cached + decode_contacts_page(response.content).get('_embedded', {}).get('contacts', [])
+        return cached
+    
+    def _listing_version(self, endpoint, params, key):
+        """updated_at mais recente de uma listagem (1 item, ordenado desc). None se falhar."""
+        params = {**params, "limit": 1, "order[updated_at]": "desc"}
+        response = self._get(endpoint, params)
+        if response.status_code == 204:
+            return "0"
+        if response.status_code != 200:
+            return None
+        data = self._decode(response)
+        items = data.get('_embedded', {}).get(key, [])
+        return str(items[0].get('updated_at') or 0 if items else 0)
+    
+    def get_data_version(self, pipeline_ids: list):
+        """
+        Versão dos dados de exportação: último updated_at dos leads das pipelines
+        e dos contatos. Muda quando algo é criado ou alterado no Kommo; leads
+        apagados ou movidos para fora das pipelines não mudam a versão (a
+        listagem não informa total), então quem usa a versão precisa de um prazo
+        máximo (ver core.export_cache).
+        Retorna None se não for possível consultar (cache deve ser ignorado).
+        """
+        lead_params = {f"filter[pipeline_id][{i}]": pid for i, pid in enumerate(pipeline_ids)}
+        leads_version = self._listing_version(f"{self.base_url}/leads", lead_params, "leads")
+        contacts_version = self._listing_version(f"{self.base_url}/contacts", {}, "contacts")
+        if leads_version is None or contacts_version is None:
+            return None
+        return f"{leads_version}:{contacts_version}"
     
     def health_check(self):
         """
@@ -164,9 +351,9 @@ class KommoClient:
         """
         endpoint = f"{self.base_url}/account"
         try:
-            response = requests.get(endpoint, headers=self.headers)
+            response = self._get_metadata(endpoint)
             if response.status_code == 200:
-                data = response.json()
+                data = self._decode(response)
                 return True, f"Conectado à conta: {data.get('name')}"
             return False, f"Erro na conexão: Status {response.status_code}"
         except Exception as e:
@@ -0,0 +1,255 @@
+"""
+Esquemas tipados das respostas de leads e contatos do Kommo.
+
+Declaram apenas os campos que o projeto usa (id, status, pipeline, datas,
+nome, campos customizados e IDs dos contatos vinculados). Todo o resto
+(`_links`, tags, empresas, campos sem uso) é descartado na decodificação.
+
+Com `msgspec` (em requirements.txt), o JSON é decodificado direto nos structs
+e os campos não declarados nem chegam a ser alocados. Sem ele, o payload é
+decodificado pelo `json_codec` e enxugado em Python, com a mesma validação;
+esse caminho só existe para ambientes sem o pacote e é mais lento e pesado
+que decodificar sem enxugar, então não deve ser o caminho de produção.
+"""
+from integrations.json_codec import loads
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - depende do ambiente
+    msgspec = None
+
+
+# Contatos: só interessam os campos de telefone e email
+CONTACT_FIELD_CODES = {"PHONE", "EMAIL"}
+
+
+class SchemaError(ValueError):
+    """Payload do Kommo fora do formato esperado."""
+
+
+def lead_field_ids_from_config(config: dict) -> set:
+    """Campos customizados de lead usados pelos relatórios (origens)."""
+    kommo = config.get("kommo", {})
+    keys = ("origin_field_id", "origin_bot_field_id", "secretary_origin_field_id")
+    return {kommo[k] for k in keys if kommo.get(k)}
+
+
+# ─── Validação/enxugamento em Python (fallback) ──────────────────────────────
+
+def _check_int(obj: dict, key: str, required: bool = False):
+    value = obj.get(key)
+    if value is None:
+        if required:
+            raise SchemaError(f"Campo obrigatório ausente: {key}")
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise SchemaError(f"Campo {key} deveria ser inteiro: {value!r}")
+    return value
+
+
+def _value_dict(value) -> dict:
+    # Valores nulos são omitidos, como se a chave não existisse no payload
+    return {"value": value} if value is not None else {}
+
+
+def _slim_custom_fields(fields, field_ids=None, field_codes=None) -> list | None:
+    if fields is None:
+        return None
+    if not isinstance(fields, list):
+        raise SchemaError("custom_fields_values deveria ser uma lista")
+
+    slim = []
+    for field in fields:
+        if not isinstance(field, dict):
+            raise SchemaError("Campo customizado deveria ser um objeto")
+        field_id = _check_int(field, "field_id")
+        field_code = field.get("field_code")
+        if field_ids is not None and field_id not in field_ids:
+            continue
+        if field_codes is not None and field_code not in field_codes:
+            continue
+        values = field.get("values") or []
+        if not isinstance(values, list):
+            raise SchemaError(f"values do campo {field_id} deveria ser uma lista")
+        slim.append({
+            "field_id": field_id,
+            "field_code": field_code,
+            "values": [_value_dict(v.get("value")) for v in values if isinstance(v, dict)],
+        })
+    return slim
+
+
+def _slim_embedded_contacts(embedded) -> dict:
+    if not embedded:
+        return {"contacts": []}
+    contacts = embedded.get("contacts") or []
+    return {"contacts": [{"id": _check_int(c, "id", required=True)} for c in contacts]}
+
+
+def slim_lead(raw: dict, field_ids=None) -> dict:
+    """Valida e reduz um lead aos campos usados pelo projeto."""
+    if not isinstance(raw, dict):
+        raise SchemaError("Lead deveria ser um objeto")
+    lead = {"id": _check_int(raw, "id", required=True), "name": raw.get("name") or ""}
+    for key in ("status_id", "pipeline_id", "created_at", "updated_at", "closed_at"):
+        lead[key] = _check_int(raw, key)
+    lead["custom_fields_values"] = _slim_custom_fields(raw.get("custom_fields_values"), field_ids=field_ids)
+    lead["_embedded"] = _slim_embedded_contacts(raw.get("_embedded"))
+    return lead
+
+
+def slim_contact(raw: dict) -> dict:
+    """Valida e reduz um contato a id, nome, telefone e email."""
+    if not isinstance(raw, dict):
+        raise SchemaError("Contato deveria ser um objeto")
+    return {
+        "id": _check_int(raw, "id", required=True),
+        "name": raw.get("name") or "",
+        "custom_fields_values": _slim_custom_fields(
+            raw.get("custom_fields_values"), field_codes=CONTACT_FIELD_CODES
+        ),
+    }
+
+
+def _py_decode_page(data, key: str, slim) -> dict:
+    payload = loads(data)
+    if not isinstance(payload, dict):
+        raise SchemaError("Página deveria ser um objeto")
+    items = (payload.get("_embedded") or {}).get(key) or []
+    links = payload.get("_links") or {}
+    page = {"_embedded": {key: [slim(item) for item in items]}}
+    if "next" in links:
+        page["_links"] = {"next": links["next"]}
+    return page
+
+
+# ─── Structs msgspec (decodificação direta) ──────────────────────────────────
+
+if msgspec is not None:
+    Scalar = str | int | float | bool | None
+
+    class FieldValue(msgspec.Struct):
+        value: Scalar = None
+
+    class CustomField(msgspec.Struct):
+        field_id: int | None = None
+        field_code: str | None = None
+        values: list[FieldValue] | None = None
+
+    class ContactRef(msgspec.Struct):
+        id: int
+
+    class LeadEmbedded(msgspec.Struct):
+        contacts: list[ContactRef] = []
+
+    class Lead(msgspec.Struct):
+        id: int
+        name: str | None = ""
+        status_id: int | None = None
+        pipeline_id: int | None = None
+        created_at: int | None = None
+        updated_at: int | None = None
+        closed_at: int | None = None
+        custom_fields_values: list[CustomField] | None = None
+        embedded: LeadEmbedded = msgspec.field(default_factory=LeadEmbedded, name="_embedded")
+
+    class Contact(msgspec.Struct):
+        id: int
+        name: str | None = ""
+        custom_fields_values: list[CustomField] | None = None
+
+    class PageLinks(msgspec.Struct):
+        next: dict | None = None
+
+    class LeadsEmbedded(msgspec.Struct):
+        leads: list[Lead] = []
+
+    class ContactsEmbedded(msgspec.Struct):
+        contacts: list[Contact] = []
+
+    class LeadsPage(msgspec.Struct):
+        embedded: LeadsEmbedded = msgspec.field(default_factory=LeadsEmbedded, name="_embedded")
+        links: PageLinks = msgspec.field(default_factory=PageLinks, name="_links")
+
+    class ContactsPage(msgspec.Struct):
+        embedded: ContactsEmbedded = msgspec.field(default_factory=ContactsEmbedded, name="_embedded")
+
+    _leads_decoder = msgspec.json.Decoder(LeadsPage)
+    _contacts_decoder = msgspec.json.Decoder(ContactsPage)
+    _contact_decoder = msgspec.json.Decoder(Contact)
+
+    def _custom_fields_to_dicts(fields, field_ids=None, field_codes=None):
+        if fields is None:
+            return None
+        return [
+            {
+                "field_id": f.field_id,
+                "field_code": f.field_code,
+                "values": [_value_dict(v.value) for v in (f.values or [])],
+            }
+            for f in fields
+            if (field_ids is None or f.field_id in field_ids)
+            and (field_codes is None or f.field_code in field_codes)
+        ]
+
+    def _lead_to_dict(lead, field_ids=None) -> dict:
+        return {
+            "id": lead.id,
+            "name": lead.name or "",
+            "status_id": lead.status_id,
+            "pipeline_id": lead.pipeline_id,
+            "created_at": lead.created_at,
+            "updated_at": lead.updated_at,
+            "closed_at": lead.closed_at,
+            "custom_fields_values": _custom_fields_to_dicts(lead.custom_fields_values, field_ids=field_ids),
+            "_embedded": {"contacts": [{"id": c.id} for c in lead.embedded.contacts]},
+        }
+
+    def _contact_to_dict(contact) -> dict:
+        return {
+            "id": contact.id,
+            "name": contact.name or "",
+            "custom_fields_values": _custom_fields_to_dicts(
+                contact.custom_fields_values, field_codes=CONTACT_FIELD_CODES
+            ),
+        }
+
+
+# ─── API pública ─────────────────────────────────────────────────────────────
+
+def decode_leads_page(data, field_ids=None) -> dict:
+    """
+    Decodifica uma página de /leads.
+    Retorna {'_embedded': {'leads': [...]}} e, se houver próxima página, '_links.next'.
+    """
+    if msgspec is None:
+        return _py_decode_page(data, "leads", lambda raw: slim_lead(raw, field_ids=field_ids))
+    try:
+        page = _leads_decoder.decode(data)
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        raise SchemaError(str(e)) from e
+    result = {"_embedded": {"leads": [_lead_to_dict(l, field_ids) for l in page.embedded.leads]}}
+    if page.links.next is not None:
+        result["_links"] = {"next": page.links.next}
+    return result
+
+
+def decode_contacts_page(data) -> dict:
+    """Decodifica uma página de /contacts no formato {'_embedded': {'contacts': [...]}}."""
+    if msgspec is None:
+        return _py_decode_page(data, "contacts", slim_contact)
+    try:
+        page = _contacts_decoder.decode(data)
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        raise SchemaError(str(e)) from e
+    return {"_embedded": {"contacts": [_contact_to_dict(c) for c in page.embedded.contacts]}}
+
+
+def decode_contact(data) -> dict:
+    """Decodifica a resposta de /contacts/{id}."""
+    if msgspec is None:
+        return slim_contact(loads(data))
+    try:
+        return _contact_to_dict(_contact_decoder.decode(data))
+    except (msgspec.ValidationError, msgspec.DecodeError) as e:
+        raise SchemaError(str(e)) from e
@@ -0,0 +1,175 @@
+"""
+Leitura dos webhooks do Kommo.
+
+O Kommo envia os eventos como `application/x-www-form-urlencoded`, com chaves
+no formato `leads[status][0][id]=123` e `account[subdomain]=minhaconta`.
+Este módulo transforma o corpo em eventos já validados e no mesmo formato
+enxuto de lead/contato usado pelo resto do projeto (ver kommo_schema).
+"""
+import re
+from urllib.parse import parse_qsl
+
+from integrations.kommo_schema import CONTACT_FIELD_CODES, SchemaError, _value_dict
+
+# Ações de lead/contato aceitas (o Kommo também envia "note", "responsible" etc.)
+LEAD_ACTIONS = ("add", "update", "status", "delete", "restore")
+CONTACT_ACTIONS = ("add", "update", "delete", "restore")
+
+_KEY_PART = re.compile(r"\[([^\]]*)\]")
+
+
+def parse_form(body) -> dict:
+    """Converte o corpo form-encoded com chaves em colchetes em dicts/listas aninhados"""
+    if isinstance(body, (bytes, bytearray)):
+        body = bytes(body).decode("utf-8")
+    root = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        head = key.split("[", 1)[0]
+        parts = [head] + _KEY_PART.findall(key[len(head):])
+        node = root
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                raise SchemaError(f"Chave em conflito no webhook: {key}")
+        node[parts[-1]] = value
+    return _listify(root)
+
+
+def _listify(node):
+    # Dicts com chaves 0..n viram listas, na ordem dos índices
+    if not isinstance(node, dict):
+        return node
+    node = {k: _listify(v) for k, v in node.items()}
+    if node and all(k.isdigit() for k in node):
+        return [node[k] for k in sorted(node, key=int)]
+    return node
+
+
+def _items(section):
+    if isinstance(section, list):
+        return section
+    if isinstance(section, dict):
+        # Índices não sequenciais (ex.: linked_leads_id[123]) chegam como dict
+        return list(section.values())
+    return []
+
+
+def _int(raw: dict, key: str, required: bool = False):
+    value = raw.get(key)
+    if value in (None, ""):
+        if required:
+            raise SchemaError(f"Campo obrigatório ausente no webhook: {key}")
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise SchemaError(f"Campo {key} deveria ser inteiro: {value!r}") from None
+
+
+def _first_int(raw: dict, *keys):
+    for key in keys:
+        value = _int(raw, key)
+        if value is not None:
+            return value
+    return None
+
+
+def _custom_fields(raw: dict, field_ids=None, field_codes=None):
+    fields = raw.get("custom_fields")
+    if fields is None:
+        return None
+    slim = []
+    for field in _items(fields):
+        if not isinstance(field, dict):
+            raise SchemaError("Campo customizado deveria ser um objeto")
+        field_id = _int(field, "id")
+        field_code = field.get("code") or None
+        if field_ids is not None and field_id not in field_ids:
+            continue
+        if field_codes is not None and field_code not in field_codes:
+            continue
+        values = [
+            _value_dict(v.get("value") if isinstance(v, dict) else v)
+            for v in _items(field.get("values"))
+        ]
+        slim.append({"field_id": field_id, "field_code": field_code, "values": values})
+    return slim
+
+
+def lead_from_webhook(raw: dict, field_ids=None, won_lost_statuses=(142, 143)) -> dict:
+    """Lead do webhook no formato enxuto de kommo_schema.slim_lead"""
+    if not isinstance(raw, dict):
+        raise SchemaError("Lead do webhook deveria ser um objeto")
+    lead = {
+        "id": _int(raw, "id", required=True),
+        "name": raw.get("name") or "",
+        "status_id": _int(raw, "status_id"),
+        "pipeline_id": _int(raw, "pipeline_id"),
+        "created_at": _first_int(raw, "created_at", "date_create"),
+        "updated_at": _first_int(raw, "updated_at", "last_modified"),
+        "closed_at": _first_int(raw, "closed_at", "date_close"),
+        "custom_fields_values": _custom_fields(raw, field_ids=field_ids),
+    }
+    # Mudança para ganho/perdido sem data de fechamento: fechou agora
+    if lead["closed_at"] is None and lead["status_id"] in won_lost_statuses:
+        lead["closed_at"] = lead["updated_at"]
+    return lead
+
+
+def contact_from_webhook(raw: dict) -> dict:
+    """Contato do webhook no formato enxuto de kommo_schema.slim_contact"""
+    if not isinstance(raw, dict):
+        raise SchemaError("Contato do webhook deveria ser um objeto")
+    # linked_leads_id[<lead_id>][ID]=<lead_id>
+    lead_ids = [
+        _first_int(item, "ID", "id") for item in _items(raw.get("linked_leads_id"))
+        if isinstance(item, dict)
+    ]
+    return {
+        "id": _int(raw, "id", required=True),
+        "name": raw.get("name") or "",
+        "custom_fields_values": _custom_fields(raw, field_codes=CONTACT_FIELD_CODES),
+        "lead_ids": [lead_id for lead_id in lead_ids if lead_id is not None],
+    }
+
+
+def parse_events(body, field_ids=None) -> tuple:
+    """
+    Lê o corpo do webhook (bytes/str ou já passado por parse_form) e devolve
+    (subdomínio, eventos). Cada evento é {"entity": "lead"|"contact", "action": ..., "data": dict}.
+    Itens que não são objetos são ignorados; levanta SchemaError se o payload
+    estiver fora do formato.
+    """
+    payload = body if isinstance(body, dict) else parse_form(body)
+    account = payload.get("account")
+    subdomain = account.get("subdomain") if isinstance(account, dict) else None
+    if not subdomain:
+        raise SchemaError("Webhook sem account[subdomain]")
+
+    events = []
+    leads = payload.get("leads") or {}
+    if not isinstance(leads, dict):
+        raise SchemaError("leads deveria ser um objeto")
+    for action in LEAD_ACTIONS:
+        for raw in _items(leads.get(action)):
+            if not isinstance(raw, dict):
+                continue
+            if action == "delete":
+                data = {"id": _int(raw, "id", required=True)}
+            else:
+                data = lead_from_webhook(raw, field_ids=field_ids)
+            events.append({"entity": "lead", "action": action, "data": data})
+
+    contacts = payload.get("contacts") or {}
+    if not isinstance(contacts, dict):
+        raise SchemaError("contacts deveria ser um objeto")
+    for action in CONTACT_ACTIONS:
+        for raw in _items(contacts.get(action)):
+            if not isinstance(raw, dict):
+                continue
+            if action == "delete":
+                data = {"id": _int(raw, "id", required=True)}
+            else:
+                data = contact_from_webhook(raw)
+            events.append({"entity": "contact", "action": action, "data": data})
+    return subdomain, events
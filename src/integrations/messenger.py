@@ -1,10 +1,21 @@
-import requests
+import os
+from core import metrics, tracing
 from core.logger import logger
+from integrations.json_codec import decode_response
+
+# Base da Bot API, para apontar para outro servidor (ex.: benchmarks/fake_telegram.py)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+
+def _http():
+    """`requests` sob demanda: o import custa dezenas de ms no início do webhook"""
+    import requests
+    return requests
 
 
 class TelegramMessenger:
     def __init__(self, bot_token):
-        self.base_url = f"https://api.telegram.org/bot{bot_token}"
+        self.base_url = f"{TELEGRAM_API_URL.rstrip('/')}/bot{bot_token}"
 
     def send_message(self, chat_id, text, reply_markup: dict | None = None):
         try:
@@ -16,21 +27,23 @@ class TelegramMessenger:
             }
             if reply_markup:
                 payload["reply_markup"] = reply_markup
-            logger.info(f"📤 [MESSENGER] Enviando mensagem para chat {chat_id}")
-            response = requests.post(endpoint, json=payload, timeout=10)
-            result = response.json()
+            logger.info("📤 [MESSENGER] Enviando mensagem para chat %s", chat_id)
+            with metrics.TELEGRAM_SEND_SECONDS.time(method="sendMessage"):
+                response = _http().post(endpoint, json=payload, timeout=10)
+            result = decode_response(response)
             
             if result.get("ok"):
-                logger.info(f"✅ [MESSENGER] Mensagem enviada com sucesso para chat {chat_id}")
+                logger.info("✅ [MESSENGER] Mensagem enviada com sucesso para chat %s", chat_id)
             else:
-                logger.error(f"❌ [MESSENGER] Falha ao enviar mensagem para chat {chat_id}: {result}")
+                logger.error("❌ [MESSENGER] Falha ao enviar mensagem para chat %s: %s", chat_id, result)
             
             return result
             
         except Exception as e:
-            logger.error(f"❌ [MESSENGER] Exceção ao enviar mensagem para chat {chat_id}: {e}", exc_info=True)
+            logger.error("❌ [MESSENGER] Exceção ao enviar mensagem para chat %s: %s", chat_id, e, exc_info=True)
             return {"ok": False, "error": str(e)}
     
+    @tracing.traced()
     def send_document(self, chat_id, file_path, caption=None):
         """Envia um arquivo (documento) para o chat"""
         try:
@@ -43,29 +56,30 @@ class TelegramMessenger:
                 if caption:
                     data['caption'] = caption
                 
-                logger.info(f"📤 [MESSENGER] Enviando documento para chat {chat_id}: {file_path}")
-                response = requests.post(endpoint, data=data, files=files, timeout=30)
-                result = response.json()
+                logger.info("📤 [MESSENGER] Enviando documento para chat %s: %s", chat_id, file_path)
+                with metrics.TELEGRAM_SEND_SECONDS.time(method="sendDocument"):
+                    response = _http().post(endpoint, data=data, files=files, timeout=30)
+                result = decode_response(response)
                 
                 if result.get("ok"):
-                    logger.info(f"✅ [MESSENGER] Documento enviado com sucesso para chat {chat_id}")
+                    logger.info("✅ [MESSENGER] Documento enviado com sucesso para chat %s", chat_id)
                 else:
-                    logger.error(f"❌ [MESSENGER] Falha ao enviar documento para chat {chat_id}: {result}")
+                    logger.error("❌ [MESSENGER] Falha ao enviar documento para chat %s: %s", chat_id, result)
                 
                 return result
                 
         except Exception as e:
-            logger.error(f"❌ [MESSENGER] Exceção ao enviar documento para chat {chat_id}: {e}", exc_info=True)
+            logger.error("❌ [MESSENGER] Exceção ao enviar documento para chat %s: %s", chat_id, e, exc_info=True)
             return {"ok": False, "error": str(e)}
     
     def health_check(self):
         try:
             endpoint = f"{self.base_url}/getMe"
-            response = requests.get(endpoint, timeout=5)
+            response = _http().get(endpoint, timeout=5)
             is_ok = response.status_code == 200
-            logger.info(f"🏥 [MESSENGER] Health check: {'✅ OK' if is_ok else '❌ FALHOU'}")
+            logger.info("🏥 [MESSENGER] Health check: %s", "✅ OK" if is_ok else "❌ FALHOU")
             return is_ok
         except Exception as e:
-            logger.error(f"❌ [MESSENGER] Exceção no health check: {e}")
+            logger.error("❌ [MESSENGER] Exceção no health check: %s", e)
             return False
     
\ No newline at end of file
@@ -11,160 +11,237 @@ from core.report_formatter import (
 )
 from core.date_helper import DateHelper
 from integrations.kommo_client import KommoClient
+from integrations.kommo_schema import lead_field_ids_from_config
+from core.lead_index import get_ready_index
+from core import profiling, report_cache, rollups, tracing
+from core import scheduler as report_scheduler
 from integrations.messenger import TelegramMessenger
 
 # Carrega variáveis de ambiente (.env)
 load_dotenv()
 
+# Aliases para manter compatibilidade e clareza
+REPORT_ALIASES = {
+    "annual": "last_year",
+    "month": "current_month",
+}
+
+REPORT_LABELS = {
+    "weekly": "Semana Atual (Dom - Hoje)",
+    "last_week": "Semana Passada (Dom - Sáb)",
+    "monthly": "Mês Anterior (Fechado)",
+    "last_month": "Mês Anterior (Fechado)",
+    "current_month": "Mês Atual (Até hoje)",
+    "month_to_date": "Mês Atual (Até hoje)",
+    "yearly": "Ano Atual (Até hoje)",
+    "year_to_date": "Ano Atual (Até hoje)",
+    "last_year": "Ano Anterior (Retrospectiva)",
+    "annual": "Ano Anterior (Retrospectiva)",
+}
+
+
+def build_client_report(client_id: str, config: dict, report_type: str, start_ts: int, end_ts: int,
+                        label_periodo: str) -> str | None:
+    """
+    Busca os dados do cliente no Kommo e monta a mensagem do relatório.
+    Retorna None se a conexão com o Kommo falhar.
+    """
+    client = KommoClient(
+        config['kommo']['subdomain'],
+        config['kommo']['api_token'],
+        lead_field_ids=lead_field_ids_from_config(config),
+        lead_index=get_ready_index(client_id),
+    )
+
+    # Health Check (Opcional, mas recomendado)
+    is_ok, conn_msg = client.health_check()
+    if not is_ok:
+        logger.error(f"🚫 Falha na conexão para {client_id}: {conn_msg}")
+        return None
+
+    # --- COLETA DE DADOS ---
+    p_id = config['kommo']['pipeline_id']
+    origin_field_id = config['kommo']['origin_field_id']
+    bot_field_id = config['kommo'].get('origin_bot_field_id')
+
+    # B. Leads na 'Entrada' (Unsorted/Leads de Entrada)
+    leads_unsorted = client.get_unsorted_leads(start_ts, end_ts)
+
+    # Sem agregados, os dicts por origem/mês são montados das listas pelos formatters
+    won_by_origin = None
+    won_by_month = None
+
+    if rollups.ROLLUPS_ENABLED:
+        # A/C via agregados diários: soma dos dias da janela, sem varrer leads
+        window = rollups.synced_store(client_id, config, client).window(start_ts, end_ts, [p_id])
+        leads_won = []
+        stats = AnalyticsEngine.metrics_from_counts(
+            window['created'] + len(leads_unsorted), window['cohort_won'], window['won']
+        )
+        origins = dict(window['created_by'].get('preferred', {}))
+        for origin, count in AnalyticsEngine.group_by_origin(
+            leads_unsorted, origin_field_id, bot_field_id
+        ).items():
+            origins[origin] = origins.get(origin, 0) + count
+        origins = dict(sorted(origins.items(), key=lambda item: item[1], reverse=True))
+        won_by_origin = window['won_by'].get('preferred', {})
+        won_by_month = window['won_by_month']
+        total_lost = window['lost']
+    else:
+        # A. Leads Criados na Pipeline Específica
+        leads_in_pipe = client.get_leads(start_ts, end_ts, p_id)
+
+        # C. Vendas Totais Ganhos (Independente de quando foram criados)
+        leads_won = client.get_won_leads(start_ts, end_ts, p_id)
+
+        # --- PROCESSAMENTO ---
+        # Unifica leads de Entrada com os da Pipeline para análise de eficiência real
+        all_created = leads_in_pipe + leads_unsorted
+
+        stats = AnalyticsEngine.calculate_metrics(
+            all_created,
+            leads_won,
+            config['kommo']['won_status_id']
+        )
+
+        origins = AnalyticsEngine.group_by_origin(all_created, origin_field_id, bot_field_id)
+        total_lost = None
+
+    # Conversão percentual (vendas/novos leads)
+    conversion_pct = 0.0
+    if stats['total_created'] > 0:
+        conversion_pct = round(100.0 * stats['total_closed_won'] / stats['total_created'], 1)
+
+    # --- FORMATAÇÃO DA MENSAGEM ---
+    if report_type in ("weekly", "last_week"):
+        return build_weekly_message(
+            config['client_name'], stats, origins, conversion_pct, label_periodo
+        )
+    if report_type in ("current_month", "last_month", "monthly"):
+        # Perdidos do período
+        if total_lost is None:
+            lost = client.get_lost_leads(start_ts, end_ts, p_id)
+            total_lost = len(lost)
+
+        return build_monthly_message(
+            config['client_name'], stats, origins, conversion_pct,
+            total_lost, leads_won, config['kommo']['origin_field_id'], label_periodo, start_ts,
+            config['kommo'].get('origin_bot_field_id'), won_by_origin=won_by_origin
+        )
+    if report_type in ("yearly", "year_to_date", "last_year", "annual"):
+        return build_annual_message(
+            config['client_name'], stats, origins, leads_won, start_ts,
+            won_by_month=won_by_month
+        )
+    # Fallback: use weekly-style as baseline
+    return build_weekly_message(
+        config['client_name'], stats, origins, conversion_pct, label_periodo
+    )
+
+
+def prewarm_client_report(client_id: str, report_type: str) -> bool:
+    """Calcula o relatório e deixa no cache (sem enviar). Usado pelo agendador."""
+    report_type = REPORT_ALIASES.get(report_type, report_type)
+    periods = DateHelper.get_timestamps_for_report(report_type)
+    if not periods:
+        logger.error(f"❌ Tipo de relatório desconhecido: {report_type}")
+        return False
+    start_ts, end_ts = periods
+    config = ConfigLoader.load_client_config(client_id)
+    msg = build_client_report(
+        client_id, config, report_type, start_ts, end_ts, REPORT_LABELS.get(report_type, report_type)
+    )
+    if msg is None:
+        return False
+    report_cache.put(client_id, report_type, start_ts, msg)
+    logger.info("🔥 Relatório %s pré-calculado para %s", report_type, client_id)
+    return True
+
+
+@tracing.traced("run_analytics_pipeline", root=True)
+@profiling.profiled("run_analytics_pipeline")
 def run_analytics_pipeline(report_type="weekly", messenger: TelegramMessenger | None = None, client_id: str | None = None):
+    """Gera e envia o relatório aos clientes; retorna quantos envios o Telegram confirmou"""
+    sent = 0
     try:
-        logger.info(f"🚀 [INÍCIO] Iniciando Engine de Analytics: Relatório {report_type.upper()}")
+        logger.info("🚀 [INÍCIO] Iniciando Engine de Analytics: Relatório %s", report_type.upper())
 
-        # Aliases para manter compatibilidade e clareza
-        aliases = {
-            "annual": "last_year",
-            "month": "current_month",
-        }
-        report_type = aliases.get(report_type, report_type)
+        report_type = REPORT_ALIASES.get(report_type, report_type)
 
         bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
         if not bot_token:
             logger.critical("❌ TELEGRAM_BOT_TOKEN não encontrado no arquivo .env")
-            return
+            return 0
 
         messenger = messenger or TelegramMessenger(bot_token)
-        
+
         # 2. Varredura de Clientes (Busca todos os arquivos .json na pasta /config)
         config_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config')
         try:
             all_clients = [f.replace('.json', '') for f in os.listdir(config_dir) if f.endswith('.json')]
         except FileNotFoundError:
             logger.error("📂 Pasta /config não encontrada.")
-            return
+            return 0
 
         if not all_clients:
             logger.warning("⚠️ Nenhum arquivo de configuração de cliente encontrado.")
-            return
-        
+            return 0
+
         # Se client_id foi especificado, processa apenas esse cliente
         if client_id:
             if client_id not in all_clients:
                 logger.error(f"❌ Cliente {client_id} não encontrado nas configurações")
-                return
+                return 0
             client_files = [client_id]
-            logger.info(f"📌 Processando apenas o cliente: {client_id}")
+            logger.info("📌 Processando apenas o cliente: %s", client_id)
         else:
             client_files = all_clients
-            logger.info(f"📌 Processando todos os clientes: {len(client_files)}")
 
         # 3. Definição do Período de Busca baseado no tipo de relatório
         periods = DateHelper.get_timestamps_for_report(report_type)
-        labels = {
-            "weekly": "Semana Atual (Dom - Hoje)",
-            "last_week": "Semana Passada (Dom - Sáb)",
-            "monthly": "Mês Anterior (Fechado)",
-            "last_month": "Mês Anterior (Fechado)",
-            "current_month": "Mês Atual (Até hoje)",
-            "month_to_date": "Mês Atual (Até hoje)",
-            "yearly": "Ano Atual (Até hoje)",
-            "year_to_date": "Ano Atual (Até hoje)",
-            "last_year": "Ano Anterior (Retrospectiva)",
-            "annual": "Ano Anterior (Retrospectiva)",
-        }
 
         if not periods:
             logger.error(f"❌ Tipo de relatório desconhecido: {report_type}")
-            return
+            return 0
 
         start_ts, end_ts = periods
-        label_periodo = labels.get(report_type, report_type)
+        label_periodo = REPORT_LABELS.get(report_type, report_type)
 
         # 4. Loop de Processamento por Cliente
         for client_id in client_files:
-            logger.info(f"📌 Processando Cliente: {client_id}")
-            
+            logger.info("📌 Processando Cliente: %s", client_id)
+
             try:
-                # Carrega configurações e inicializa cliente Kommo
+                # Carrega configurações
                 config = ConfigLoader.load_client_config(client_id)
-                client = KommoClient(config['kommo']['subdomain'], config['kommo']['api_token'])
-                
-                # Health Check (Opcional, mas recomendado)
-                is_ok, conn_msg = client.health_check()
-                if not is_ok:
-                    logger.error(f"🚫 Falha na conexão para {client_id}: {conn_msg}")
-                    continue
 
-                # --- COLETA DE DADOS ---
-                p_id = config['kommo']['pipeline_id']
-                
-                # A. Leads Criados na Pipeline Específica
-                leads_in_pipe = client.get_leads(start_ts, end_ts, p_id)
-                
-                # B. Leads na 'Entrada' (Unsorted/Leads de Entrada)
-                leads_unsorted = client.get_unsorted_leads(start_ts, end_ts)
-                
-                # C. Vendas Totais Ganhos (Independente de quando foram criados)
-                leads_won = client.get_won_leads(start_ts, end_ts, p_id)
-
-                # --- PROCESSAMENTO ---
-                # Unifica leads de Entrada com os da Pipeline para análise de eficiência real
-                all_created = leads_in_pipe + leads_unsorted
-                
-                stats = AnalyticsEngine.calculate_metrics(
-                    all_created,
-                    leads_won,
-                    config['kommo']['won_status_id']
-                )
-
-                # Conversão percentual (vendas/novos leads)
-                conversion_pct = 0.0
-                if stats['total_created'] > 0:
-                    conversion_pct = round(100.0 * stats['total_closed_won'] / stats['total_created'], 1)
-                
-                origins = AnalyticsEngine.group_by_origin(
-                    all_created, 
-                    config['kommo']['origin_field_id'],
-                    config['kommo'].get('origin_bot_field_id')
-                )
-
-                # --- FORMATAÇÃO DA MENSAGEM ---
-                if report_type in ("weekly", "last_week"):
-                    msg = build_weekly_message(
-                        config['client_name'], stats, origins, conversion_pct, label_periodo
-                    )
-                elif report_type in ("current_month", "last_month", "monthly"):
-                    # Perdidos do período
-                    lost = client.get_lost_leads(start_ts, end_ts, p_id)
-                    total_lost = len(lost)
-
-                    msg = build_monthly_message(
-                        config['client_name'], stats, origins, conversion_pct,
-                        total_lost, leads_won, config['kommo']['origin_field_id'], label_periodo, start_ts,
-                        config['kommo'].get('origin_bot_field_id')
-                    )
-                elif report_type in ("yearly", "year_to_date", "last_year", "annual"):
-                    msg = build_annual_message(
-                        config['client_name'], stats, origins, leads_won, start_ts
-                    )
+                # Relatório pré-calculado pelo agendador (ver core.scheduler), se ainda válido
+                msg = report_cache.get(client_id, report_type, start_ts, report_scheduler.cache_max_age_s(report_type))
+                if msg is not None:
+                    logger.info("⚡ Relatório %s servido do cache para %s", report_type, client_id)
                 else:
-                    # Fallback: use weekly-style as baseline
-                    msg = build_weekly_message(
-                        config['client_name'], stats, origins, conversion_pct, label_periodo
-                    )
+                    msg = build_client_report(client_id, config, report_type, start_ts, end_ts, label_periodo)
+                    if msg is None:
+                        continue
+                    report_cache.put(client_id, report_type, start_ts, msg)
 
                 # --- ENVIO ---
-                messenger.send_message(config['notifications']['telegram_chat_id'], msg)
-                logger.info(f"✅ Relatório enviado com sucesso para {client_id}")
+                result = messenger.send_message(config['notifications']['telegram_chat_id'], msg)
+                if not (result or {}).get("ok", True):
+                    continue
+                sent += 1
+                logger.info("✅ Relatório enviado com sucesso para %s", client_id)
 
             except Exception as e:
                 logger.error(f"💥 Erro crítico ao processar o cliente {client_id}: {str(e)}", exc_info=True)
 
         logger.info("🏁 Pipeline finalizado.")
-    
+
     except Exception as e:
         logger.error(f"💥 Erro fatal na pipeline de analytics: {str(e)}", exc_info=True)
+    return sent
 
 if __name__ == "__main__":
     # Permite rodar: python src/main.py weekly | monthly | annual
     target_report = sys.argv[1] if len(sys.argv) > 1 else "weekly"
-    run_analytics_pipeline(target_report)
\ No newline at end of file
+    run_analytics_pipeline(target_report)
@@ -1,18 +1,99 @@
+import hmac
 import os
-import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from fastapi import FastAPI
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from core.logger import logger
-from core.client_resolver import get_client_by_chat_id
+from core.client_resolver import get_client_by_chat_id, get_client_by_subdomain
 from core.config_loader import ConfigLoader
-from core.exports import ExportEngine
+from core import export_watermarks, lead_index, metrics, profiling, rollups, tracing, work_queue
 from core.date_helper import DateHelper
 from handlers.telegram_commands import resolve_report_type, help_message, normalize_command
 from core.telegram_menus import main_menu, reports_menu, exports_menu
 from integrations.messenger import TelegramMessenger
-from main import run_analytics_pipeline
+from integrations.json_codec import loads
+from integrations.kommo_schema import SchemaError, lead_field_ids_from_config
+from integrations.kommo_webhook import parse_form, parse_events
+from core import scheduler as report_scheduler
 
-app = FastAPI()
+# Carrega variáveis de ambiente (.env)
+load_dotenv()
+
+# O pipeline (main) e as exportações (core.exports) puxam o cliente HTTP e,
+# nas exportações, pandas/openpyxl/pyarrow: são importados sob demanda, nas
+# filas, para o servidor subir e responder /health sem esse custo.
+
+
+def _warm_imports():
+    """Importa os módulos pesados em segundo plano logo após a subida"""
+    import main  # noqa: F401
+    from core import exports  # noqa: F401
+
+
+def _send_scheduled_report(client_id: str, report_type: str):
+    from main import run_analytics_pipeline
+    # Um envio por cliente e período, mesmo com o job disparado de novo
+    periods = DateHelper.get_timestamps_for_report(report_type)
+    if periods and not report_scheduler.claim_send(client_id, report_type, periods[0]):
+        logger.info("⏭️ Relatório %s de %s já enviado neste período", report_type, client_id)
+        return
+    sent = 0
+    try:
+        sent = run_analytics_pipeline(report_type, client_id=client_id)
+    finally:
+        # Falhou: o período continua pendente para o próximo disparo
+        if periods and not sent:
+            report_scheduler.release_send(client_id, report_type, periods[0])
+            logger.warning("⚠️ Relatório %s de %s não enviado; período liberado", report_type, client_id)
+
+
+def _kommo_webhook_secret_required() -> bool:
+    """Eventos do webhook alimentam o índice e os agregados: sem segredo, qualquer um os altera"""
+    return lead_index.LEAD_INDEX_ENABLED or rollups.ROLLUPS_ENABLED
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if _kommo_webhook_secret_required() and not KOMMO_WEBHOOK_SECRET:
+        raise RuntimeError("KOMMO_WEBHOOK_SECRET é obrigatório com KOMMO_LEAD_INDEX ou ANALYTICS_ROLLUPS ativos")
+    work_queue.jobs.submit(_warm_imports)
+    scheduler = None
+    leader_lock = None
+    if report_scheduler.REPORT_SCHEDULER_ENABLED:
+        # Só um worker do uvicorn agenda; os outros atendem requisições
+        leader_lock = report_scheduler.acquire_leader_lock()
+        if leader_lock is None:
+            logger.info("⏰ Agendador já ativo em outro processo; desligado no pid %s", os.getpid())
+    if leader_lock is not None:
+        from main import prewarm_client_report
+        scheduler = report_scheduler.build_scheduler(
+            ConfigLoader.list_clients(), ConfigLoader.load_client_config,
+            prewarm_client_report, _send_scheduled_report,
+        )
+        scheduler.start()
+    yield
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+    # Mudanças dos webhooks ainda não gravadas
+    lead_index.flush_pending()
+    if leader_lock is not None:
+        leader_lock.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+EXPORTS_DIR = "./exports"
+
+# Webhook do Kommo: segredo (?token=...), obrigatório com índice local ou
+# agregados ativos, e intervalo da reconciliação
+KOMMO_WEBHOOK_SECRET = os.getenv("KOMMO_WEBHOOK_SECRET")
+KOMMO_RECONCILE_INTERVAL_MIN = float(os.getenv("KOMMO_RECONCILE_INTERVAL_MIN", "60"))
+
+# Chats autorizados a usar comandos de diagnóstico (/perfil), separados por vírgula
+ADMIN_CHAT_IDS = {int(c) for c in os.getenv("ADMIN_CHAT_IDS", "").split(",") if c.strip()}
 
 
 def get_messenger() -> TelegramMessenger | None:
@@ -24,15 +105,17 @@ def get_messenger() -> TelegramMessenger | None:
 
 
 def _run_pipeline_async(report_type: str, messenger: TelegramMessenger, client_id: str | None = None):
-    thread = threading.Thread(target=run_analytics_pipeline, args=(report_type, messenger, client_id), daemon=True)
-    thread.start()
+    from main import run_analytics_pipeline
+    work_queue.jobs.submit(run_analytics_pipeline, report_type, messenger, client_id)
 
 
 def _handle_export_command(export_type: str, chat_id: int, messenger: TelegramMessenger, client_id: str):
     """Processa comando de exportação e envia arquivos para o chat"""
+    @tracing.traced("export", root=True)
     def export_and_send():
+        from core.exports import ExportEngine
         try:
-            logger.info(f"📊 Gerando exportação {export_type} para {client_id}")
+            logger.info("📊 Gerando exportação %s para %s", export_type, client_id)
             config = ConfigLoader.load_client_config(client_id)
             
             # Determina período baseado no sufixo do comando
@@ -63,9 +146,6 @@ def _handle_export_command(export_type: str, chat_id: int, messenger: TelegramMe
                 period_timestamps = DateHelper.get_timestamps_for_report('last_year')
                 period_label = "Ano Anterior"
             
-            # Gerar arquivos
-            files = ExportEngine.generate_exports(client_id, config, period_timestamps=period_timestamps)
-            
             # Determina categorias baseado no tipo base do comando
             if 'won' in export_type:
                 categories = ["ganhos"]
@@ -79,35 +159,54 @@ def _handle_export_command(export_type: str, chat_id: int, messenger: TelegramMe
                 # export_all ou export sem sufixo
                 categories = ["ganhos", "perdidos", "perdidos_followup", "ativos"]
             
-            # Enviar arquivos para o chat
+            # Delta: só o que mudou desde a última exportação delta deste chat
+            since = None
+            if '_delta' in export_type:
+                since = export_watermarks.get_watermarks(client_id, chat_id, categories)
+                period_label = "Desde a última exportação" if since else "Primeira exportação delta (completa)"
+            # Próximas marcas: maior updated_at exportado por categoria (relógio do Kommo)
+            exported_until = {}
+            
+            # Gerar arquivos (só as categorias pedidas; repetições vêm do cache)
+            files = ExportEngine.generate_exports(
+                client_id, config, period_timestamps=period_timestamps, output_dir=EXPORTS_DIR,
+                categories=categories, since=since, watermarks=exported_until
+            )
+            
+            # Enviar arquivos para o chat (snapshots Parquet/Arrow ficam só em exports/)
+            sent = 0
+            sent_formats = []
             for category in categories:
                 if category in files:
                     category_files = files[category]
                     
-                    # Enviar Excel
-                    messenger.send_document(
-                        chat_id, 
-                        category_files['excel'],
-                        caption=f"📊 {category.replace('_', ' ').title()} - {period_label}\n📄 Formato: Excel"
-                    )
-                    
-                    # Enviar CSV
-                    messenger.send_document(
-                        chat_id, 
-                        category_files['csv'],
-                        caption=f"📊 {category.replace('_', ' ').title()} - {period_label}\n📄 Formato: CSV"
-                    )
+                    for fmt, fmt_label in (("excel", "Excel"), ("csv", "CSV")):
+                        if fmt not in category_files:
+                            continue
+                        with metrics.EXPORT_PHASE_SECONDS.time(phase="upload"):
+                            messenger.send_document(
+                                chat_id, 
+                                category_files[fmt],
+                                caption=f"📊 {category.replace('_', ' ').title()} - {period_label}\n📄 Formato: {fmt_label}"
+                            )
+                        sent += 1
+                        if fmt_label not in sent_formats:
+                            sent_formats.append(fmt_label)
             
             # Mensagem de sucesso com resumo
             completion_msg = (
                 f"✅ *Exportação Concluída*\n\n"
                 f"📅 Período: {period_label}\n"
                 f"📦 Categorias: {len(categories)}\n"
-                f"📄 Arquivos: {len(categories)*2} (Excel + CSV)\n\n"
+                f"📄 Arquivos: {sent} ({' + '.join(sent_formats) or 'nenhum enviado'})\n\n"
                 f"_Os dados estão prontos para análise!_ 📊"
             )
             messenger.send_message(chat_id, completion_msg)
-            logger.info(f"✅ {client_id}: {len(categories)*2} arquivos enviados para o chat")
+            logger.info("✅ %s: %s arquivos enviados para o chat", client_id, sent)
+            
+            # A marca só avança depois da entrega (categoria sem leads mantém a anterior)
+            if since is not None and exported_until:
+                export_watermarks.set_watermarks(client_id, chat_id, exported_until)
             
         except Exception as e:
             logger.error(f"❌ Erro na exportação para {client_id}: {e}", exc_info=True)
@@ -119,9 +218,8 @@ def _handle_export_command(export_type: str, chat_id: int, messenger: TelegramMe
             )
             messenger.send_message(chat_id, error_msg)
     
-    # Executar em thread para não bloquear o webhook
-    thread = threading.Thread(target=export_and_send, daemon=True)
-    thread.start()
+    # Exportação é longa: vai para a fila de jobs, liberando a de updates
+    work_queue.jobs.submit(export_and_send)
 
 
 def _process_command(command: str, chat_id: int, messenger: TelegramMessenger):
@@ -161,8 +259,20 @@ def _process_command(command: str, chat_id: int, messenger: TelegramMessenger):
     return {"ok": True}
 
 
-@app.post("/telegram/webhook")
-async def telegram_webhook(update: dict):
+def _process_profiled_command(command: str, chat_id: int, messenger: TelegramMessenger):
+    """`/perfil <comando>`: roda o comando sob cProfile (só chats de ADMIN_CHAT_IDS)"""
+    inner = command[len("/perfil"):].strip()
+    if chat_id not in ADMIN_CHAT_IDS or not inner:
+        messenger.send_message(chat_id, "Escolha uma opção:", reply_markup=main_menu())
+        return {"ok": True}
+    logger.info("🔬 Perfil pedido pelo chat %s: %s", chat_id, inner)
+    messenger.send_message(chat_id, f"🔬 Perfil ativado para `{inner}` (arquivos em {profiling.PROFILE_DIR})")
+    with profiling.forced():
+        return _process_command(inner, chat_id, messenger)
+
+
+def handle_update(update: dict):
+    """Processa um update do Telegram (roda na fila de updates, fora do event loop)"""
     # Callback queries (inline keyboard)
     if update.get("callback_query"):
         cq = update["callback_query"]
@@ -203,10 +313,89 @@ async def telegram_webhook(update: dict):
         return {"ok": False, "error": "Bot token ausente"}
 
     command = normalize_command(text)
+    if command.startswith("/perfil"):
+        return _process_profiled_command(command, chat_id, messenger)
     return _process_command(command, chat_id, messenger)
 
 
+@app.post("/telegram/webhook")
+async def telegram_webhook(request: Request):
+    # Só valida e enfileira: nenhuma consulta a disco ou HTTP no event loop
+    started = time.perf_counter()
+    body = await request.body()
+    # Decodifica o corpo cru com o decodificador rápido (evita o parse padrão do FastAPI)
+    try:
+        update = loads(body)
+    except ValueError:
+        logger.warning("⚠️ Update do Telegram com JSON inválido ignorado")
+        return {"ok": True}
+    if not isinstance(update, dict):
+        return {"ok": True}
+
+    if not work_queue.updates.submit(handle_update, update):
+        # Fila cheia: 503 faz o Telegram reenviar o update depois
+        raise HTTPException(status_code=503, detail="Fila cheia")
+    work_queue.record_ack(started)
+    return {"ok": True}
+
+
+def ingest_kommo_webhook(body: bytes) -> dict:
+    """Valida os eventos do Kommo e aplica no índice local do cliente dono da conta"""
+    try:
+        payload = parse_form(body)
+        account = payload.get("account")
+        subdomain = account.get("subdomain") if isinstance(account, dict) else None
+        client_id = get_client_by_subdomain(subdomain) if subdomain else None
+        if not client_id:
+            logger.warning(f"⚠️ Webhook do Kommo de conta não configurada: {subdomain}")
+            return {"ok": False, "error": "Conta não configurada"}
+        config = ConfigLoader.load_client_config(client_id)
+        _, events = parse_events(payload, field_ids=lead_field_ids_from_config(config))
+    except (SchemaError, UnicodeDecodeError) as e:
+        logger.warning(f"⚠️ Webhook do Kommo inválido ignorado: {e}")
+        return {"ok": False, "error": "Payload inválido"}
+
+    index = lead_index.get_index(client_id)
+    applied = index.apply_events(events)
+
+    # Agregados diários já sincronizados seguem os eventos (ver core.rollups)
+    store = rollups.get_store(client_id, config)
+    if store.synced_at is not None:
+        store.apply_events(events)
+    # Índice e agregados vão para o disco juntos, na thread de gravação
+    lead_index.schedule_flush(index, store)
+    logger.info("🔔 Kommo %s: %d eventos recebidos, %d aplicados", client_id, len(events), applied)
+
+    lead_index.start_reconciler(ConfigLoader.load_client_config, KOMMO_RECONCILE_INTERVAL_MIN)
+    if not index.ready:
+        lead_index.request_reconcile()
+    return {"ok": True, "events": len(events), "applied": applied}
+
+
+@app.post("/kommo/webhook")
+async def kommo_webhook(request: Request):
+    if KOMMO_WEBHOOK_SECRET:
+        token = request.query_params.get("token", "")
+        if not hmac.compare_digest(token.encode("utf-8"), KOMMO_WEBHOOK_SECRET.encode("utf-8")):
+            raise HTTPException(status_code=403, detail="Token inválido")
+    elif _kommo_webhook_secret_required():
+        raise HTTPException(status_code=403, detail="KOMMO_WEBHOOK_SECRET não configurado")
+    if not work_queue.updates.submit(ingest_kommo_webhook, await request.body()):
+        raise HTTPException(status_code=503, detail="Fila cheia")
+    return {"ok": True}
+
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "queues": {"updates": work_queue.updates.depth(), "jobs": work_queue.jobs.depth()},
+        "ack": work_queue.ack_percentiles(),
+    }
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas no formato texto do Prometheus (ver core.metrics)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
@@ -0,0 +1,13 @@
+import pytest
+
+from core import export_watermarks, metadata_cache, period_cache
+
+
+@pytest.fixture(autouse=True)
+def _isolated_metadata_cache(tmp_path, monkeypatch):
+    # Testes com KommoClient não gravam metadados em ./data nem herdam os de outro teste
+    monkeypatch.setattr(metadata_cache, "METADATA_CACHE_DIR", str(tmp_path / "metadata_cache"))
+    # Idem para os resultados de período dos scripts de relatório
+    monkeypatch.setattr(period_cache, "PERIOD_CACHE_DIR", str(tmp_path / "period_cache"))
+    # E para as marcas das exportações delta
+    monkeypatch.setattr(export_watermarks, "EXPORT_WATERMARK_DIR", str(tmp_path / "export_watermarks"))
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import generate_april_report as april
+
+CONFIG = {
+    "kommo": {
+        "pipeline_id": 10,
+        "pipeline_followup_id": [20],
+        "won_status_id": 142,
+        "lost_status_id": 143,
+        "origin_field_id": 1,
+        "origin_bot_field_id": 2,
+        "secretary_origin_field_id": None,
+    }
+}
+
+
+def _ts(month, day):
+    return int(datetime(2026, month, day, 12).timestamp())
+
+
+def _lead(lead_id, created, status=1, closed=None, pipeline=10, origin="Instagram"):
+    return {
+        "id": lead_id,
+        "pipeline_id": pipeline,
+        "status_id": status,
+        "created_at": created,
+        "closed_at": closed,
+        "custom_fields_values": [{"field_id": 1, "values": [{"value": origin}]}],
+    }
+
+
+LEADS = [
+    _lead(1, _ts(1, 5), origin="Google"),
+    _lead(2, _ts(1, 31), status=142, closed=_ts(2, 1)),
+    _lead(3, _ts(2, 10), status=143, closed=_ts(3, 28), pipeline=20),
+    _lead(4, _ts(3, 1), status=142, closed=_ts(3, 2), origin="Indicação"),
+    _lead(5, int(datetime(2025, 12, 31, 23).timestamp()), status=142, closed=_ts(1, 2)),
+    _lead(6, _ts(4, 1)),
+]
+
+
+class FakeKommo:
+    base_url = "https://fake.kommo.com/api/v4"
+
+    def __init__(self, data_version="1:1"):
+        self.calls = 0
+        self.data_version = data_version
+
+    def get_data_version(self, pipeline_ids):
+        return self.data_version
+
+    def _request_get_all_pages(self, endpoint, params):
+        self.calls += 1
+        field = "created_at" if "filter[created_at][from]" in params else "closed_at"
+        low, high = params[f"filter[{field}][from]"], params[f"filter[{field}][to]"]
+        status = params.get("filter[status][0]")
+        leads = [
+            lead for lead in LEADS
+            if lead["pipeline_id"] == params["filter[pipeline_id][0]"]
+            and (status is None or lead["status_id"] == status)
+            and lead[field] and low <= lead[field] <= high
+        ]
+        return {"_embedded": {"leads": leads}}
+
+
+def test_year_to_date_batch_matches_monthly_collection():
+    per_month = FakeKommo()
+    expected = [april.collect_month_report(per_month, "cliente", CONFIG, 2026, month) for month in (1, 2, 3)]
+
+    # Outra versão dos dados: nada vem do cache de períodos gravado acima
+    batch = FakeKommo(data_version="2:2")
+    reports = april.collect_year_to_date_reports(batch, "cliente", CONFIG, 2026, 3)
+    assert reports[:-1] == expected
+    assert batch.calls * 3 == per_month.calls
+    assert [r["n_won"] for r in expected] == [1, 1, 1]
+    # O último é o acumulado de janeiro a março
+    assert reports[-1]["n_won"] == 3
@@ -0,0 +1,18 @@
+from benchmarks import bench_hot_paths
+
+
+def test_hot_paths_report_every_case_with_time_and_memory():
+    report = bench_hot_paths.run([200], repeat=1, seed=3)
+
+    cases = {r["case"] for r in report["results"]}
+    assert cases == {
+        "group_by_origin", "calculate_metrics", "calculate_efficiency_by_origin", "build_monthly_message",
+        "build_annual_message", "_leads_to_dataframe", "_save_both_formats",
+    }
+    assert all(r["leads"] == 200 and r["median_s"] >= 0 and r["peak_mib"] >= 0 for r in report["results"])
+
+
+def test_synthetic_origins_follow_weighted_distribution():
+    inputs = bench_hot_paths.build_inputs(2000, seed=1)
+    origins = list(inputs["origins"])
+    assert origins[0] == "Instagram"
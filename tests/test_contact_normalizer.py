@@ -0,0 +1,62 @@
+import random
+
+from core.contact_normalizer import normalize_contacts, normalize_phones, valid_email_mask
+from core.exports import ExportEngine
+from tests.test_contact_validation import is_valid_email, is_valid_phone
+from tests.test_phone_formatting import format_phone
+
+
+PHONE_CASES = [
+    ('11987654321', '+5511987654321'),
+    ('(11) 9876-5432', ''),
+    ('+55 11 98765-4321', '+5511987654321'),
+    ('11 9 8765-4321', '+5511987654321'),
+    ('5511987654321', '+5511987654321'),
+    ('55 11 98765-4321', '+5511987654321'),
+    ('21987654321', '+5521987654321'),
+    ('(21) 98765-4321', '+5521987654321'),
+    ('123', ''),
+    ('11 9876', ''),
+]
+
+EMAIL_CASES = [
+    ('joao@example.com', True),
+    ('maria.silva@company.co.uk', True),
+    ('contato+tag@empresa.com.br', True),
+    ('invalid@', False),
+    ('@invalid.com', False),
+    ('sem-arroba.com', False),
+]
+
+
+def _scalar_phone(value):
+    return format_phone(value) if is_valid_phone(value) else ""
+
+
+def test_normalize_phones_matches_reference_cases():
+    values = [v for v, _ in PHONE_CASES]
+    assert normalize_phones(values).tolist() == [expected for _, expected in PHONE_CASES]
+    assert normalize_phones(values).tolist() == [_scalar_phone(v) for v in values]
+
+
+def test_valid_email_mask_matches_reference_cases():
+    values = [v for v, _ in EMAIL_CASES]
+    assert valid_email_mask(values).tolist() == [expected for _, expected in EMAIL_CASES]
+
+
+def test_batch_matches_scalar_functions_on_random_values():
+    rnd = random.Random(7)
+    alphabet = "0123456789 ()-.+@abcXYZ_%\n\t\x0b\xa0٣"
+    values = ["".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 18))) for _ in range(3000)]
+    values += [v for v, _ in PHONE_CASES] + [v for v, _ in EMAIL_CASES] + [None, ""]
+
+    result = normalize_contacts(values)
+
+    for raw, email, phone, contact in zip(values, result["email"], result["phone"], result["contact"]):
+        value = (raw or "").strip()
+        assert (email != "") == is_valid_email(value)
+        assert phone == _scalar_phone(value)
+        expected = value if ExportEngine._is_valid_email(value) else (
+            ExportEngine._format_phone(value) if ExportEngine._is_valid_phone(value) else ""
+        )
+        assert contact == expected
@@ -0,0 +1,124 @@
+import os
+import time
+
+from core import export_cache
+from core.exports import ExportEngine
+from tests.test_export_writers import FakeExportKommo
+
+CONFIG = {
+    "kommo": {
+        "subdomain": "fake",
+        "api_token": "token",
+        "pipeline_id": 10,
+        "pipeline_followup_id": [20],
+        "won_status_id": 142,
+        "lost_status_id": 143,
+    }
+}
+
+
+class VersionedKommo(FakeExportKommo):
+    """FakeExportKommo com versão dos dados controlável e contagem de buscas"""
+
+    version = "100:200"
+    fetches = 0
+
+    def get_data_version(self, pipeline_ids):
+        return VersionedKommo.version
+
+    def _request_get_all_pages(self, endpoint, params):
+        VersionedKommo.fetches += 1
+        return super()._request_get_all_pages(endpoint, params)
+
+
+def test_repeated_export_is_served_from_cache(tmp_path, monkeypatch):
+    import core.exports as exports
+
+    monkeypatch.setattr(exports, "KommoClient", VersionedKommo)
+    monkeypatch.setattr(VersionedKommo, "fetches", 0)
+
+    first = ExportEngine.generate_exports("cliente", CONFIG, output_dir=str(tmp_path), categories=["ganhos"])
+    assert set(first) == {"ganhos"}
+    assert VersionedKommo.fetches == 1
+
+    second = ExportEngine.generate_exports("cliente", CONFIG, output_dir=str(tmp_path), categories=["ganhos"])
+    assert second == first
+    assert VersionedKommo.fetches == 1
+
+    # Dados mudaram no Kommo: nova chave, nova busca
+    monkeypatch.setattr(VersionedKommo, "version", "101:200")
+    ExportEngine.generate_exports("cliente", CONFIG, output_dir=str(tmp_path), categories=["ganhos"])
+    assert VersionedKommo.fetches == 2
+
+
+def test_cache_miss_when_files_were_removed(tmp_path):
+    path = tmp_path / "cliente" / "a.csv"
+    path.parent.mkdir()
+    path.write_text("Nome,Telefone\n")
+    files = {"ganhos": {"csv": str(path)}}
+    export_cache.store(str(tmp_path), "cliente", "k", files)
+
+    assert export_cache.lookup(str(tmp_path), "cliente", "k") == files
+    path.unlink()
+    assert export_cache.lookup(str(tmp_path), "cliente", "k") is None
+
+
+def test_evict_by_age_and_size(tmp_path):
+    client_dir = tmp_path / "cliente"
+    client_dir.mkdir()
+    now = time.time()
+    for i, age_days in enumerate((10, 3, 2, 1)):
+        f = client_dir / f"f{i}.csv"
+        f.write_bytes(b"x" * 100)
+        os.utime(f, (now - age_days * 86400, now - age_days * 86400))
+    export_cache.store(str(tmp_path), "cliente", "old", {"ganhos": {"csv": str(client_dir / "f0.csv")}})
+
+    removed = export_cache.evict(str(tmp_path), max_bytes=250, max_age_days=7)
+
+    # f0 saiu pela idade e f1 (o mais antigo restante) pelo tamanho
+    assert removed == 2
+    assert sorted(p.name for p in client_dir.glob("*.csv")) == ["f2.csv", "f3.csv"]
+    assert export_cache.lookup(str(tmp_path), "cliente", "old") is None
+    assert not (client_dir / ".cache" / "old.json").exists()
+
+
+def test_manifest_expires_even_when_hit_often(tmp_path, monkeypatch):
+    path = tmp_path / "cliente" / "a.csv"
+    path.parent.mkdir()
+    path.write_text("Nome,Telefone\n")
+    files = {"ganhos": {"csv": str(path)}}
+    now = time.time()
+    monkeypatch.setattr(export_cache.time, "time", lambda: now)
+    export_cache.store(str(tmp_path), "cliente", "k", files)
+
+    # Acessos frequentes renovam os arquivos, mas não o prazo do manifesto
+    for minutes in (10, 20, 29):
+        monkeypatch.setattr(export_cache.time, "time", lambda m=minutes: now + m * 60)
+        assert export_cache.lookup(str(tmp_path), "cliente", "k") == files
+
+    monkeypatch.setattr(export_cache.time, "time", lambda: now + (export_cache.EXPORT_CACHE_TTL_MIN + 1) * 60)
+    assert export_cache.lookup(str(tmp_path), "cliente", "k") is None
+    assert path.exists()
+
+
+def test_data_version_follows_latest_updated_at(monkeypatch):
+    import json
+
+    from integrations.kommo_cassette import CassetteResponse
+    from integrations.kommo_client import KommoClient
+
+    # Como a API v4: só _embedded (e _links), sem _total_items
+    listings = {"leads": [{"id": 1, "updated_at": 500}], "contacts": [{"id": 9, "updated_at": 400}]}
+
+    def fake_get(endpoint, params=None):
+        kind = endpoint.rsplit("/", 1)[-1]
+        body = {"_page": 1, "_links": {"self": {"href": endpoint}}, "_embedded": {kind: listings[kind]}}
+        return CassetteResponse(200, json.dumps(body).encode("utf-8"), {})
+
+    client = KommoClient("fake", "token")
+    monkeypatch.setattr(client, "_get", fake_get)
+    before = client.get_data_version([10])
+    assert before == "500:400"
+
+    listings["leads"] = [{"id": 1, "updated_at": 600}]
+    assert client.get_data_version([10]) != before
@@ -0,0 +1,72 @@
+from core import export_watermarks
+from core.exports import ExportEngine
+from tests.test_export_writers import FakeExportKommo
+
+CONFIG = {
+    "kommo": {
+        "subdomain": "fake",
+        "api_token": "token",
+        "pipeline_id": 10,
+        "pipeline_followup_id": [20],
+        "won_status_id": 142,
+        "lost_status_id": 143,
+    }
+}
+
+
+class RecordingKommo(FakeExportKommo):
+    calls = []
+
+    def _request_get_all_pages(self, endpoint, params):
+        RecordingKommo.calls.append(dict(params))
+        response = super()._request_get_all_pages(endpoint, params)
+        for lead in response["_embedded"]["leads"]:
+            lead["updated_at"] = 1500 + lead["id"]
+        return response
+
+
+def test_watermarks_are_per_chat_and_category(tmp_path):
+    out = str(tmp_path)
+    assert export_watermarks.get_watermarks("cliente", 1, ["ativos"], out) == {}
+
+    export_watermarks.set_watermarks("cliente", 1, {"ativos": 1000, "ganhos": 1000}, out)
+    export_watermarks.set_watermarks("cliente", 2, {"ativos": 2000}, out)
+
+    assert export_watermarks.get_watermarks("cliente", 1, ["ativos", "perdidos"], out) == {"ativos": 1000}
+    assert export_watermarks.get_watermarks("cliente", 2, ["ativos", "ganhos"], out) == {"ativos": 2000}
+
+
+def test_export_eviction_keeps_watermarks(tmp_path, monkeypatch):
+    from core import export_cache
+
+    exports_dir = tmp_path / "exports"
+    old_export = exports_dir / "cliente" / "cliente_ativos_delta_20260101_000000.csv"
+    old_export.parent.mkdir(parents=True)
+    old_export.write_text("Nome,Telefone\n")
+    monkeypatch.setattr(export_watermarks, "EXPORT_WATERMARK_DIR", str(tmp_path / "watermarks"))
+    export_watermarks.set_watermarks("cliente", 1, {"ativos": 1000})
+
+    assert export_cache.evict(str(exports_dir), max_age_days=-1) == 1
+    assert export_watermarks.get_watermarks("cliente", 1, ["ativos"]) == {"ativos": 1000}
+
+
+def test_delta_export_filters_by_updated_at(tmp_path, monkeypatch):
+    import core.exports as exports
+
+    monkeypatch.setattr(exports, "KommoClient", RecordingKommo)
+    monkeypatch.setattr(RecordingKommo, "calls", [])
+
+    exported_until = {}
+    files = ExportEngine.generate_exports(
+        "cliente", CONFIG, output_dir=str(tmp_path),
+        categories=["ativos", "perdidos_followup"], since={"ativos": 1000, "perdidos_followup": 900},
+        watermarks=exported_until,
+    )
+
+    # Follow-up em delta faz uma busca só por pipeline (em vez de closed_at + updated_at)
+    assert [c.get("filter[updated_at][from]") for c in RecordingKommo.calls] == [900, 1000]
+    assert "_delta_" in files["ativos"]["csv"]
+    with open(files["ativos"]["csv"], encoding="utf-8-sig") as f:
+        assert f.read().splitlines()[1:] == ["Contato 505,+55 11 900000505"]
+    # Próxima marca: maior updated_at buscado em cada categoria, não o relógio local
+    assert exported_until == {"ativos": 1505, "perdidos_followup": 1504}
@@ -0,0 +1,181 @@
+from openpyxl import load_workbook
+
+from core.exports import ExportEngine
+from core.export_writers import StreamingExportWriter
+
+
+class FakeKommo:
+    def __init__(self):
+        self.batches = []
+
+    def get_contacts_batch(self, contact_ids):
+        self.batches.append(list(contact_ids))
+        return [
+            {
+                "id": cid,
+                "name": f"Contato {cid}",
+                "custom_fields_values": [
+                    {"field_id": 1, "field_code": "PHONE", "values": [{"value": f"+55 11 9{cid:08d}"}]}
+                ],
+            }
+            for cid in contact_ids
+        ]
+
+
+def _lead(lead_id, contact_id=None, name=None):
+    lead = {"id": lead_id, "name": name or f"Lead {lead_id}", "_embedded": {"contacts": []}}
+    if contact_id:
+        lead["_embedded"]["contacts"].append({"id": contact_id})
+    return lead
+
+
+def test_streaming_writer_writes_csv_and_xlsx(tmp_path):
+    with StreamingExportWriter(str(tmp_path), "cliente_ganhos") as writer:
+        writer.write_row(("Maria, da Silva", "+5511987654321"))
+        writer.write_row(("João", ""))
+
+    with open(writer.paths["csv"], "rb") as f:
+        assert f.read() == (
+            "﻿Nome,Telefone\n\"Maria, da Silva\",+5511987654321\nJoão,\n".encode("utf-8")
+        )
+
+    sheet = load_workbook(writer.paths["excel"]).active
+    assert [tuple(r) for r in sheet.iter_rows(values_only=True)] == [
+        ("Nome", "Telefone"),
+        ("Maria, da Silva", "+5511987654321"),
+        ("João", None),
+    ]
+
+
+def test_iter_lead_rows_resolves_contacts_in_batches():
+    leads = [_lead(i, contact_id=1000 + i) for i in range(5)] + [_lead(99, name=" Sem Contato ")]
+    kommo = FakeKommo()
+
+    rows = list(ExportEngine._iter_lead_rows(leads, kommo, batch_size=2))
+
+    assert kommo.batches == [[1000, 1001], [1002, 1003], [1004]]
+    assert rows[0] == ("Contato 1000", "+55 11 900001000")
+    assert rows[-1] == ("Sem Contato", "")
+    assert len(rows) == 6
+
+
+def test_save_both_formats_empty_export_keeps_header(tmp_path):
+    paths = ExportEngine._save_both_formats(iter(()), str(tmp_path), "vazio")
+    with open(paths["csv"], encoding="utf-8-sig") as f:
+        assert f.read() == "Nome,Telefone\n"
+
+
+class FakeExportKommo(FakeKommo):
+    """Responde às buscas paginadas do generate_exports com leads fixos por status"""
+
+    base_url = "https://fake.kommo.com/api/v4"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+
+    def _request_get_all_pages(self, endpoint, params):
+        status = params.get("filter[status][0]")
+        pipeline = params.get("filter[pipeline_id][0]")
+        if status == 142:
+            leads = [_lead(1, 501), _lead(2, 502)]
+        elif status == 143 and pipeline == 10:
+            leads = [_lead(3, 503)]
+        elif status == 143:
+            leads = [_lead(4)]
+        else:
+            leads = [_lead(1, 501), _lead(5, 505)]
+            leads[0]["status_id"] = 142
+        return {"_embedded": {"leads": leads}}
+
+
+def test_generate_exports_writes_all_categories(tmp_path, monkeypatch):
+    import core.exports as exports
+
+    monkeypatch.setattr(exports, "KommoClient", FakeExportKommo)
+    config = {
+        "kommo": {
+            "subdomain": "fake",
+            "api_token": "token",
+            "pipeline_id": 10,
+            "pipeline_followup_id": [20],
+            "won_status_id": 142,
+            "lost_status_id": 143,
+        }
+    }
+
+    files = ExportEngine.generate_exports("cliente", config, output_dir=str(tmp_path))
+
+    assert set(files) == {"ganhos", "perdidos", "perdidos_followup", "ativos"}
+    with open(files["ganhos"]["csv"], encoding="utf-8-sig") as f:
+        assert f.read().splitlines()[1:] == ["Contato 501,+55 11 900000501", "Contato 502,+55 11 900000502"]
+    with open(files["ativos"]["csv"], encoding="utf-8-sig") as f:
+        assert f.read().splitlines()[1:] == ["Contato 505,+55 11 900000505"]
+    assert load_workbook(files["perdidos_followup"]["excel"]).active.max_row == 2
+
+
+def test_generate_exports_parquet_snapshot_partitioned_by_month(tmp_path, monkeypatch):
+    import pytest
+    pq = pytest.importorskip("pyarrow.parquet")
+    import core.exports as exports
+
+    monkeypatch.setattr(exports, "KommoClient", FakeExportKommo)
+    config = {
+        "kommo": {
+            "subdomain": "fake",
+            "api_token": "token",
+            "pipeline_id": 10,
+            "pipeline_followup_id": [],
+            "won_status_id": 142,
+            "lost_status_id": 143,
+            "origin_field_id": 7,
+        }
+    }
+
+    files = ExportEngine.generate_exports(
+        "cliente", config, output_dir=str(tmp_path), formats=("csv", "parquet")
+    )
+
+    assert "excel" not in files["ganhos"]
+    (path,) = files["ganhos"]["parquet"]
+    assert "client=cliente" in path and "month=unknown" in path
+    table = pq.read_table(path)
+    assert table.column("lead_id").to_pylist() == [1, 2]
+    assert table.column("contact_phone").to_pylist() == ["+55 11 900000501", "+55 11 900000502"]
+    # Parquet não tem unidade em segundos; o timestamp volta em ms, sempre em UTC
+    assert table.schema.field("created_at").type.tz == "UTC"
+
+
+def test_failed_writer_stops_the_others_and_removes_partial_files(tmp_path, monkeypatch):
+    import threading
+
+    import pytest
+    import core.exports as exports
+
+    original = ExportEngine._write_format
+
+    def flaky_write(rows, directory, filename, fmt):
+        if fmt == "csv":
+            raise OSError("disco cheio")
+        return original(rows, directory, filename, fmt)
+
+    monkeypatch.setattr(exports, "KommoClient", FakeExportKommo)
+    monkeypatch.setattr(exports, "EXPORT_STREAM_QUEUE_ROWS", 1)
+    monkeypatch.setattr(ExportEngine, "_write_format", staticmethod(flaky_write))
+    config = {
+        "kommo": {
+            "subdomain": "fake",
+            "api_token": "token",
+            "pipeline_id": 10,
+            "pipeline_followup_id": [20],
+            "won_status_id": 142,
+            "lost_status_id": 143,
+        }
+    }
+
+    with pytest.raises(OSError, match="disco cheio"):
+        ExportEngine.generate_exports("cliente", config, output_dir=str(tmp_path), use_cache=False)
+
+    assert not [t for t in threading.enumerate() if t.name == "export-writer"]
+    # Nenhum Excel pela metade fica no diretório: o que sobrou foi gravado por inteiro
+    for path in (tmp_path / "cliente").glob("*.xlsx"):
+        assert load_workbook(path).active.max_row >= 1
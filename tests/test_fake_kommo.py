@@ -0,0 +1,60 @@
+from benchmarks.fake_kommo import FakeKommoServer
+from benchmarks.synthetic import synthetic_account
+import pytest
+
+from integrations.kommo_client import KommoClient, KommoRequestError
+
+NOW = 1_767_225_600
+
+
+def _server(**kwargs):
+    account = synthetic_account(600, subdomain="carga", seed=1, days=90, now=NOW)
+    return account, FakeKommoServer([account], **kwargs)
+
+
+def test_paginated_scan_matches_synthetic_filters():
+    account, server = _server()
+    config = account["config"]["kommo"]
+    with server:
+        client = KommoClient("carga", "token", base_url=server.base_url)
+        assert client.health_check()[0]
+
+        params = {"filter[pipeline_id][0]": config["pipeline_id"], "filter[status][0]": 142, "with": "contacts"}
+        leads = client._request_get_all_pages(f"{client.base_url}/leads", params)["_embedded"]["leads"]
+
+    expected = [l for l in account["leads"] if l["pipeline_id"] == config["pipeline_id"] and l["status_id"] == 142]
+    assert sorted(l["id"] for l in leads) == sorted(l["id"] for l in expected)
+    assert all(l["_embedded"]["contacts"] for l in leads)
+    # 50 por página, como a API real
+    assert server.calls[("carga", "/leads")] == -(-len(expected) // 50)
+
+
+def test_contacts_batch_and_date_filters():
+    account, server = _server()
+    with server:
+        client = KommoClient("carga", "token", base_url=server.base_url)
+        ids = [c["id"] for c in account["contacts"][:30]]
+        contacts = client.get_contacts_batch(ids)
+        created = client.get_leads(NOW - 10 * 86400, NOW)
+
+    assert sorted(c["id"] for c in contacts) == ids
+    assert {l["id"] for l in created} <= {l["id"] for l in account["leads"] if l["created_at"] >= NOW - 10 * 86400}
+
+
+def test_rate_limit_returns_429():
+    _, server = _server(max_rps=2)
+    with server:
+        client = KommoClient("carga", "token", base_url=server.base_url)
+        statuses = [client._get(f"{client.base_url}/account").status_code for _ in range(4)]
+    assert statuses[:2] == [200, 200]
+    assert 429 in statuses[2:]
+    assert server.statuses[429] >= 1
+
+
+def test_failed_page_raises_instead_of_truncating():
+    account, server = _server(error_rate=1.0)
+    with server:
+        client = KommoClient("carga", "token", base_url=server.base_url)
+        with pytest.raises(KommoRequestError) as failure:
+            client._request_get_all_pages(f"{client.base_url}/leads", {"filter[pipeline_id][0]": 1})
+    assert failure.value.status_code >= 500
@@ -0,0 +1,23 @@
+import pytest
+from integrations import json_codec
+
+
+def test_loads_bytes_and_str():
+    payload = '{"_embedded": {"leads": [{"id": 1, "name": "João"}]}}'
+    assert json_codec.loads(payload.encode("utf-8")) == json_codec.loads(payload)
+    assert json_codec.loads(payload)["_embedded"]["leads"][0]["name"] == "João"
+
+
+@pytest.mark.parametrize("backend", ["json", "orjson", "msgspec"])
+def test_backends_agree_and_reject_invalid_json(backend):
+    active = json_codec.BACKEND
+    try:
+        json_codec.set_backend(backend)
+    except ValueError:
+        pytest.skip(f"{backend} não instalado")
+    try:
+        assert json_codec.loads(b'{"a": [1, 2.5, null, true]}') == {"a": [1, 2.5, None, True]}
+        with pytest.raises(ValueError):
+            json_codec.loads(b'{"a": ')
+    finally:
+        json_codec.set_backend(active)
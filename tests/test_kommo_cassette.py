@@ -0,0 +1,106 @@
+import pytest
+
+from benchmarks.fake_kommo import FakeKommoServer
+from benchmarks.synthetic import synthetic_account
+from integrations import kommo_cassette
+from integrations.kommo_cassette import Cassette, CassetteMiss
+from integrations.kommo_client import KommoClient
+
+NOW = 1_767_225_600
+
+
+def _scan(client, pipeline_id):
+    params = {"filter[pipeline_id][0]": pipeline_id, "with": "contacts"}
+    return client._request_get_all_pages(f"{client.base_url}/leads", params)["_embedded"]["leads"]
+
+
+def test_record_then_replay_without_network(tmp_path):
+    account = synthetic_account(300, subdomain="fita", seed=3, days=60, now=NOW)
+    pipeline_id = account["config"]["kommo"]["pipeline_id"]
+    path = str(tmp_path / "kommo.jsonl.gz")
+
+    recorder = Cassette(path, "record")
+    with FakeKommoServer([account]) as server:
+        client = KommoClient("fita", "token", base_url=server.base_url, cassette=recorder)
+        live_leads = _scan(client, pipeline_id)
+        live_fields = client.get_lead_custom_fields()
+        live_contacts = client.get_contacts_batch([c["id"] for c in account["contacts"][:20]])
+        dead_url = server.base_url
+    recorder.close()
+    # Uma entrada por página da varredura + campos + contatos
+    assert recorder.recorded == client.request_count
+
+    # Servidor desligado: tudo sai do cassete
+    player = Cassette(path, "replay")
+    client = KommoClient("fita", "token", base_url=dead_url, cassette=player)
+    assert _scan(client, pipeline_id) == live_leads
+    assert client.get_lead_custom_fields() == live_fields
+    assert client.get_contacts_batch([c["id"] for c in account["contacts"][:20]]) == live_contacts
+    assert client.health_check()[0] is False  # /account não foi gravado
+
+    with pytest.raises(CassetteMiss):
+        client._get(f"{client.base_url}/leads/pipelines")
+
+
+def test_replay_keeps_original_timing(tmp_path, monkeypatch):
+    account = synthetic_account(10, subdomain="fita", seed=3, days=60, now=NOW)
+    path = str(tmp_path / "kommo.jsonl.gz")
+    recorder = Cassette(path, "record")
+    with FakeKommoServer([account], latency_ms=20) as server:
+        KommoClient("fita", "token", base_url=server.base_url, cassette=recorder).health_check()
+    recorder.close()
+
+    sleeps = []
+    monkeypatch.setattr(kommo_cassette.time, "sleep", sleeps.append)
+    client = KommoClient("fita", "token", base_url="http://127.0.0.1:9", cassette=Cassette(path, "replay", timing=True))
+    assert client.health_check()[0]
+    assert len(sleeps) == 1 and sleeps[0] >= 0.02
+
+
+def test_from_env_shares_one_cassette_per_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(kommo_cassette, "KOMMO_CASSETTE", str(tmp_path / "env.jsonl.gz"))
+    monkeypatch.setattr(kommo_cassette, "KOMMO_CASSETTE_MODE", "record")
+    first = KommoClient("a", "token").cassette
+    assert first is KommoClient("b", "token").cassette
+    assert first.mode == "record" and not first.replaying
+
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / "x.gz"), "rewind")
+
+
+def test_metadata_is_recorded_even_with_a_warm_cache(tmp_path, monkeypatch):
+    from core import metadata_cache
+
+    account = synthetic_account(10, subdomain="fita", seed=3, days=60, now=NOW)
+    path = str(tmp_path / "kommo.jsonl.gz")
+    with FakeKommoServer([account]) as server:
+        # Cache de metadados quente antes da gravação
+        KommoClient("fita", "token", base_url=server.base_url).health_check()
+        recorder = Cassette(path, "record")
+        KommoClient("fita", "token", base_url=server.base_url, cassette=recorder).health_check()
+        dead_url = server.base_url
+    recorder.close()
+    assert recorder.recorded == 1
+
+    # Máquina limpa: sem cache de metadados, tudo sai do cassete
+    monkeypatch.setattr(metadata_cache, "METADATA_CACHE_DIR", str(tmp_path / "vazio"))
+    player = KommoClient("fita", "token", base_url=dead_url, cassette=Cassette(path, "replay"))
+    assert player.health_check()[0]
+
+
+def test_batch_records_in_a_single_process(tmp_path, monkeypatch):
+    import sys
+
+    import generate_batch_reports as batch
+
+    monkeypatch.setattr(kommo_cassette, "KOMMO_CASSETTE", str(tmp_path / "lote.jsonl.gz"))
+    monkeypatch.setattr(kommo_cassette, "KOMMO_CASSETTE_MODE", "record")
+    monkeypatch.setattr(batch.ConfigLoader, "list_clients", staticmethod(lambda: ["a", "b"]))
+    ran = []
+    monkeypatch.setattr(batch, "run_client", lambda client_id, *args: ran.append(client_id) or {
+        "client_id": client_id, "ok": True, "file": f"{client_id}.md", "elapsed_s": 0, "kommo_requests": 0})
+    # Um pool de processos aqui falharia: a função trocada não é serializável
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", None)
+    monkeypatch.setattr(sys, "argv", ["generate_batch_reports.py", "--out-dir", str(tmp_path)])
+    batch.main()
+    assert ran == ["a", "b"]
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from integrations.kommo_schema import (
+    SchemaError,
+    decode_contacts_page,
+    decode_leads_page,
+    lead_field_ids_from_config,
+)
+
+
+LEADS_PAGE = {
+    "_page": 1,
+    "_links": {
+        "self": {"href": "https://conta.kommo.com/api/v4/leads?page=1"},
+        "next": {"href": "https://conta.kommo.com/api/v4/leads?page=2"},
+    },
+    "_embedded": {
+        "leads": [
+            {
+                "id": 101,
+                "name": "Lead 101",
+                "price": 0,
+                "status_id": 142,
+                "pipeline_id": 12155656,
+                "created_at": 1775000000,
+                "updated_at": 1775100000,
+                "closed_at": 1775100000,
+                "custom_fields_values": [
+                    {"field_id": 2371538, "field_name": "Origem", "field_code": None,
+                     "field_type": "select", "values": [{"value": "Instagram", "enum_id": 1}]},
+                    {"field_id": 999, "field_name": "Sem uso", "field_code": None,
+                     "field_type": "text", "values": [{"value": "x"}]},
+                ],
+                "_links": {"self": {"href": "..."}},
+                "_embedded": {
+                    "tags": [{"id": 1, "name": "vip"}],
+                    "contacts": [{"id": 501, "is_main": True, "_links": {}}],
+                },
+            },
+            {
+                "id": 102,
+                "name": "Lead 102",
+                "status_id": 70000001,
+                "pipeline_id": 12155656,
+                "created_at": 1775000100,
+                "updated_at": 1775000100,
+                "closed_at": None,
+                "custom_fields_values": None,
+                "_embedded": {"tags": []},
+            },
+        ]
+    },
+}
+
+
+def test_decode_leads_page_keeps_only_used_fields():
+    page = decode_leads_page(json.dumps(LEADS_PAGE).encode(), field_ids={2371538})
+
+    assert "next" in page["_links"]
+    first, second = page["_embedded"]["leads"]
+    assert set(first) == {
+        "id", "name", "status_id", "pipeline_id", "created_at", "updated_at",
+        "closed_at", "custom_fields_values", "_embedded",
+    }
+    assert first["custom_fields_values"] == [
+        {"field_id": 2371538, "field_code": None, "values": [{"value": "Instagram"}]}
+    ]
+    assert first["_embedded"] == {"contacts": [{"id": 501}]}
+    assert second["custom_fields_values"] is None
+    assert second["_embedded"] == {"contacts": []}
+
+
+def test_decode_leads_page_rejects_invalid_lead():
+    broken = {"_embedded": {"leads": [{"name": "sem id"}]}}
+    with pytest.raises(SchemaError):
+        decode_leads_page(json.dumps(broken).encode())
+
+
+def test_decode_contacts_page_keeps_phone_and_email_only():
+    payload = {
+        "_embedded": {
+            "contacts": [
+                {
+                    "id": 501,
+                    "name": "Maria",
+                    "custom_fields_values": [
+                        {"field_id": 1, "field_code": "PHONE", "values": [{"value": "+55 11 98765-4321", "enum_code": "WORK"}]},
+                        {"field_id": 2, "field_code": None, "values": [{"value": "ignorar"}]},
+                    ],
+                }
+            ]
+        }
+    }
+    contact = decode_contacts_page(json.dumps(payload).encode())["_embedded"]["contacts"][0]
+    assert contact == {
+        "id": 501,
+        "name": "Maria",
+        "custom_fields_values": [
+            {"field_id": 1, "field_code": "PHONE", "values": [{"value": "+55 11 98765-4321"}]}
+        ],
+    }
+
+
+def test_lead_field_ids_from_config():
+    config = {"kommo": {"origin_field_id": 1, "origin_bot_field_id": None, "secretary_origin_field_id": 3}}
+    assert lead_field_ids_from_config(config) == {1, 3}
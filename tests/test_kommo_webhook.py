@@ -0,0 +1,214 @@
+import os
+
+import pytest
+
+import telegram_webhook
+from core import lead_index
+from core.lead_index import LeadIndex
+from integrations.kommo_schema import SchemaError
+from integrations.kommo_webhook import parse_events, parse_form
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "kommo_webhook")
+
+
+def _fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read().strip()
+
+
+@pytest.fixture
+def isolated_index(tmp_path, monkeypatch):
+    # Índices em diretório temporário e sem thread de reconciliação (nada vai ao Kommo)
+    monkeypatch.setattr(lead_index, "LEAD_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(lead_index, "_indexes", {})
+    monkeypatch.setattr(lead_index, "_pending", {})
+    monkeypatch.setattr(telegram_webhook, "KOMMO_RECONCILE_INTERVAL_MIN", 0)
+    return tmp_path
+
+
+def test_parse_form_nests_bracket_keys():
+    payload = parse_form(b"leads%5Badd%5D%5B0%5D%5Bid%5D=1&leads%5Badd%5D%5B1%5D%5Bid%5D=2&account%5Bsubdomain%5D=x")
+    assert payload == {"leads": {"add": [{"id": "1"}, {"id": "2"}]}, "account": {"subdomain": "x"}}
+
+
+def test_parse_lead_add_keeps_only_configured_fields():
+    subdomain, events = parse_events(_fixture("lead_add.txt"), field_ids={676468})
+
+    assert subdomain == "medcentermuriae"
+    assert [e["data"]["id"] for e in events] == [9001, 9002]
+    lead = events[0]["data"]
+    assert lead["pipeline_id"] == 12252892 and lead["created_at"] == 1760000000
+    assert lead["custom_fields_values"] == [
+        {"field_id": 676468, "field_code": None, "values": [{"value": "Instagram"}]}
+    ]
+
+
+def test_parse_rejects_invalid_ids():
+    with pytest.raises(SchemaError):
+        parse_events(_fixture("invalid_id.txt"))
+
+
+def test_parse_skips_non_object_items():
+    payload = {
+        "account": {"subdomain": "x"},
+        "leads": {"delete": ["9001", {"id": "9002"}], "add": [None]},
+        "contacts": {"delete": [7]},
+    }
+    _, events = parse_events(payload)
+    assert events == [{"entity": "lead", "action": "delete", "data": {"id": 9002}}]
+
+
+def _post_kommo(token=None):
+    import asyncio
+
+    from starlette.requests import Request
+
+    async def receive():
+        return {"type": "http.request", "body": _fixture("lead_add.txt"), "more_body": False}
+
+    query = f"token={token}".encode() if token is not None else b""
+    request = Request({"type": "http", "method": "POST", "path": "/kommo/webhook", "headers": [],
+                       "query_string": query}, receive)
+    return asyncio.run(telegram_webhook.kommo_webhook(request))
+
+
+def test_webhook_secret_is_required_with_lead_index(monkeypatch):
+    import asyncio
+
+    from fastapi import HTTPException
+
+    monkeypatch.setattr(lead_index, "LEAD_INDEX_ENABLED", True)
+    monkeypatch.setattr(telegram_webhook, "KOMMO_WEBHOOK_SECRET", None)
+
+    async def start():
+        async with telegram_webhook.lifespan(telegram_webhook.app):
+            pass
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(start())
+    with pytest.raises(HTTPException) as exc:
+        _post_kommo()
+    assert exc.value.status_code == 403
+
+    submitted = []
+    monkeypatch.setattr(telegram_webhook.work_queue.updates, "submit", lambda *args: submitted.append(args) or True)
+    monkeypatch.setattr(telegram_webhook, "KOMMO_WEBHOOK_SECRET", "s3cret")
+    with pytest.raises(HTTPException):
+        _post_kommo("errado")
+    assert _post_kommo("s3cret") == {"ok": True}
+    assert len(submitted) == 1
+
+
+def test_events_build_index_and_queries(tmp_path):
+    index = LeadIndex("med_center", directory=str(tmp_path))
+    for name in ("lead_add.txt", "contact_add.txt", "lead_status_won.txt", "lead_update_stale.txt", "lead_delete.txt"):
+        index.apply_events(parse_events(_fixture(name))[1])
+
+    lead = index.leads[9001]
+    # Evento antigo (fora de ordem) não sobrescreve o status de ganho
+    assert lead["status_id"] == 142 and lead["name"] == "Lead Instagram"
+    assert lead["closed_at"] == 1760003600
+    # O webhook de contato não diz se o lead tem outros contatos: lista desconhecida
+    assert "_embedded" not in lead
+    assert 9002 not in index.leads
+    assert index.get_contacts([501])[0]["custom_fields_values"][0]["field_code"] == "PHONE"
+
+    won_params = {
+        "filter[pipeline_id][0]": 12252892, "filter[status][0]": 142,
+        "filter[closed_at][from]": 1760000000, "filter[closed_at][to]": 1760009999,
+    }
+    assert [l["id"] for l in index.query(won_params)] == [9001]
+    # Com contatos, lead vindo só de webhook manda a busca para a API
+    assert index.query({**won_params, "with": "contacts"}) is None
+    assert index.query({"filter[unknown][0]": 1}) is None
+
+    index.save()
+    assert LeadIndex("med_center", directory=str(tmp_path)).load().leads.keys() == index.leads.keys()
+
+
+def test_reconcile_heals_missed_events(tmp_path):
+    class Kommo:
+        base_url = "https://fake.kommo.com/api/v4"
+
+        def _request_get_all_pages(self, endpoint, params):
+            return {"_embedded": {"leads": [{"id": 2, "pipeline_id": 10, "status_id": 1, "updated_at": 5}]}}
+
+    index = LeadIndex("cliente", directory=str(tmp_path))
+    index.upsert_lead({"id": 1, "pipeline_id": 10, "status_id": 1, "updated_at": 1})
+    assert not index.ready
+
+    stats = index.reconcile(Kommo(), [10])
+
+    assert stats == {"scanned": 1, "changed": 1, "removed": 1}
+    assert list(index.leads) == [2] and index.ready
+
+
+def test_contact_links_after_reconcile_serve_contact_queries(tmp_path):
+    class Kommo:
+        base_url = "https://fake.kommo.com/api/v4"
+
+        def _request_get_all_pages(self, endpoint, params):
+            lead = {"id": 1, "pipeline_id": 10, "status_id": 1, "updated_at": 5, "_embedded": {"contacts": []}}
+            return {"_embedded": {"leads": [lead]}}
+
+    index = LeadIndex("cliente", directory=str(tmp_path))
+    index.reconcile(Kommo(), [10])
+    index.upsert_contact({"id": 7, "name": "Ana", "lead_ids": [1]})
+    index.upsert_lead({"id": 1, "pipeline_id": 10, "status_id": 2, "updated_at": 6})
+
+    # Lista vinda da varredura continua conhecida: o novo vínculo entra e o
+    # webhook de lead (sem _embedded) não a apaga
+    leads = index.query({"filter[pipeline_id][0]": 10, "with": "contacts"})
+    assert leads[0]["status_id"] == 2 and leads[0]["_embedded"]["contacts"] == [{"id": 7}]
+
+
+def test_webhook_endpoint_applies_events(isolated_index):
+    result = telegram_webhook.ingest_kommo_webhook(_fixture("lead_add.txt"))
+    assert result == {"ok": True, "events": 2, "applied": 2}
+    # A gravação fica para a thread de gravação; flush_pending a antecipa
+    lead_index.flush_pending()
+    assert os.path.exists(isolated_index / "med_center.json")
+
+    assert telegram_webhook.ingest_kommo_webhook(_fixture("invalid_id.txt"))["ok"] is False
+    assert telegram_webhook.ingest_kommo_webhook(b"account%5Bsubdomain%5D=desconhecida")["ok"] is False
+
+
+def test_flush_writes_only_changed_indexes(tmp_path):
+    index = LeadIndex("cliente", directory=str(tmp_path))
+    assert not index.flush()
+    index.apply_events(parse_events(_fixture("lead_add.txt"))[1])
+    assert index.flush()
+    assert not index.flush()
+    assert LeadIndex("cliente", directory=str(tmp_path)).load().leads.keys() == index.leads.keys()
+
+
+def test_failed_reconcile_leaves_index_untouched(tmp_path):
+    from integrations.kommo_client import KommoRequestError
+
+    class ThrottledKommo:
+        base_url = "https://fake.kommo.com/api/v4"
+
+        def _request_get_all_pages(self, endpoint, params):
+            raise KommoRequestError(endpoint, 429)
+
+    index = LeadIndex("cliente", directory=str(tmp_path))
+    index.upsert_lead({"id": 1, "pipeline_id": 10, "status_id": 1, "updated_at": 1})
+    with pytest.raises(KommoRequestError):
+        index.reconcile(ThrottledKommo(), [10])
+    assert list(index.leads) == [1] and not index.ready
+
+
+def test_reconcile_keeps_leads_newer_than_the_scan(tmp_path):
+    class Kommo:
+        base_url = "https://fake.kommo.com/api/v4"
+
+        def _request_get_all_pages(self, endpoint, params):
+            return {"_embedded": {"leads": [{"id": 2, "pipeline_id": 10, "status_id": 1, "updated_at": 5}]}}
+
+    index = LeadIndex("cliente", directory=str(tmp_path))
+    # Webhooks que chegaram durante a varredura: lead novo e lead 2 já alterado
+    index.upsert_lead({"id": 3, "pipeline_id": 10, "status_id": 1, "updated_at": 9})
+    index.upsert_lead({"id": 2, "pipeline_id": 10, "status_id": 142, "updated_at": 8})
+
+    assert index.reconcile(Kommo(), [10]) == {"scanned": 1, "changed": 0, "removed": 0}
+    assert index.leads[2]["status_id"] == 142 and 3 in index.leads
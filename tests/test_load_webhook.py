@@ -0,0 +1,25 @@
+from benchmarks import load_webhook
+from handlers.telegram_commands import COMMAND_MAP
+
+
+def test_synthetic_updates_mix_text_and_callbacks():
+    updates = load_webhook.synthetic_updates(40, "reports", seed=1)
+    texts = [u["message"]["text"] for u in updates if "message" in u]
+    callbacks = [u["callback_query"]["data"] for u in updates if "callback_query" in u]
+
+    assert texts and callbacks
+    assert all(cb.startswith("cmd:") for cb in callbacks)
+    commands = texts + [cb[len("cmd:"):] for cb in callbacks]
+    assert all(not COMMAND_MAP[c].startswith("export_") for c in commands)
+
+
+def test_load_run_reports_acks_jobs_and_call_volume():
+    report = load_webhook.run_load(rate=40, duration=0.25, mix="all", clients=["eliney_faria"], leads=120)
+
+    assert report["drained"]
+    assert report["http_status"] == {"200": report["updates"]}
+    assert report["ack_ms"]["count"] == report["updates"]
+    assert report["job_s"]["count"] == report["updates"]
+    assert report["kommo"]["calls"] > 0
+    assert report["telegram"]["calls"]["sendMessage"] >= report["updates"]
+    assert report["threads_max"] >= 1
@@ -0,0 +1,37 @@
+import json
+import logging
+
+from core.logger import DeferredQueueHandler, JsonFormatter, SamplingFilter, logger
+
+
+def _record(module="kommo_client", level=logging.INFO, msg="Página %d", args=(1,)):
+    record = logging.LogRecord("KommoAnalytics", level, f"{module}.py", 1, msg, args, None)
+    return record
+
+
+def test_logger_only_enqueues():
+    assert [type(h) for h in logger.handlers] == [DeferredQueueHandler]
+    assert logger.listener._thread is not None
+
+
+def test_queue_handler_defers_formatting():
+    record = _record()
+    prepared = DeferredQueueHandler(None).prepare(record)
+    assert prepared.msg == "Página %d" and prepared.args == (1,)
+
+
+def test_json_formatter_emits_one_object_per_line():
+    line = JsonFormatter().format(_record())
+    entry = json.loads(line)
+    assert entry["message"] == "Página 1"
+    assert entry["module"] == "kommo_client"
+    assert entry["level"] == "INFO"
+
+
+def test_sampling_filter_keeps_one_in_n_and_all_warnings():
+    sampler = SamplingFilter(SamplingFilter.parse("kommo_client=0.25, messenger=0"))
+    kept = [sampler.filter(_record()) for _ in range(8)]
+    assert kept.count(True) == 2
+    assert not sampler.filter(_record(module="messenger"))
+    assert sampler.filter(_record(module="messenger", level=logging.WARNING))
+    assert sampler.filter(_record(module="exports"))
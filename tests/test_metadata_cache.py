@@ -0,0 +1,58 @@
+import json
+
+from benchmarks.fake_kommo import FakeKommoServer
+from benchmarks.synthetic import synthetic_account
+from core import metadata_cache
+from integrations.kommo_client import KommoClient
+
+NOW = 1_767_225_600
+
+
+def _server():
+    account = synthetic_account(20, subdomain="meta", seed=5, days=30, now=NOW)
+    return account, FakeKommoServer([account])
+
+
+def _metadata_calls(server):
+    return {route: server.calls[("meta", route)] for route in ("/account", "/leads/pipelines", "/leads/custom_fields")}
+
+
+def test_fresh_entries_skip_http_across_clients():
+    account, server = _server()
+    with server:
+        for _ in range(2):
+            # Um cliente novo por rodada, como cada execução do pipeline
+            client = KommoClient("meta", "token", base_url=server.base_url)
+            assert client.health_check() == (True, f"Conectado à conta: {account['account']['name']}")
+            assert client.get_pipelines() == account["pipelines"]
+            fields = client.get_lead_custom_fields()["_embedded"]["custom_fields"]
+            assert fields == account["custom_fields"]
+
+        assert _metadata_calls(server) == {"/account": 1, "/leads/pipelines": 1, "/leads/custom_fields": 1}
+        assert client.request_count == 0
+
+        # Outro token não herda as entradas; TTL 0 desliga o cache
+        KommoClient("meta", "outro-token", base_url=server.base_url).health_check()
+        KommoClient("meta", "token", base_url=server.base_url, metadata_ttl_min=0).health_check()
+        assert server.calls[("meta", "/account")] == 3
+
+
+def test_expired_entry_is_revalidated_with_etag():
+    account, server = _server()
+    with server:
+        client = KommoClient("meta", "token", base_url=server.base_url)
+        client.get_pipelines()
+
+        endpoint = f"{client.base_url}/leads/pipelines"
+        scope = client.headers["Authorization"]
+        entry = metadata_cache.get("meta", endpoint, scope)
+        assert entry["headers"]["etag"]
+        entry["stored_at"] -= 2 * 3600
+        with open(metadata_cache._path(None, "meta", endpoint, scope), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        assert not metadata_cache.fresh(entry)
+
+        assert client.get_pipelines() == account["pipelines"]
+        assert server.statuses[304] == 1
+        assert metadata_cache.fresh(metadata_cache.get("meta", endpoint, scope))
+        assert server.calls[("meta", "/leads/pipelines")] == 2
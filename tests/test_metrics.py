@@ -0,0 +1,52 @@
+import asyncio
+
+import requests
+
+import telegram_webhook
+from core import metrics
+from integrations.kommo_client import KommoClient
+
+
+class FakeResponse:
+    status_code = 200
+    content = b'{"_embedded": {"contacts": []}}'
+
+
+def test_endpoint_label_collapses_ids():
+    base = "https://conta.kommo.com/api/v4"
+    assert metrics.endpoint_label(f"{base}/contacts/123", base) == "/contacts/{id}"
+    assert metrics.endpoint_label(f"{base}/leads/pipelines/7/statuses", base) == "/leads/pipelines/{id}/statuses"
+    assert metrics.endpoint_label(f"{base}/leads/custom_fields", base) == "/leads/custom_fields"
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("teste_seconds", "Teste", ("fase",), buckets=(0.1, 1))
+    histogram.observe(0.05, fase="a")
+    histogram.observe(0.5, fase="a")
+    text = "\n".join(histogram.render())
+    assert 'teste_seconds_bucket{fase="a",le="0.1"} 1' in text
+    assert 'teste_seconds_bucket{fase="a",le="1"} 2' in text
+    assert 'teste_seconds_bucket{fase="a",le="+Inf"} 2' in text
+    assert 'teste_seconds_count{fase="a"} 2' in text
+
+
+def test_kommo_requests_are_counted_by_endpoint_and_status(monkeypatch):
+    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: FakeResponse())
+    client = KommoClient("conta", "token")
+    before = metrics.KOMMO_REQUESTS.value(endpoint="/contacts", status="200")
+    batches = metrics.KOMMO_CONTACT_BATCH_SIZE.count()
+
+    client.get_contacts_batch([1, 2, 3])
+
+    assert metrics.KOMMO_REQUESTS.value(endpoint="/contacts", status="200") == before + 1
+    assert metrics.KOMMO_REQUEST_SECONDS.count(endpoint="/contacts", status="200") >= 1
+    assert metrics.KOMMO_CONTACT_BATCH_SIZE.count() == batches + 1
+
+
+def test_metrics_endpoint_exposes_registry():
+    response = asyncio.run(telegram_webhook.metrics_endpoint())
+    body = response.body.decode()
+    assert response.media_type.startswith("text/plain")
+    assert "# TYPE kommo_requests_total counter" in body
+    assert 'work_queue_depth{queue="updates"}' in body
+    assert "# TYPE export_phase_seconds histogram" in body
@@ -0,0 +1,68 @@
+import pstats
+
+from core import profiling, work_queue
+import telegram_webhook
+from tests.test_webhook_queue import _post
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profiled_target_writes_prof_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TARGETS", {"busy"})
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_MEMORY", True)
+
+    assert profiling.profiled("busy")(_busy)(1000) == _busy(1000)
+
+    (prof,) = tmp_path.glob("busy_*.prof")
+    assert any(func[2] == "_busy" for func in pstats.Stats(str(prof)).stats)
+    (mem,) = tmp_path.glob("busy_*.mem.txt")
+    assert mem.read_text(encoding="utf-8").startswith("Pico de memória")
+
+
+def test_other_targets_run_unprofiled(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TARGETS", {"generate_exports"})
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+    profiling.profiled("busy")(_busy)(10)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_forced_profile_follows_queued_work(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TARGETS", set())
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    job = profiling.profiled("job")(_busy)
+
+    with profiling.forced():
+        work_queue.jobs.submit(job, 100)
+    work_queue.jobs.submit(job, 100)
+    work_queue.jobs.join()
+
+    assert len(list(tmp_path.glob("job_*.prof"))) == 1
+
+
+class RecordingMessenger:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id, text, reply_markup=None):
+        self.sent.append(text)
+
+
+def test_profile_command_is_admin_only(monkeypatch):
+    messenger = RecordingMessenger()
+    forced = []
+    monkeypatch.setattr(telegram_webhook, "get_messenger", lambda: messenger)
+    monkeypatch.setattr(telegram_webhook, "ADMIN_CHAT_IDS", {7})
+    monkeypatch.setattr(telegram_webhook, "_process_command",
+                        lambda command, chat_id, m: forced.append((command, profiling.should_profile("x"))))
+    monkeypatch.setattr(profiling, "PROFILE_TARGETS", set())
+
+    _post({"message": {"chat": {"id": 42}, "text": "/perfil /semana"}})
+    _post({"message": {"chat": {"id": 7}, "text": "/perfil /semana"}})
+    work_queue.updates.join()
+
+    assert forced == [("/semana", True)]
+    assert messenger.sent[0] == "Escolha uma opção:"
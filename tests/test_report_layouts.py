@@ -0,0 +1,74 @@
+"""
+Layout dos .md dos scripts de relatório, byte a byte.
+
+Os arquivos em tests/fixtures/reports foram gerados pelos scripts originais
+(antes do core.reporting) contra a mesma conta sintética servida pelo Kommo
+falso, com relógio e fuso fixos; os scripts atuais precisam reproduzi-los.
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+import generate_april_report
+import generate_q1_report
+from benchmarks.fake_kommo import FakeKommoServer
+from benchmarks.synthetic import synthetic_account
+from core.config_loader import ConfigLoader
+from integrations import kommo_client
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "reports")
+FIXED_NOW = datetime(2026, 5, 10, 12, 0)
+
+
+class _FixedDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return FIXED_NOW
+
+
+@pytest.fixture
+def sao_paulo_tz(monkeypatch):
+    # Os limites dos meses são calculados no fuso local
+    monkeypatch.setenv("TZ", "America/Sao_Paulo")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def render_script(module, client_id: str, argv: list, output: str, monkeypatch) -> str:
+    """Roda o main() do script contra o Kommo falso e devolve o Markdown gravado"""
+    config = ConfigLoader.load_client_config(client_id)
+    account = synthetic_account(400, config=config, seed=7, days=160, now=int(FIXED_NOW.timestamp()))
+    with FakeKommoServer([account]) as server:
+        monkeypatch.setattr(kommo_client, "KOMMO_BASE_URL", server.base_url)
+        monkeypatch.setattr(module, "datetime", _FixedDatetime)
+        monkeypatch.setattr(sys, "argv", [module.__name__, *argv, "--md-output", output])
+        module.main()
+    with open(output, encoding="utf-8") as f:
+        return f.read()
+
+
+def _golden(name: str) -> str:
+    with open(os.path.join(GOLDEN_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_monthly_report_layout(tmp_path, monkeypatch, sao_paulo_tz):
+    document = render_script(generate_april_report, "med_center", ["--client", "med_center"],
+                             str(tmp_path / "mensal.md"), monkeypatch)
+    assert document == _golden("abril_med_center.md")
+
+
+def test_year_to_date_report_layout(tmp_path, monkeypatch, sao_paulo_tz):
+    document = render_script(generate_april_report, "med_center", ["--client", "med_center", "--year-to-date"],
+                             str(tmp_path / "ytd.md"), monkeypatch)
+    assert document == _golden("ytd_med_center.md")
+
+
+def test_q1_report_layout(tmp_path, monkeypatch, sao_paulo_tz):
+    document = render_script(generate_q1_report, "marcela_di_lollo", [], str(tmp_path / "q1.md"), monkeypatch)
+    assert document == _golden("q1_marcela_di_lollo.md")
@@ -0,0 +1,98 @@
+from core import reporting
+from tests.test_april_report import CONFIG, LEADS, FakeKommo
+
+
+def test_plan_merges_contiguous_and_overlapping_periods():
+    months = [reporting.month_period(2026, m) for m in (1, 2, 3)]
+    periods = months + [reporting.span_period("Q1 Total", months), reporting.month_period(2026, 6)]
+
+    plan = reporting.plan_fetches(CONFIG, periods, pipeline_ids=[10], measures=("created",))
+
+    assert [(p["filter[created_at][from]"], p["filter[created_at][to]"]) for _, p in plan] == [
+        (months[0]["start_ts"], months[2]["end_ts"]),
+        (periods[-1]["start_ts"], periods[-1]["end_ts"]),
+    ]
+
+
+def test_overlapping_periods_are_computed_in_one_pass():
+    months = [reporting.month_period(2026, m) for m in (1, 2, 3)]
+    kommo = FakeKommo()
+
+    *monthly, total = reporting.build_report(
+        kommo, CONFIG, months + [reporting.span_period("Q1 Total", months)], ("manual", "bot", "secretary")
+    )
+
+    assert kommo.calls == 3 * 2
+    assert [r["n_created"] for r in monthly] == [2, 1, 1]
+    assert total["n_created"] == sum(r["n_created"] for r in monthly)
+    assert total["n_won"] == 3 and total["n_lost"] == 1
+    assert total["created_by"]["manual"] == {"Instagram": 2, "Google": 1, "Indicação": 1}
+    # Sem campo de secretária configurado, a dimensão não aparece
+    assert set(total["created_by"]) == {"manual", "bot"}
+
+
+def test_markdown_origin_table_can_list_won_only_origins():
+    lines = reporting.markdown_origin_table({"Site": 4}, {"Site": 1, "Google": 2}, 4, include_won_only=True)
+    assert lines[2:] == ["| Site | 4 | 100.0% | 1 | 25.0% |", "| Google | 0 | 0.0% | 2 | 0.0% |"]
+
+
+def test_telegram_message_lists_top_origins():
+    result = reporting.compute({"created": LEADS}, [reporting.month_period(2026, 1)], {"manual": 1})[0]
+    msg = reporting.telegram_message("Cliente", [result], top=1)
+    assert "📅 *Janeiro 2026*" in msg
+    assert "1. Google: *1* (0 vendas)" in msg
+
+
+def test_cached_report_reuses_closed_periods(tmp_path):
+    months = [reporting.month_period(2026, m) for m in (1, 2)]
+    first = FakeKommo()
+    expected = reporting.build_report_cached(first, "cliente", CONFIG, months, cache_dir=str(tmp_path))
+
+    again = FakeKommo()
+    relabeled = [dict(months[0], label="Jan"), months[1], reporting.month_period(2026, 3)]
+    results = reporting.build_report_cached(again, "cliente", CONFIG, relabeled, cache_dir=str(tmp_path))
+
+    assert first.calls == 3 * 2
+    # Só março foi buscado; janeiro e fevereiro vieram do cache com o label pedido
+    assert again.calls == 3 * 2
+    assert results[0] == {**expected[0], "label": "Jan"}
+    assert results[1] == expected[1]
+    assert results[2]["n_won"] == 1
+
+
+def test_cached_report_is_keyed_on_data_version(tmp_path):
+    months = [reporting.month_period(2026, m) for m in (1, 2)]
+    reporting.build_report_cached(FakeKommo(), "cliente", CONFIG, months, cache_dir=str(tmp_path))
+
+    # Lead alterado no Kommo depois do fechamento: nada é reaproveitado
+    changed = FakeKommo(data_version="2:1")
+    reporting.build_report_cached(changed, "cliente", CONFIG, months, cache_dir=str(tmp_path))
+    assert changed.calls == 3 * 2
+
+    # Sem versão (falha na consulta), o cache nem é lido
+    unknown = FakeKommo(data_version=None)
+    reporting.build_report_cached(unknown, "cliente", CONFIG, months, cache_dir=str(tmp_path))
+    assert unknown.calls == 3 * 2
+
+
+def test_batch_without_clients_writes_empty_summary(tmp_path, monkeypatch):
+    import json
+    import sys
+
+    import generate_batch_reports as batch
+
+    monkeypatch.setattr(batch.ConfigLoader, "list_clients", staticmethod(lambda: []))
+    monkeypatch.setattr(sys, "argv", ["generate_batch_reports.py", "--out-dir", str(tmp_path)])
+    batch.main()
+
+    with open(tmp_path / "relatorios_monthly_resumo.json", encoding="utf-8") as f:
+        assert json.load(f)["clients"] == []
+
+
+def test_batch_quarter_periods():
+    import generate_batch_reports as batch
+
+    periods, total, title, text, suffix = batch.batch_periods("quarter", 2026, quarter=2)
+    assert [p["label"] for p in periods] == ["Abril 2026", "Maio 2026", "Junho 2026"]
+    assert (total["start_ts"], total["end_ts"]) == (periods[0]["start_ts"], periods[-1]["end_ts"])
+    assert (title, text, suffix) == ("Relatório Q2 2026", "Abril, Maio e Junho de 2026", "q2")
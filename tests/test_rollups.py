@@ -0,0 +1,150 @@
+from datetime import datetime
+
+from core.analytics import AnalyticsEngine
+from core.rollups import RollupStore
+
+CONFIG = {
+    "kommo": {
+        "pipeline_id": 10,
+        "pipeline_followup_id": [20],
+        "won_status_id": 142,
+        "lost_status_id": 143,
+        "origin_field_id": 1,
+        "origin_bot_field_id": 2,
+        "secretary_origin_field_id": None,
+    }
+}
+
+DAY = 86400
+BASE = int(datetime(2026, 3, 1, 12, 0).timestamp())
+
+
+def _lead(lead_id, created_day, status=1, closed_day=None, manual=None, bot=None, pipeline=10):
+    fields = []
+    if manual:
+        fields.append({"field_id": 1, "values": [{"value": manual}]})
+    if bot:
+        fields.append({"field_id": 2, "values": [{"value": bot}]})
+    return {
+        "id": lead_id,
+        "pipeline_id": pipeline,
+        "status_id": status,
+        "created_at": BASE + created_day * DAY,
+        "updated_at": BASE + created_day * DAY,
+        "closed_at": BASE + closed_day * DAY if closed_day is not None else None,
+        "custom_fields_values": fields,
+    }
+
+
+LEADS = [
+    _lead(1, 0, manual="Instagram"),
+    _lead(2, 1, status=142, closed_day=3, bot="Site"),
+    _lead(3, 2, status=142, closed_day=40, manual="Instagram", bot="Site"),
+    _lead(4, 5, status=143, closed_day=6),
+    _lead(5, -20, status=142, closed_day=4, manual="Google"),
+    _lead(6, 3, manual="Indicação", pipeline=20),
+]
+
+
+def _store(tmp_path, leads=LEADS):
+    store = RollupStore("cliente", CONFIG, directory=str(tmp_path))
+    for lead in leads:
+        store.apply_lead(lead)
+    return store
+
+
+def test_window_matches_lead_scan(tmp_path):
+    start, end = BASE - 12 * 3600, BASE + 10 * DAY
+    store = _store(tmp_path)
+    window = store.window(start, end, [10])
+
+    in_pipe = [l for l in LEADS if l["pipeline_id"] == 10]
+    created = [l for l in in_pipe if start <= l["created_at"] <= end]
+    won = [l for l in in_pipe if l["status_id"] == 142 and l["closed_at"] and start <= l["closed_at"] <= end]
+    lost = [l for l in in_pipe if l["status_id"] == 143 and l["closed_at"] and start <= l["closed_at"] <= end]
+
+    stats = AnalyticsEngine.calculate_metrics(created, won, 142)
+    assert AnalyticsEngine.metrics_from_counts(window["created"], window["cohort_won"], window["won"]) == stats
+    assert window["lost"] == len(lost)
+    assert window["created_by"]["preferred"] == AnalyticsEngine.group_by_origin(created, 1, 2)
+    assert window["won_by"]["preferred"] == AnalyticsEngine.count_won_by_origin(won, 1, 2)
+    assert window["won_by_month"] == {"2026-03": 2}
+
+
+def test_status_change_moves_counts_incrementally(tmp_path):
+    store = _store(tmp_path)
+    start, end = BASE - 12 * 3600, BASE + 10 * DAY
+    before = store.window(start, end)
+
+    # Webhook de mudança de etapa: sem campos customizados, a origem anterior é mantida
+    store.apply_lead({"id": 1, "status_id": 142, "closed_at": BASE + 2 * DAY, "updated_at": BASE + 2 * DAY})
+    after = store.window(start, end)
+
+    assert after["won"] == before["won"] + 1
+    assert after["cohort_won"] == before["cohort_won"] + 1
+    assert after["won_by"]["manual"]["Instagram"] == before["won_by"]["manual"].get("Instagram", 0) + 1
+
+    store.remove_lead(1)
+    assert store.window(start, end)["created"] == before["created"] - 1
+
+
+def test_sync_is_incremental_after_full_scan(tmp_path):
+    class Kommo:
+        base_url = "https://fake.kommo.com/api/v4"
+
+        def __init__(self):
+            self.calls = []
+
+        def _request_get_all_pages(self, endpoint, params):
+            self.calls.append(dict(params))
+            leads = [l for l in LEADS if l["pipeline_id"] == params["filter[pipeline_id][0]"]]
+            if "filter[updated_at][from]" in params:
+                leads = []
+            return {"_embedded": {"leads": leads}}
+
+    kommo = Kommo()
+    store = RollupStore("cliente", CONFIG, directory=str(tmp_path))
+    assert store.sync(kommo)["full"] is True
+    store.save()
+
+    reloaded = RollupStore("cliente", CONFIG, directory=str(tmp_path)).load()
+    stats = reloaded.sync(kommo)
+    assert stats["full"] is False
+    assert all("filter[updated_at][from]" in c for c in kommo.calls[-2:])
+    assert reloaded.window(BASE - DAY, BASE + 60 * DAY) == store.window(BASE - DAY, BASE + 60 * DAY)
+
+
+def test_failed_scan_keeps_facts_and_watermark(tmp_path):
+    import pytest
+
+    from integrations.kommo_client import KommoRequestError
+
+    class ThrottledKommo:
+        base_url = "https://fake.kommo.com/api/v4"
+
+        def _request_get_all_pages(self, endpoint, params):
+            if params["filter[pipeline_id][0]"] == 20:
+                raise KommoRequestError(endpoint, 429)
+            return {"_embedded": {"leads": [l for l in LEADS if l["pipeline_id"] == 10]}}
+
+    store = _store(tmp_path)
+    store.synced_at = store.full_synced_at = BASE
+    before = store.window(BASE - 30 * DAY, BASE + 60 * DAY)
+
+    with pytest.raises(KommoRequestError):
+        store.sync(ThrottledKommo(), full=True)
+    assert store.synced_at == BASE
+    assert len(store.facts) == len(LEADS)
+    assert store.window(BASE - 30 * DAY, BASE + 60 * DAY) == before
+
+
+def test_sync_watermark_is_latest_updated_at(tmp_path):
+    class Kommo:
+        base_url = "https://fake.kommo.com/api/v4"
+
+        def _request_get_all_pages(self, endpoint, params):
+            return {"_embedded": {"leads": [l for l in LEADS if l["pipeline_id"] == params["filter[pipeline_id][0]"]]}}
+
+    store = RollupStore("cliente", CONFIG, directory=str(tmp_path))
+    store.sync(Kommo())
+    assert store.synced_at == max(l["updated_at"] for l in LEADS)
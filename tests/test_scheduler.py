@@ -0,0 +1,102 @@
+import main
+from core import report_cache, scheduler
+from core.date_helper import DateHelper
+
+CONFIG = {
+    "notifications": {"telegram_chat_id": "123"},
+    "settings": {"report_day": "Wednesday", "timezone": "America/Sao_Paulo"},
+}
+
+
+def test_client_jobs_prewarm_before_send_on_report_day(monkeypatch):
+    monkeypatch.setattr(scheduler, "REPORT_SEND_TIME", "08:00")
+    monkeypatch.setattr(scheduler, "REPORT_PREWARM_MINUTES", 20)
+    jobs = {job_id: (task, report_type, trigger) for job_id, task, report_type, trigger in scheduler.client_jobs("c", CONFIG)}
+
+    task, report_type, trigger = jobs["c:prewarm:last_week"]
+    assert (task, report_type) == ("prewarm", "last_week")
+    assert trigger == {"trigger": "cron", "timezone": "America/Sao_Paulo", "day_of_week": "wed", "hour": 7, "minute": 40}
+    assert jobs["c:send:last_week"][2]["hour"] == 8
+    assert jobs["c:send:last_month"][2]["day"] == "1-7"
+    assert {jobs[f"c:refresh:{rt}"][2]["trigger"] for rt in scheduler.INTERACTIVE_REPORTS} == {"interval"}
+
+
+def test_prewarm_crossing_midnight_moves_to_previous_day(monkeypatch):
+    monkeypatch.setattr(scheduler, "REPORT_SEND_TIME", "00:10")
+    monkeypatch.setattr(scheduler, "REPORT_PREWARM_MINUTES", 20)
+    config = {"settings": {"report_day": "Monday"}}
+    trigger = dict(scheduler.client_jobs("c", config)[0][3])
+    assert (trigger["day_of_week"], trigger["hour"], trigger["minute"]) == ("sun", 23, 50)
+
+
+def test_report_cache_respects_period_and_ttl():
+    report_cache.clear()
+    report_cache.put("c", "weekly", 100, "msg")
+    assert report_cache.get("c", "weekly", 100) == "msg"
+    assert report_cache.get("c", "weekly", 200) is None
+    assert report_cache.get("c", "weekly", 100, max_age_s=-1) is None
+    assert report_cache.get("c", "current_month", 100) is None
+
+
+def test_pipeline_sends_cached_report_without_fetching(monkeypatch):
+    class Messenger:
+        sent = []
+
+        def send_message(self, chat_id, msg):
+            self.sent.append((chat_id, msg))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("não deveria consultar o Kommo")
+
+    report_cache.clear()
+    start_ts, _ = DateHelper.get_timestamps_for_report("weekly")
+    report_cache.put("med_center", "weekly", start_ts, "pronto")
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "token")
+    monkeypatch.setattr(main, "build_client_report", fail)
+
+    messenger = Messenger()
+    assert main.run_analytics_pipeline("weekly", messenger=messenger, client_id="med_center") == 1
+    report_cache.clear()
+
+    assert [msg for _, msg in messenger.sent] == ["pronto"]
+
+
+def test_only_one_process_holds_the_scheduler_lock(tmp_path):
+    path = str(tmp_path / "scheduler.lock")
+    leader = scheduler.acquire_leader_lock(path)
+    assert leader is not None
+    # Um segundo open/flock se comporta como outro worker
+    assert scheduler.acquire_leader_lock(path) is None
+    leader.close()
+    follower = scheduler.acquire_leader_lock(path)
+    assert follower is not None
+    follower.close()
+
+
+def test_scheduled_send_is_claimed_once_per_period(tmp_path):
+    assert scheduler.claim_send("c", "last_week", 100, str(tmp_path))
+    assert not scheduler.claim_send("c", "last_week", 100, str(tmp_path))
+    assert scheduler.claim_send("c", "last_week", 200, str(tmp_path))
+    assert scheduler.claim_send("c", "last_month", 100, str(tmp_path))
+
+
+def test_failed_scheduled_send_releases_the_period(tmp_path, monkeypatch):
+    import telegram_webhook
+
+    results = [0, 1]
+    monkeypatch.setattr(scheduler, "SCHEDULED_SENDS_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "run_analytics_pipeline", lambda report_type, client_id=None: results.pop(0))
+
+    # Falha no envio (o pipeline engole o erro e retorna 0): período volta a ficar pendente
+    telegram_webhook._send_scheduled_report("c", "last_week")
+    telegram_webhook._send_scheduled_report("c", "last_week")
+    assert results == []
+
+    start_ts, _ = DateHelper.get_timestamps_for_report("last_week")
+    assert not scheduler.claim_send("c", "last_week", start_ts)
+
+
+def test_interactive_reports_expire_after_one_refresh_cycle(monkeypatch):
+    monkeypatch.setattr(scheduler, "REPORT_CACHE_REFRESH_MIN", 30)
+    assert scheduler.cache_max_age_s("weekly") == 30 * 60
+    assert scheduler.cache_max_age_s("last_week") is None
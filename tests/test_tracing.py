@@ -0,0 +1,60 @@
+import json
+
+from core import tracing
+from core.exports import ExportEngine
+from tests.test_export_writers import FakeExportKommo
+
+
+CONFIG = {
+    "kommo": {
+        "subdomain": "fake",
+        "api_token": "token",
+        "pipeline_id": 10,
+        "pipeline_followup_id": [],
+        "won_status_id": 142,
+        "lost_status_id": 143,
+    }
+}
+
+
+def test_spans_are_noops_outside_a_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    with tracing.span("solto"):
+        pass
+    assert tracing.current_run_id() is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disabled_run_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path))
+    with tracing.run("export"):
+        assert tracing.current_run_id() is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_export_run_writes_chrome_trace_with_nested_spans(tmp_path, monkeypatch):
+    import core.exports as exports
+
+    monkeypatch.setattr(exports, "KommoClient", FakeExportKommo)
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_DIR", str(tmp_path / "traces"))
+
+    with tracing.run("export", client_id="cliente"):
+        run_id = tracing.current_run_id()
+        ExportEngine.generate_exports(
+            "cliente", CONFIG, output_dir=str(tmp_path / "exports"), categories=["ganhos"]
+        )
+
+    (path,) = (tmp_path / "traces").iterdir()
+    assert run_id in path.name
+    trace = json.loads(path.read_text())
+    assert trace["otherData"]["run_id"] == run_id
+    spans = {e["name"]: e for e in trace["traceEvents"] if e["ph"] == "X"}
+    assert {"export", "resolve_contacts", "ExportEngine._write_format"} <= set(spans)
+
+    # Os spans das gravações (pool de threads) ficam dentro da execução
+    root = spans["export"]
+    write = spans["ExportEngine._write_format"]
+    assert root["ts"] <= write["ts"] and write["ts"] + write["dur"] <= root["ts"] + root["dur"]
+    assert write["tid"] != root["tid"]
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import threading
+import time
+
+from starlette.requests import Request
+
+import telegram_webhook
+from core import work_queue
+
+
+class SlowMessenger:
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.sent = []
+
+    def send_message(self, chat_id, text, reply_markup=None):
+        time.sleep(self.delay)
+        self.sent.append((chat_id, text))
+
+
+def _post(payload) -> dict:
+    body = json.dumps(payload).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    request = Request({"type": "http", "method": "POST", "path": "/telegram/webhook", "headers": [],
+                       "query_string": b""}, receive)
+    return asyncio.run(telegram_webhook.telegram_webhook(request))
+
+
+def test_webhook_acks_before_slow_send(monkeypatch):
+    messenger = SlowMessenger()
+    monkeypatch.setattr(telegram_webhook, "get_messenger", lambda: messenger)
+
+    started = time.perf_counter()
+    assert _post({"message": {"chat": {"id": 42}, "text": "/help"}}) == {"ok": True}
+    assert time.perf_counter() - started < messenger.delay
+    assert messenger.sent == []
+
+    work_queue.updates.join()
+    assert messenger.sent == [(42, "Escolha uma opção:")]
+
+
+def test_slow_update_does_not_block_other_updates(monkeypatch):
+    release = threading.Event()
+    handled = []
+
+    def handle(update):
+        if update.get("slow"):
+            release.wait(5)
+        handled.append(update["n"])
+
+    monkeypatch.setattr(telegram_webhook, "handle_update", handle)
+    _post({"slow": True, "n": 0})
+    for n in range(1, 4):
+        _post({"n": n})
+
+    deadline = time.time() + 2
+    while len(handled) < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    assert sorted(handled) == [1, 2, 3]
+    release.set()
+    work_queue.updates.join()
+    assert work_queue.ack_percentiles()["p99_ms"] < 50